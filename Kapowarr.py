@@ -15,6 +15,7 @@ from backend.base.definitions import Constants, StartType
 from backend.base.helpers import check_min_python_version, get_python_exe
 from backend.base.logging import LOGGER, setup_logging
 from backend.features.download_queue import DownloadHandler
+from backend.features.file_watcher import FileWatcher
 from backend.features.tasks import TaskHandler
 from backend.internals.db import set_db_location, setup_db
 from backend.internals.server import SERVER, handle_start_type
@@ -108,6 +109,8 @@ def _main(
         download_handler.load_downloads()
         task_handler = TaskHandler()
         task_handler.handle_intervals()
+        file_watcher = FileWatcher()
+        file_watcher.start_handle()
 
     try:
         # =================
@@ -115,6 +118,7 @@ def _main(
         # =================
 
     finally:
+        file_watcher.stop_handle()
         download_handler.stop_handle()
         task_handler.stop_handle()
 
@@ -45,6 +45,12 @@ class Constants:
     DB_NAME = "Kapowarr.db"
     "Name of database file itself"
 
+    COVERS_FOLDER = "covers"
+    "Subfolder of the database folder to put the volume covers in"
+
+    COVER_THUMBNAIL_SIZES = (150, 300) # pixels
+    "The widths of the thumbnails that are generated of the volume covers"
+
     DB_TIMEOUT = 10.0 # seconds
     "Seconds to wait on database command before timing out"
 
@@ -94,6 +100,27 @@ class Constants:
     STATUS_FORCELIST_RETRIES = (500, 502, 503, 504)
     "The HTTP status codes for which a retry should be done"
 
+    MAX_CONNECTIONS = 100
+    "The maximum amount of open connections of a session"
+
+    MAX_CONNECTIONS_PER_HOST = 8
+    "The maximum amount of open connections of a session to a single host"
+
+    SPEED_WINDOW = 5.0 # seconds
+    "The period over which the speed of a download is averaged"
+
+    QUEUE_STATUS_RATE = 2.0 # Hz
+    "How often per second the progress of downloads is sent to clients"
+
+    DNS_CACHE_TTL = 300 # seconds
+    "How long the resolved addresses of a host are re-used"
+
+    MIN_DOWNLOAD_SEGMENT_SIZE = 8388608 # 8MB
+    "The minimum size of a segment when downloading a file in segments"
+
+    DOWNLOAD_PROGRESS_SAVE_INTERVAL = 30 # seconds
+    "How often the progress of a download is stored, to resume it later"
+
     CV_SITE_URL = "https://comicvine.gamespot.com"
     "The base URL of ComicVine"
 
@@ -103,12 +130,78 @@ class Constants:
     CV_BRAKE_TIME = 1.0 # seconds
     "Average amount of seconds between requests to the CV API"
 
+    CV_BURST_SIZE = 10
+    """
+    Amount of requests that can be made to the CV API in quick succession,
+    before having to keep to `CV_BRAKE_TIME`
+    """
+
+    CV_RESOURCE_LIMIT = 200
+    "Amount of requests per resource (volumes, issues, etc.) allowed by CV"
+
+    CV_RESOURCE_LIMIT_PERIOD = 3600 # seconds
+    "The period in seconds that the CV resource limit applies to"
+
+    CV_CACHE_FILENAME = "ComicVineCache.db"
+    "Name of the database file that caches CV responses"
+
+    CV_CACHE_MAX_SIZE = 100 * 1024 * 1024 # bytes
+    "The maximum size of the cached (compressed) CV responses"
+
+    CV_CACHE_TTLS = {
+        'volume': 3600,
+        'volumes': 3600,
+        'issues': 3600,
+        'search': 86400
+    } # seconds
+    """
+    How long CV responses of each resource are fresh. Responses of resources
+    not listed are not cached
+    """
+
+    CV_REFRESH_BATCH_SIZE = 100
+    """
+    Amount of volumes that are fetched from CV and written to the database at
+    a time when refreshing
+    """
+
+    CV_SYNC_OVERLAP = 43200 # seconds
+    """
+    How far back from the previous sync to look for changes on CV. CV doesn't
+    state the timezone of its timestamps, so the window is widened to be sure
+    that no change is missed
+    """
+
     GC_SITE_URL = "https://getcomics.org"
     "The base URL of GetComics"
 
     GC_SOURCE_TERM = "GetComics"
     "The name used for GetComics as a download source"
 
+    GC_PURIFY_CONCURRENCY = 4
+    "The amount of links in a GC article that are purified at the same time"
+
+    GC_PURIFIED_LINK_TTL = 21600 # 6 hours
+    "How long the result of purifying a link in a GC article is re-used"
+
+    GC_FEED_PAGES = 2
+    "The amount of pages with the latest GC posts that a release sync checks"
+
+    GC_SEARCH_CACHE_ENTRIES = 500
+    "The maximum amount of search queries that GC results are kept in memory for"
+
+    GC_SEARCH_CACHE_FILENAME = "SearchCache.db"
+    "Name of the database file that caches GC search results"
+
+    GC_SEARCH_CACHE_MAX_SIZE = 20 * 1024 * 1024 # bytes
+    "The maximum size of the (compressed) GC search results cached on disk"
+
+    GC_BURST_SIZE = 5
+    "Amount of requests that can be made to GC in quick succession"
+
+    GC_REQUEST_RATE = 2.0 # requests per second
+    "Rate at which requests can be made to GC when searching in bulk"
+
     MEGA_API_URL = "https://eu.api.mega.co.nz/cs"
     "The base URL of the Mega API"
 
@@ -118,6 +211,12 @@ class Constants:
     FS_API_BASE = "/v1"
     "The base endpoint of the FlareSolverr API"
 
+    FS_BURST_SIZE = 3
+    "Amount of requests that can be made to FlareSolverr in quick succession"
+
+    FS_REQUEST_RATE = 1.0 # requests per second
+    "Rate at which requests can be made to FlareSolverr when searching in bulk"
+
     CF_CHALLENGE_HEADER = ("cf-mitigated", "challenge")
     """
     The key and value of the header supplied by CloudFlare
@@ -130,6 +229,34 @@ class Constants:
     TORRENT_TAG = "kapowarr"
     "The tag to give to downloads at external clients"
 
+    WATCHER_DEBOUNCE_TIME = 5 # seconds
+    """
+    The amount of seconds without new filesystem events in a root folder
+    before the changed files are scanned
+    """
+
+    WATCHER_MAX_DELAY = 60 # seconds
+    """
+    The maximum amount of seconds that changed files wait to be scanned, even
+    if filesystem events keep coming in
+    """
+
+    WATCHER_POLL_INTERVAL = 60 # seconds
+    """
+    The interval in seconds between checks for changes in root folders
+    that can't be watched using filesystem events (e.g. network shares)
+    """
+
+    SCAN_RACY_WINDOW = 2 # seconds
+    """
+    Folders modified less than this amount of seconds before a file scan are
+    always listed again on the next scan, as their modification time can not
+    be trusted yet
+    """
+
+    LIBRARY_SEARCH_LIMIT = 100
+    "The maximum amount of volumes returned when searching in the library"
+
 
 class FileConstants:
     IMAGE_EXTENSIONS = (
@@ -194,6 +321,15 @@ class FileConstants:
     with dot-prefix
     """
 
+    NETWORK_FILESYSTEMS = {
+        "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph",
+        "glusterfs", "fuse.sshfs", "fuse.rclone", "fuse.s3fs"
+    }
+    """
+    Filesystem types (as found in /proc/mounts) that don't (reliably) report
+    filesystem events for changes made by other machines
+    """
+
 
 class CharConstants:
     ALPHABET = (
@@ -350,7 +486,8 @@ class LibrarySorting(BaseEnum):
     PUBLISHER = "publisher, title, year, volume_number"
     WANTED = ("issues_downloaded_monitored >= issue_count_monitored, "
               "title, year, volume_number")
-    RECENTLY_RELEASED = ("(SELECT MAX(date) FROM vol_issues) DESC, "
+    RECENTLY_RELEASED = ("(SELECT MAX(date) FROM issues i "
+                         "WHERE i.volume_id = volumes.id) DESC, "
                          "title, year, volume_number")
 
 
@@ -473,6 +610,16 @@ class DownloadSource(BaseEnum):
     "A torrent magnet link directly on the webpage"
 
 
+DOWNLOAD_SOURCE_SEGMENT_LIMITS = {
+    DownloadSource.PIXELDRAIN: 2
+}
+"""
+DownloadSource to the maximum amount of segments that a file is downloaded in
+simultaneously, for sources that limit the amount of connections per user.
+Other sources use the `direct_download_segments` setting.
+"""
+
+
 class DownloadState(BaseEnum):
     QUEUED_STATE = "queued"
     PAUSED_STATE = "paused"
@@ -619,6 +766,27 @@ class GeneralFileData(FileData):
     file_type: str
 
 
+class DownloadProgressData(TypedDict):
+    size: int
+    etag: Union[str, None]
+    last_modified: Union[str, None]
+    written: List[int]
+    "The amount of bytes written per segment"
+    mac_state: Union[str, None]
+    "The hex of the MEGA CBC-MAC so far"
+
+
+class ScanManifestData(TypedDict):
+    filepath: str
+    is_dir: bool
+    size: int
+    mtime_ns: int
+    inode: int
+    volume_hash: Union[str, None]
+    file_type: Union[str, None]
+    issue_ids: Union[str, None]
+
+
 # region Dataclasses
 @dataclass
 class BlocklistEntry:
@@ -4,18 +4,29 @@
 Handling folders, files and filenames.
 """
 
-from os import listdir, makedirs, remove, scandir
+from os import listdir, makedirs, remove, scandir, stat, stat_result
 from os.path import (abspath, basename, commonpath, dirname, isdir,
                      isfile, join, relpath, samefile, sep, splitext)
 from re import compile
 from shutil import copy2, copytree, move, rmtree
-from typing import Dict, Iterable, List, Sequence, Set, Union
+from time import time
+from typing import (Callable, Dict, Generic, Iterable, List, Mapping,
+                    Sequence, Set, TypeVar, Union)
 from zipfile import ZIP_DEFLATED, ZipFile
 
-from backend.base.definitions import CharConstants, Constants, FileConstants
+from backend.base.definitions import (CharConstants, Constants, FileConstants,
+                                      ScanManifestData)
 from backend.base.helpers import check_filter, force_prefix, force_suffix
 from backend.base.logging import LOGGER
 
+try:
+    from os import posix_fallocate
+except ImportError:
+    # Not available on Windows
+    posix_fallocate = None
+
+T = TypeVar('T')
+
 filepath_cleaner = compile(
     r'(<|>|(?<!^\w):|\"|\||\?|\*|\x00|(?:\s|\.)+(?=$|\\|/))'
 )
@@ -84,6 +95,128 @@ def list_files(folder: str, ext: Iterable[str] = []) -> List[str]:
     return list(files)
 
 
+def list_files_incremental(
+    folder: str,
+    ext: Iterable[str],
+    manifest: Mapping[str, ScanManifestData],
+    skip_folder: Union[Callable[[str], bool], None] = None
+) -> Dict[str, ScanManifestData]:
+    """List all files in a folder recursively, like `list_files()`, but re-use
+    the entries of a previous listing for folders that haven't changed since.
+    A folder is unchanged when its modification time is the same as in the
+    previous listing. Its files are then not listed or stat'ed again, and their
+    previous entry is returned as-is. Entries of new or changed files are
+    returned without a cached result (`volume_hash` is `None`).
+
+    Args:
+        folder (str): The base folder to search through.
+
+        ext (Iterable[str]): File extensions to only include.
+            Dot-prefix optional. Keep empty to allow all extensions.
+
+        manifest (Mapping[str, ScanManifestData]): The entries of the previous
+        listing, mapped by their path. Supply an empty mapping to list the
+        folder fully.
+
+        skip_folder (Union[Callable[[str], bool], None], optional): Called
+        with the path of each subfolder. If it returns `True`, the subfolder
+        and its contents are not listed.
+            Defaults to None.
+
+    Returns:
+        Dict[str, ScanManifestData]: The entries of the folders and files
+        found, mapped by their path.
+    """
+    result: Dict[str, ScanManifestData] = {}
+    children: Dict[str, List[ScanManifestData]] = {}
+    for entry in manifest.values():
+        children.setdefault(dirname(entry['filepath']), []).append(entry)
+
+    racy_border = (time() - Constants.SCAN_RACY_WINDOW) * 1_000_000_000
+    ext = {force_prefix(e.lower(), '.') for e in ext}
+
+    def _create_entry(
+        path: str,
+        st: stat_result,
+        is_dir: bool
+    ) -> ScanManifestData:
+        return {
+            'filepath': path,
+            'is_dir': is_dir,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'inode': st.st_ino,
+            'volume_hash': None,
+            'file_type': None,
+            'issue_ids': None
+        }
+
+    def _list_folder(folder: str, st: stat_result) -> None:
+        """Internal function to add the entries of a folder to the result.
+
+        Args:
+            folder (str): The folder to search through.
+            st (stat_result): The stat result of the folder.
+        """
+        previous = manifest.get(folder)
+        entry = _create_entry(folder, st, True)
+        if st.st_mtime_ns >= racy_border:
+            # Folder could still change within the same mtime tick,
+            # so make sure it's listed again next time.
+            entry['mtime_ns'] = -1
+        result[folder] = entry
+
+        if (
+            previous
+            and previous['is_dir']
+            and previous['mtime_ns'] == st.st_mtime_ns
+        ):
+            # Folder contents haven't changed since previous listing
+            for child in children.get(folder, []):
+                if not child['is_dir']:
+                    result[child['filepath']] = child
+                    continue
+
+                if skip_folder is not None and skip_folder(child['filepath']):
+                    continue
+
+                try:
+                    _list_folder(child['filepath'], stat(child['filepath']))
+                except OSError:
+                    continue
+            return
+
+        for f in scandir(folder):
+            if f.is_dir():
+                if skip_folder is None or not skip_folder(f.path):
+                    _list_folder(f.path, f.stat())
+
+            elif (
+                f.is_file()
+                and not f.name.startswith('.')
+                and check_filter(
+                    splitext(f.name)[1].lower(),
+                    ext
+                )
+            ):
+                f_st = f.stat()
+                previous_file = manifest.get(f.path)
+                if (
+                    previous_file
+                    and not previous_file['is_dir']
+                    and previous_file['size'] == f_st.st_size
+                    and previous_file['mtime_ns'] == f_st.st_mtime_ns
+                    and previous_file['inode'] == f_st.st_ino
+                ):
+                    result[f.path] = previous_file
+                else:
+                    result[f.path] = _create_entry(f.path, f_st, False)
+        return
+
+    _list_folder(folder, stat(folder))
+    return result
+
+
 def get_archive_mimetype(filepath: str) -> Union[str, None]:
     """Find the archive type of a file based on its actual mimetype (via magic
     bytes) and return accompanying extension if found.
@@ -140,6 +273,84 @@ def folder_is_inside_folder(
     )
 
 
+class FolderTrie(Generic[T]):
+    """
+    Maps folders to values, to efficiently find the values of all folders
+    that a path is inside of.
+
+    ```
+    >>> t = FolderTrie()
+    >>> t.add('/foo', 1)
+    >>> t.add('/foo/bar', 2)
+    >>> t.get_values('/foo/bar/baz.cbz')
+    [1, 2]
+    >>> t.is_relevant('/quux')
+    False
+    ```
+    """
+
+    def __init__(self) -> None:
+        self._children: Dict[str, FolderTrie[T]] = {}
+        self._values: List[T] = []
+        return
+
+    @staticmethod
+    def __split(path: str) -> List[str]:
+        return [p for p in abspath(path).split(sep) if p]
+
+    def add(self, folder: str, value: T) -> None:
+        """Add a folder with a value.
+
+        Args:
+            folder (str): The folder.
+            value (T): The value linked to the folder.
+        """
+        node = self
+        for part in self.__split(folder):
+            node = node._children.setdefault(part, FolderTrie())
+        node._values.append(value)
+        return
+
+    def get_values(self, path: str) -> List[T]:
+        """Get the values of all folders that the path is inside of or equal to.
+
+        Args:
+            path (str): The path to a file or folder.
+
+        Returns:
+            List[T]: The values, from the most outer folder to the most inner.
+        """
+        node = self
+        result = list(node._values)
+        for part in self.__split(path):
+            next_node = node._children.get(part)
+            if next_node is None:
+                break
+            node = next_node
+            result.extend(node._values)
+        return result
+
+    def is_relevant(self, folder: str) -> bool:
+        """Check whether the folder is inside an added folder, or if an added
+        folder is inside it.
+
+        Args:
+            folder (str): The folder to check.
+
+        Returns:
+            bool: Whether the folder is relevant.
+        """
+        node = self
+        for part in self.__split(folder):
+            if node._values:
+                return True
+            next_node = node._children.get(part)
+            if next_node is None:
+                return False
+            node = next_node
+        return True
+
+
 # region Conversion
 def uppercase_drive_letter(path: str) -> str:
     """Return the input, but if it's a Windows path that starts with a drive
@@ -403,6 +614,28 @@ def create_folder(folder: str) -> None:
     return
 
 
+def preallocate_file(filepath: str, size: int) -> None:
+    """Create a file and reserve the given amount of space for it, so that
+    parts of it can be written to in any order. Any existing file is
+    overwritten.
+
+    Args:
+        filepath (str): The path to the file.
+        size (int): The size of the file in bytes.
+    """
+    with open(filepath, 'wb') as f:
+        if posix_fallocate is not None:
+            try:
+                posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                # Not supported by the filesystem
+                pass
+
+        f.truncate(size)
+    return
+
+
 def create_zip_archive(
     base_folder: str,
     zip_filename: str
@@ -6,7 +6,7 @@ Generic functions and classes
 
 from __future__ import annotations
 
-from asyncio import sleep
+from asyncio import AbstractEventLoop, get_running_loop, sleep
 from base64 import urlsafe_b64encode
 from collections import deque
 from functools import lru_cache
@@ -15,11 +15,16 @@ from multiprocessing.pool import Pool
 from os import cpu_count, sep, symlink
 from os.path import basename, dirname, exists, isfile, join
 from sys import base_exec_prefix, executable, platform, version_info
-from typing import (TYPE_CHECKING, Any, Callable, Collection, Dict, Iterable,
-                    Iterator, List, Mapping, Sequence, Tuple, Union)
+from threading import Lock
+from time import monotonic
+from typing import (TYPE_CHECKING, Any, AsyncGenerator, Callable, Collection,
+                    Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple,
+                    Union)
 from urllib.parse import unquote
+from weakref import WeakKeyDictionary
 
-from aiohttp import ClientError, ClientSession, ClientTimeout
+from aiohttp import (ClientError, ClientSession, ClientTimeout, TCPConnector,
+                     TraceConfig)
 from bencoding import bdecode
 from multidict import CIMultiDict, CIMultiDictProxy
 from requests import Session as RSession
@@ -776,6 +781,119 @@ class DictKeyedDict(dict):
         return zip(self.keys(), self.values())
 
 
+class TokenBucket:
+    """
+    Rate limiter that allows bursts up to `capacity` requests and refills
+    at `rate` requests per second. Thread-safe.
+    """
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        """Create a full token bucket.
+
+        Args:
+            capacity (float): The maximum amount of tokens.
+            rate (float): The amount of tokens added per second.
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated_at = monotonic()
+        self._lock = Lock()
+        return
+
+    def __refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        return
+
+    @property
+    def available(self) -> float:
+        "The amount of tokens that can be taken without waiting"
+        with self._lock:
+            self.__refill()
+            return max(self._tokens, 0.0)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens from the bucket. If there aren't enough, they're taken
+        in advance, so that concurrent callers are scheduled one after the
+        other.
+
+        Args:
+            tokens (float, optional): The amount of tokens to take.
+                Defaults to 1.0.
+
+        Returns:
+            float: The amount of seconds to wait before the tokens are
+            available and the request can be made.
+        """
+        with self._lock:
+            self.__refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def drain(self) -> None:
+        """Remove all available tokens, e.g. when the service reports that the
+        limit has been reached anyway.
+        """
+        with self._lock:
+            self.__refill()
+            self._tokens = min(self._tokens, 0.0)
+        return
+
+
+class SpeedMeter:
+    """
+    Measures the speed of a transfer, averaged over a sliding window instead
+    of based on just the last chunk.
+    """
+
+    def __init__(self, window: float = Constants.SPEED_WINDOW) -> None:
+        """Start measuring.
+
+        Args:
+            window (float, optional): The period in seconds over which the
+            speed is averaged.
+                Defaults to Constants.SPEED_WINDOW.
+        """
+        self.window = window
+        self._samples: deque[Tuple[float, int]] = deque(((monotonic(), 0),))
+        self._amount = 0
+        return
+
+    def add(self, amount: int) -> float:
+        """Register that an amount was transferred.
+
+        Args:
+            amount (int): The amount that was transferred since the last call.
+
+        Returns:
+            float: The speed in amount per second.
+        """
+        now = monotonic()
+        self._samples.append((now, amount))
+        self._amount += amount
+
+        # The first sample only marks the start of the window,
+        # so its amount isn't counted.
+        while (
+            len(self._samples) > 2
+            and self._samples[1][0] <= now - self.window
+        ):
+            self._samples.popleft()
+            self._amount -= self._samples[0][1]
+
+        duration = now - self._samples[0][0]
+        if duration <= 0:
+            return 0.0
+        return self._amount / duration
+
+
 # region Requests
 @lru_cache(1)
 def _running_urllib3_v2_and_above() -> bool:
@@ -822,6 +940,63 @@ def retry(
         )
 
 
+class ConnectionStats:
+    "Thread-safe counters of requests and the connections used for them"
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        return
+
+    def add(
+        self,
+        requests: int = 0,
+        new_connections: int = 0,
+        reused_connections: int = 0
+    ) -> None:
+        with self._lock:
+            self.requests += requests
+            self.new_connections += new_connections
+            self.reused_connections += reused_connections
+        return
+
+    def get(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections
+            }
+
+
+async_connection_stats = ConnectionStats()
+
+
+def _create_trace_config() -> TraceConfig:
+    """Create a trace config that counts the requests and connections of an
+    async session in `async_connection_stats`.
+
+    Returns:
+        TraceConfig: The trace config.
+    """
+    async def on_request_start(*_) -> None:
+        async_connection_stats.add(requests=1)
+
+    async def on_connection_create_end(*_) -> None:
+        async_connection_stats.add(new_connections=1)
+
+    async def on_connection_reuseconn(*_) -> None:
+        async_connection_stats.add(reused_connections=1)
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
 class Session(RSession):
     """
     Inherits from `requests.Session`. Adds retries, sets user agent and handles
@@ -844,13 +1019,42 @@ class Session(RSession):
             status_forcelist=Constants.STATUS_FORCELIST_RETRIES,
             backoff_factor=Constants.BACKOFF_FACTOR_RETRIES
         )
-        self.mount("http://", HTTPAdapter(max_retries=retries))
-        self.mount("https://", HTTPAdapter(max_retries=retries))
+        for prefix in ("http://", "https://"):
+            self.mount(prefix, HTTPAdapter(
+                max_retries=retries,
+                pool_maxsize=Constants.MAX_CONNECTIONS_PER_HOST
+            ))
 
         self.headers.update({"User-Agent": Constants.DEFAULT_USERAGENT})
 
         return
 
+    def get_connection_stats(self) -> Dict[str, int]:
+        """Get the amount of requests made and connections used by the
+        connection pools that are currently open.
+
+        Returns:
+            Dict[str, int]: The statistics.
+        """
+        request_count, connection_count = 0, 0
+        for adapter in self.adapters.values():
+            if not isinstance(adapter, HTTPAdapter):
+                continue
+
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                request_count += pool.num_requests
+                connection_count += pool.num_connections
+
+        return {
+            'requests': request_count,
+            'new_connections': connection_count,
+            'reused_connections': max(request_count - connection_count, 0)
+        }
+
     def request( # type: ignore
         self,
         method: str,
@@ -865,9 +1069,12 @@ class Session(RSession):
         stream=None, verify=None,
         cert=None, json=None
     ):
+        # Pass these per request instead of changing the session, so that
+        # the session can be used by multiple threads at the same time.
         ua, cf_cookies = self.fs.get_ua_cookies(url)
-        self.headers.update({"User-Agent": ua})
-        self.cookies.update(cf_cookies)
+        headers = {"User-Agent": ua, **(headers or {})}
+        if cf_cookies:
+            cookies = {**cf_cookies, **(cookies or {})}
 
         result = super().request(
             method, url, params, data, headers,
@@ -913,7 +1120,18 @@ class AsyncSession(ClientSession):
     `aiohttp.client_exceptions.ClientError`.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        host_limits: Mapping[str, TokenBucket] = {}
+    ) -> None:
+        """Create a session.
+
+        Args:
+            host_limits (Mapping[str, TokenBucket], optional): Rate limits
+            for requests to specific hosts, mapped by host name. Requests
+            to other hosts aren't limited.
+                Defaults to {}.
+        """
         from backend.implementations.flaresolverr import FlareSolverr
 
         super().__init__(
@@ -921,22 +1139,33 @@ class AsyncSession(ClientSession):
             timeout=ClientTimeout(
                 connect=Constants.REQUEST_TIMEOUT,
                 sock_read=Constants.REQUEST_TIMEOUT
-            )
+            ),
+            connector=TCPConnector(
+                limit=Constants.MAX_CONNECTIONS,
+                limit_per_host=Constants.MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=Constants.DNS_CACHE_TTL
+            ),
+            trace_configs=[_create_trace_config()]
         )
 
         self.fs = FlareSolverr()
+        self.host_limits = host_limits
 
         return
 
     async def _request(self, *args, **kwargs):
         method, url = args[0], args[1]
         sleep_time = Constants.BACKOFF_FACTOR_RETRIES
+        host_limit = self.host_limits.get(URL(str(url)).host or '')
 
         ua, cf_cookies = self.fs.get_ua_cookies(url)
         self.headers.update({"User-Agent": ua})
         self.cookie_jar.update_cookies(cf_cookies)
 
         for round in range(1, Constants.TOTAL_RETRIES + 1):
+            if host_limit is not None:
+                await sleep(host_limit.reserve())
+
             try:
                 response = await super()._request(*args, **kwargs)
                 LOGGER.debug(
@@ -947,6 +1176,7 @@ class AsyncSession(ClientSession):
                 )
 
                 if response.status in Constants.STATUS_FORCELIST_RETRIES:
+                    response.release()
                     raise ClientError
 
             except ClientError:
@@ -1071,6 +1301,85 @@ class AsyncSession(ClientSession):
             raise
 
 
+_shared_session: Union[Session, None] = None
+_shared_session_lock = Lock()
+
+_loop_sessions: WeakKeyDictionary[
+    AbstractEventLoop, Tuple[AsyncSession, AsyncGenerator[None, None]]
+] = WeakKeyDictionary()
+_loop_sessions_lock = Lock()
+
+
+def get_session() -> Session:
+    """Get the session that is shared by the whole process, so that
+    connections are kept alive and re-used. It can be used by multiple threads
+    at the same time. Don't close it.
+
+    Returns:
+        Session: The session.
+    """
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = Session()
+        return _shared_session
+
+
+async def __async_session_lifetime(
+    loop: AbstractEventLoop,
+    session: AsyncSession
+) -> AsyncGenerator[None, None]:
+    """Async generator that closes the session when it's finalised. Event
+    loops finalise their async generators when they shut down (e.g. at the end
+    of `asyncio.run()`), so this ties the lifetime of the session to the loop.
+    """
+    try:
+        yield
+
+    finally:
+        with _loop_sessions_lock:
+            _loop_sessions.pop(loop, None)
+        await session.close()
+
+
+async def get_async_session() -> AsyncSession:
+    """Get the session that is shared by everything running in the current
+    event loop, so that connections are kept alive and re-used. Don't close
+    it; it's closed when the event loop shuts down.
+
+    Returns:
+        AsyncSession: The session.
+    """
+    loop = get_running_loop()
+    with _loop_sessions_lock:
+        entry = _loop_sessions.get(loop)
+    if entry is not None and not entry[0].closed:
+        return entry[0]
+
+    session = AsyncSession()
+    lifetime = __async_session_lifetime(loop, session)
+    await lifetime.__anext__()
+
+    with _loop_sessions_lock:
+        _loop_sessions[loop] = (session, lifetime)
+    return session
+
+
+def get_connection_stats() -> Dict[str, Dict[str, int]]:
+    """Get the amount of requests made, and how many connections were opened
+    for them versus re-used.
+
+    Returns:
+        Dict[str, Dict[str, int]]: The statistics of the async sessions and
+        the shared (sync) session.
+    """
+    return {
+        'async': async_connection_stats.get(),
+        'sync': get_session().get_connection_stats()
+    }
+
+
 # region Multiprocessing
 context: Callable[[], AppContext]
 
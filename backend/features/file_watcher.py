@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+
+"""
+Watching the root folders for changes and scanning the files that changed.
+"""
+
+from __future__ import annotations
+
+from ctypes import CDLL, c_char_p, c_int, c_uint32, get_errno
+from ctypes.util import find_library
+from os import close, read, scandir, strerror
+from os.path import dirname, isdir, join, splitext
+from select import select
+from struct import calcsize, unpack_from
+from sys import platform
+from threading import Event, Thread
+from time import monotonic
+from typing import Dict, List, Set, Tuple, Union
+
+from flask import Flask
+
+from backend.base.definitions import Constants, FileConstants
+from backend.base.files import folder_is_inside_folder
+from backend.base.helpers import Singleton
+from backend.base.logging import LOGGER
+from backend.features.tasks import TaskHandler
+from backend.implementations.root_folders import RootFolders
+from backend.implementations.volumes import scan_files
+from backend.internals.db import close_db, get_db
+from backend.internals.settings import Settings
+
+# autopep8: off
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENT_HEADER = 'iIII'
+EVENT_HEADER_SIZE = calcsize(EVENT_HEADER)
+# autopep8: on
+
+
+def _is_network_folder(folder: str) -> bool:
+    """Check whether a folder is on a network share, based on the filesystem
+    type of the mount that the folder is on.
+
+    Args:
+        folder (str): The folder to check.
+
+    Returns:
+        bool: Whether the folder is on a network share. `False` if it could not
+        be determined.
+    """
+    try:
+        with open('/proc/mounts', 'r') as f:
+            mounts = [
+                (
+                    line.split(' ')[1].replace('\\040', ' '),
+                    line.split(' ')[2]
+                )
+                for line in f
+            ]
+
+    except OSError:
+        return False
+
+    fs_type = ''
+    mount_length = -1
+    for mount_point, mount_fs_type in mounts:
+        if (
+            folder_is_inside_folder(mount_point, folder)
+            and len(mount_point) > mount_length
+        ):
+            fs_type = mount_fs_type
+            mount_length = len(mount_point)
+
+    return fs_type in FileConstants.NETWORK_FILESYSTEMS
+
+
+class InotifyWatcher:
+    def __init__(self) -> None:
+        """Watch folders recursively using inotify.
+
+        Raises:
+            OSError: Inotify is not available on this system.
+        """
+        if not platform.startswith('linux'):
+            raise OSError('Inotify is only available on Linux')
+
+        self._libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc.inotify_add_watch.argtypes = (c_int, c_char_p, c_uint32)
+        self._libc.inotify_rm_watch.argtypes = (c_int, c_int)
+
+        self._fd: int = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(get_errno(), strerror(get_errno()))
+
+        self._wd_to_folder: Dict[int, str] = {}
+        return
+
+    def __add_watches(self, folder: str) -> List[str]:
+        """Watch a folder and all of its subfolders.
+
+        Args:
+            folder (str): The folder to watch.
+
+        Returns:
+            List[str]: The files currently inside the folders.
+        """
+        files: List[str] = []
+        wd = self._libc.inotify_add_watch(
+            self._fd, folder.encode(), WATCH_MASK
+        )
+        if wd < 0:
+            LOGGER.warning(
+                f'Failed to watch folder {folder}: {strerror(get_errno())}'
+            )
+            return files
+
+        self._wd_to_folder[wd] = folder
+
+        try:
+            for entry in scandir(folder):
+                if entry.is_dir(follow_symlinks=False):
+                    files.extend(self.__add_watches(entry.path))
+                elif entry.is_file():
+                    files.append(entry.path)
+
+        except OSError:
+            pass
+
+        return files
+
+    def add_folder(self, folder: str) -> None:
+        """Start watching a root folder.
+
+        Args:
+            folder (str): The root folder.
+        """
+        self.__add_watches(folder)
+        return
+
+    def remove_folder(self, folder: str) -> None:
+        """Stop watching a root folder.
+
+        Args:
+            folder (str): The root folder.
+        """
+        for wd, wd_folder in tuple(self._wd_to_folder.items()):
+            if folder_is_inside_folder(folder, wd_folder):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._wd_to_folder[wd]
+        return
+
+    def get_changes(
+        self,
+        timeout: float
+    ) -> List[Tuple[str, bool]]:
+        """Wait for filesystem events and return the paths that changed.
+
+        Args:
+            timeout (float): The maximum amount of seconds to wait for events.
+
+        Returns:
+            List[Tuple[str, bool]]: The changed paths and whether the path was
+            removed. If the event queue overflowed, the watched folders
+            themselves are reported as removed.
+        """
+        if not select([self._fd], [], [], timeout)[0]:
+            return []
+
+        data = read(self._fd, 65536)
+        changes: List[Tuple[str, bool]] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = unpack_from(EVENT_HEADER, data, offset)
+            name = (
+                data[
+                    offset + EVENT_HEADER_SIZE:
+                    offset + EVENT_HEADER_SIZE + length
+                ]
+                .rstrip(b'\x00')
+                .decode(errors='surrogateescape')
+            )
+            offset += EVENT_HEADER_SIZE + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, so everything could've changed
+                LOGGER.warning('Inotify event queue overflowed')
+                changes.extend(
+                    (folder, True)
+                    for folder in set(self._wd_to_folder.values())
+                )
+                continue
+
+            folder = self._wd_to_folder.get(wd)
+            if folder is None:
+                continue
+
+            if mask & IN_IGNORED:
+                del self._wd_to_folder[wd]
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if not isdir(folder):
+                    # Folder is gone, or moved outside the watched folders
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                    self._wd_to_folder.pop(wd, None)
+                continue
+
+            path = join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files moved in together with a folder don't trigger
+                    # their own events
+                    changes.extend(
+                        (f, False)
+                        for f in self.__add_watches(path)
+                    )
+
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changes.append((path, True))
+
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changes.append((path, False))
+
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append((path, True))
+
+        return changes
+
+    def close(self) -> None:
+        "Stop watching all folders"
+        close(self._fd)
+        self._wd_to_folder.clear()
+        return
+
+
+class PollingWatcher:
+    def __init__(self) -> None:
+        """Watch folders recursively by regularly comparing their contents."""
+        self._snapshots: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._next_poll = monotonic() + Constants.WATCHER_POLL_INTERVAL
+        return
+
+    @staticmethod
+    def __take_snapshot(folder: str) -> Dict[str, Tuple[int, int]]:
+        """Get the size and modification time of all files in a folder.
+
+        Args:
+            folder (str): The folder to take the snapshot of.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: The filepaths mapped to their size
+            and modification time.
+        """
+        snapshot: Dict[str, Tuple[int, int]] = {}
+
+        def _walk(folder: str) -> None:
+            try:
+                for entry in scandir(folder):
+                    if entry.is_dir(follow_symlinks=False):
+                        _walk(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+
+            except OSError:
+                pass
+            return
+
+        _walk(folder)
+        return snapshot
+
+    def add_folder(self, folder: str) -> None:
+        """Start watching a root folder.
+
+        Args:
+            folder (str): The root folder.
+        """
+        self._snapshots[folder] = self.__take_snapshot(folder)
+        return
+
+    def remove_folder(self, folder: str) -> None:
+        """Stop watching a root folder.
+
+        Args:
+            folder (str): The root folder.
+        """
+        self._snapshots.pop(folder, None)
+        return
+
+    def get_changes(
+        self,
+        timeout: float,
+        stop_event: Union[Event, None] = None
+    ) -> List[Tuple[str, bool]]:
+        """Wait for the next poll and return the paths that changed.
+
+        Args:
+            timeout (float): The maximum amount of seconds to wait for the
+                next poll.
+            stop_event (Union[Event, None], optional): Event that interrupts
+                the wait when set.
+                Defaults to None.
+
+        Returns:
+            List[Tuple[str, bool]]: The changed paths and whether the path was
+            removed.
+        """
+        time_left = self._next_poll - monotonic()
+        if time_left > 0:
+            if stop_event and timeout > 0:
+                stop_event.wait(min(timeout, time_left))
+            return []
+
+        self._next_poll = monotonic() + Constants.WATCHER_POLL_INTERVAL
+        changes: List[Tuple[str, bool]] = []
+        for folder, old_snapshot in self._snapshots.items():
+            new_snapshot = self.__take_snapshot(folder)
+            changes.extend(
+                (filepath, False)
+                for filepath, stats in new_snapshot.items()
+                if old_snapshot.get(filepath) != stats
+            )
+            changes.extend(
+                (filepath, True)
+                for filepath in old_snapshot
+                if filepath not in new_snapshot
+            )
+            self._snapshots[folder] = new_snapshot
+
+        return changes
+
+    def close(self) -> None:
+        "Stop watching all folders"
+        self._snapshots.clear()
+        return
+
+
+class FileWatcher(metaclass=Singleton):
+    "Note: Singleton"
+
+    def __init__(self) -> None:
+        """Setup the watcher"""
+        watcher_context = Flask('watcher')
+        watcher_context.teardown_appcontext(close_db)
+        self.context = watcher_context.app_context
+
+        self.thread: Union[Thread, None] = None
+        self.stop_event = Event()
+        self.folders_changed = Event()
+
+        self._inotify: Union[InotifyWatcher, None] = None
+        self._polling = PollingWatcher()
+        self._watched: Dict[str, Union[InotifyWatcher, PollingWatcher]] = {}
+
+        # Changed path -> whether it was removed
+        self._pending: Dict[str, bool] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+        return
+
+    def update_watched_folders(self) -> None:
+        """Make the watcher re-check which root folders it should watch. Call
+        after the root folders or the watch setting changed.
+        """
+        self.folders_changed.set()
+        return
+
+    def __update_watched_folders(self) -> None:
+        "Start or stop watching root folders, based on the settings"
+        if Settings().sv.watch_root_folders:
+            root_folders = {rf.folder for rf in RootFolders().get_all()}
+        else:
+            root_folders = set()
+
+        for folder in tuple(self._watched):
+            if folder not in root_folders:
+                LOGGER.info(f'Stopped watching root folder {folder}')
+                self._watched.pop(folder).remove_folder(folder)
+
+        for folder in root_folders:
+            if folder in self._watched:
+                continue
+
+            watcher: Union[InotifyWatcher, PollingWatcher] = self._polling
+            if not _is_network_folder(folder):
+                if self._inotify is None:
+                    try:
+                        self._inotify = InotifyWatcher()
+                    except OSError:
+                        LOGGER.debug(
+                            'Inotify not available, polling root folders'
+                        )
+                if self._inotify is not None:
+                    watcher = self._inotify
+
+            watcher.add_folder(folder)
+            self._watched[folder] = watcher
+            LOGGER.info(
+                f'Watching root folder {folder} using '
+                + ('events' if watcher is self._inotify else 'polling')
+            )
+
+        return
+
+    def __scan_pending(self) -> None:
+        """Scan the files that changed in the volume folders that they're in.
+        Volumes that have a task running for them are scanned later.
+        """
+        cursor = get_db()
+        folder_to_volume: Dict[str, int] = {
+            folder: volume_id
+            for volume_id, folder in cursor.execute(
+                "SELECT id, folder FROM volumes;"
+            )
+        }
+
+        # Volume ID -> changed files, or `None` for a full scan
+        volume_changes: Dict[int, Union[Set[str], None]] = {}
+        volume_paths: Dict[int, List[str]] = {}
+        for path, removed in self._pending.items():
+            parent = path
+            while parent not in folder_to_volume:
+                if dirname(parent) == parent:
+                    break
+                parent = dirname(parent)
+
+            if parent in folder_to_volume:
+                volume_ids = [folder_to_volume[parent]]
+            else:
+                # Path is a folder containing volume folders
+                volume_ids = [
+                    volume_id
+                    for folder, volume_id in folder_to_volume.items()
+                    if folder_is_inside_folder(path, folder)
+                ]
+                removed = True
+
+            for volume_id in volume_ids:
+                volume_paths.setdefault(volume_id, []).append(path)
+                if removed:
+                    # Removed files are only unmatched on a full scan
+                    volume_changes[volume_id] = None
+
+                elif (
+                    volume_changes.setdefault(volume_id, set()) is not None
+                    and splitext(path)[1].lower()
+                        in FileConstants.SCANNABLE_EXTENSIONS
+                ):
+                    volume_changes[volume_id].add(path) # type: ignore
+
+        self._pending = {}
+        for volume_id, files in volume_changes.items():
+            if TaskHandler.task_for_volume_running(volume_id):
+                # Try again after the task is done
+                self._pending.update(
+                    (path, files is None)
+                    for path in volume_paths[volume_id]
+                )
+                continue
+
+            if files is not None and not files:
+                continue
+
+            LOGGER.debug(f'Scanning changed files for volume {volume_id}')
+            try:
+                scan_files(
+                    volume_id,
+                    filepath_filter=list(files or ()),
+                    update_websocket=True
+                )
+            except Exception:
+                LOGGER.exception(
+                    'An error occured while scanning changed files: '
+                )
+
+        if self._pending:
+            self._first_event = self._last_event = monotonic()
+        return
+
+    def __run(self) -> None:
+        "Watch the root folders until stopped"
+        while not self.stop_event.is_set():
+            with self.context():
+                try:
+                    if self.folders_changed.is_set():
+                        self.folders_changed.clear()
+                        self.__update_watched_folders()
+
+                    changes: List[Tuple[str, bool]] = []
+                    if self._inotify is not None and any(
+                        w is self._inotify
+                        for w in self._watched.values()
+                    ):
+                        changes += self._inotify.get_changes(1.0)
+                        changes += self._polling.get_changes(0.0)
+                    else:
+                        changes += self._polling.get_changes(
+                            1.0, self.stop_event
+                        )
+
+                    now = monotonic()
+                    if changes:
+                        if not self._pending:
+                            self._first_event = now
+                        self._last_event = now
+                        for path, removed in changes:
+                            self._pending[path] = (
+                                self._pending.get(path, False) or removed
+                            )
+
+                    if self._pending and (
+                        now - self._last_event
+                            >= Constants.WATCHER_DEBOUNCE_TIME
+                        or now - self._first_event
+                            >= Constants.WATCHER_MAX_DELAY
+                    ):
+                        self.__scan_pending()
+
+                except Exception:
+                    LOGGER.exception(
+                        'An error occured while watching root folders: '
+                    )
+                    self.stop_event.wait(Constants.WATCHER_DEBOUNCE_TIME)
+
+        return
+
+    def start_handle(self) -> None:
+        "Start watching the root folders in a thread"
+        self.stop_event.clear()
+        self.folders_changed.set()
+        self.thread = Thread(
+            target=self.__run,
+            name="FileWatcherThread",
+            daemon=True
+        )
+        self.thread.start()
+        return
+
+    def stop_handle(self) -> None:
+        "Stop watching the root folders"
+        LOGGER.debug('Stopping file watcher thread')
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._polling.close()
+        self._watched.clear()
+        return
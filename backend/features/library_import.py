@@ -4,9 +4,9 @@ from asyncio import run
 from glob import glob
 from itertools import chain
 from os.path import abspath, basename, dirname, isfile, splitext
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
-from backend.base.custom_exceptions import InvalidKeyValue, VolumeAlreadyAdded
+from backend.base.custom_exceptions import InvalidKeyValue
 from backend.base.definitions import (CVFileMapping, FileConstants,
                                       FilenameData, MonitorScheme,
                                       SpecialVersion)
@@ -21,7 +21,6 @@ from backend.implementations.comicvine import ComicVine
 from backend.implementations.naming import mass_rename
 from backend.implementations.root_folders import RootFolders
 from backend.implementations.volumes import Library, Volume, scan_files
-from backend.internals.db import commit
 from backend.internals.db_models import FilesDB
 
 
@@ -182,6 +181,8 @@ def import_library(
     root_folders = RootFolders().get_all()
     library = Library()
 
+    new_volumes: List[Tuple[int, int, Union[str, None]]] = []
+    cvid_to_folders: Dict[int, Tuple[str, str]] = {}
     for cv_id, files in cvid_to_filepath.items():
         # Find root folder that media is in
         for root_folder in root_folders:
@@ -191,41 +192,41 @@ def import_library(
             continue
 
         lcf = common_folder(files)
+        new_volumes.append((
+            cv_id,
+            root_folder.id,
+            lcf if not rename_files else None
+        ))
+        cvid_to_folders[cv_id] = (root_folder.folder, lcf)
+
+    # Volumes that are already added are skipped. Their files are not matched
+    # to them (otherwise they wouldn't pop up in LI), which would mean that
+    # the files are actually not for that volume.
+    # Without renaming, the volume folder is the folder of the files, so
+    # they're matched by the scan that's done when adding.
+    cvid_to_volume_id = library.add_multiple(
+        new_volumes,
+        monitored=True,
+        monitor_scheme=MonitorScheme.ALL,
+        monitor_new_issues=True
+    )
+
+    if rename_files:
+        for cv_id, volume_id in cvid_to_volume_id.items():
+            root_folder_path, lcf = cvid_to_folders[cv_id]
 
-        try:
-            volume_id = library.add(
-                comicvine_id=cv_id,
-                root_folder_id=root_folder.id,
-                monitored=True,
-                monitor_scheme=MonitorScheme.ALL,
-                monitor_new_issues=True,
-                volume_folder=lcf if not rename_files else None
-            )
-            commit()
-
-        except VolumeAlreadyAdded:
-            # The volume is already added but the file is not matched to it
-            # (it isn't because otherwise it wouldn't pop up in LI).
-            # That would mean that the file is actually not
-            # for that volume so skip.
-            continue
-
-        if rename_files:
             # Put files in volume folder
             vf = Volume(volume_id).vd.folder
-            file_changes = change_basefolder(files, lcf, vf)
+            file_changes = change_basefolder(cvid_to_filepath[cv_id], lcf, vf)
             for old, new in file_changes.items():
                 if old != new:
                     rename_file(old, new)
                     delete_empty_parent_folders(
-                        dirname(old), root_folder.folder
+                        dirname(old), root_folder_path
                     )
 
             new_files = list(file_changes.values())
             scan_files(volume_id)
             mass_rename(volume_id, filepath_filter=new_files)
 
-        else:
-            scan_files(volume_id, filepath_filter=files)
-
     return
@@ -22,7 +22,7 @@ from backend.implementations.download_clients import TorrentDownload
 from backend.implementations.naming import mass_rename
 from backend.implementations.volumes import Volume, scan_files
 from backend.internals.db import commit, get_db
-from backend.internals.db_models import FilesDB
+from backend.internals.db_models import DownloadProgressDB, FilesDB
 from backend.internals.settings import Settings
 
 if TYPE_CHECKING:
@@ -229,6 +229,13 @@ def delete_file(download: Download) -> None:
     return
 
 
+def delete_unresumable_file(download: Download) -> None:
+    "Delete file from download folder, unless the download can be resumed"
+    if DownloadProgressDB.fetch(download.id) is None:
+        delete_file(download)
+    return
+
+
 # region Extras
 def rename_with_proper_extension(download: Download) -> None:
     """
@@ -286,7 +293,7 @@ class PostProcessor:
     ]
 
     actions_shutdown = [
-        delete_file
+        delete_unresumable_file
     ]
 
     actions_failed = [
@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 
-from asyncio import gather, run
-from typing import Dict, List, Tuple, Union
+from asyncio import Semaphore, gather, run
+from typing import Callable, Dict, List, Sequence, Set, Tuple, Union
 
-from backend.base.definitions import (QUERY_FORMATS, MatchedSearchResultData,
+from yarl import URL
+
+from backend.base.definitions import (QUERY_FORMATS, Constants, IssueData,
+                                      MatchedSearchResultData,
                                       SearchResultData, SearchSource,
-                                      SpecialVersion)
-from backend.base.helpers import (AsyncSession, check_overlapping_issues,
+                                      SpecialVersion, VolumeData)
+from backend.base.helpers import (AsyncSession, TokenBucket,
+                                  check_overlapping_issues,
                                   extract_year_from_date, force_range,
-                                  get_subclasses)
+                                  get_async_session, get_subclasses)
 from backend.base.logging import LOGGER
-from backend.implementations.getcomics import search_getcomics
-from backend.implementations.matching import check_search_result_match
+from backend.implementations.getcomics import (get_latest_posts,
+                                               search_getcomics)
+from backend.implementations.matching import (check_search_result_match,
+                                              clean_title)
 from backend.implementations.volumes import Volume
+from backend.internals.db import get_db
+from backend.internals.settings import Settings
 
 
 def _rank_search_result(
@@ -146,13 +154,30 @@ async def search_multiple_queries(*queries: str) -> List[SearchResultData]:
         List[SearchResultData]: The search results for all queries together,
         duplicates removed.
     """
-    async with AsyncSession() as session:
-        searches = [
-            Source(query).search(session)
-            for Source in get_subclasses(SearchSource)
-            for query in queries
-        ]
-        responses = await gather(*searches)
+    session = await get_async_session()
+    return await _search_multiple_queries(session, *queries)
+
+
+async def _search_multiple_queries(
+    session: AsyncSession,
+    *queries: str
+) -> List[SearchResultData]:
+    """Do a manual search for multiple queries asynchronously, using the given
+    session.
+
+    Args:
+        session (AsyncSession): The session to make the requests with.
+
+    Returns:
+        List[SearchResultData]: The search results for all queries together,
+        duplicates removed.
+    """
+    searches = [
+        Source(query).search(session)
+        for Source in get_subclasses(SearchSource)
+        for query in queries
+    ]
+    responses = await gather(*searches)
 
     search_results: List[SearchResultData] = []
     processed_links = set()
@@ -179,6 +204,30 @@ def manual_search(
         in the case that you want to search for an issue instead of a volume.
             Defaults to None.
 
+    Returns:
+        List[MatchedSearchResultData]: List with search results.
+    """
+    async def _search() -> List[MatchedSearchResultData]:
+        session = await get_async_session()
+        return await _manual_search(session, volume_id, issue_id)
+
+    return run(_search())
+
+
+async def _manual_search(
+    session: AsyncSession,
+    volume_id: int,
+    issue_id: Union[int, None] = None
+) -> List[MatchedSearchResultData]:
+    """Do a manual search for a volume or issue, using the given session.
+
+    Args:
+        session (AsyncSession): The session to make the requests with.
+        volume_id (int): The id of the volume to search for.
+        issue_id (Union[int, None], optional): The id of the issue to search for,
+        in the case that you want to search for an issue instead of a volume.
+            Defaults to None.
+
     Returns:
         List[MatchedSearchResultData]: List with search results.
     """
@@ -229,13 +278,13 @@ def manual_search(
             )
 
         search_title = title.replace(':', '')
-        search_results = run(search_multiple_queries(*(
+        search_results = await _search_multiple_queries(session, *(
             format.format(
                 title=search_title, volume_number=volume_data.volume_number,
                 year=volume_data.year, issue_number=issue_number
             )
             for format in formats
-        )))
+        ))
         if not search_results:
             continue
 
@@ -278,6 +327,97 @@ def auto_search(
         in the case that you want to search for an issue instead of a volume.
             Defaults to None.
 
+    Returns:
+        List[MatchedSearchResultData]: List with chosen search results.
+    """
+    async def _search() -> List[MatchedSearchResultData]:
+        session = await get_async_session()
+        return await _auto_search(session, volume_id, issue_id)
+
+    return run(_search())
+
+
+def _get_covered_issues(
+    volume: Volume,
+    special_version: SpecialVersion,
+    result: MatchedSearchResultData
+) -> Union[List[IssueData], None]:
+    """Determine which issues of a volume a (matching) search result covers.
+    The issue number (range) that the result covers is stored in the
+    `_issue_number` key of the result.
+
+    Args:
+        volume (Volume): The volume that the result is for.
+        special_version (SpecialVersion): The special version of the volume.
+        result (MatchedSearchResultData): The search result.
+
+    Returns:
+        Union[List[IssueData], None]: The issues that the result covers, or
+        `None` if it can't be determined.
+    """
+    if result['issue_number'] is not None:
+        # Normal issue, VAS with issue number,
+        # OS/HC/Omnibus using issue 1
+        result['_issue_number'] = result['issue_number']
+        return volume.get_issues_in_range(
+            *force_range(result['issue_number'])
+        )
+
+    elif (
+        special_version == SpecialVersion.VOLUME_AS_ISSUE
+        and result['special_version'] == SpecialVersion.TPB
+    ):
+        # VAS with volume number
+        if result['volume_number'] is None:
+            return None
+
+        if isinstance(result['volume_number'], tuple):
+            result['_issue_number'] = (
+                float(result['volume_number'][0]),
+                float(result['volume_number'][1])
+            )
+        else:
+            result['_issue_number'] = float(result['volume_number'])
+
+        return volume.get_issues_in_range(
+            *force_range(result['volume_number'])
+        )
+
+    elif (
+        special_version in (
+            SpecialVersion.ONE_SHOT,
+            SpecialVersion.HARD_COVER,
+            SpecialVersion.TPB,
+            SpecialVersion.OMNIBUS
+        )
+        and result['special_version'] in (
+            special_version,
+            SpecialVersion.TPB
+        )
+    ):
+        # OS/HC/Omnibus using no issue number, TPB
+        result['_issue_number'] = 1.0
+        return volume.get_issue_index().issues
+
+    else:
+        return None
+
+
+async def _auto_search(
+    session: AsyncSession,
+    volume_id: int,
+    issue_id: Union[int, None] = None
+) -> List[MatchedSearchResultData]:
+    """Search for a volume or issue and automatically choose a result, using
+    the given session.
+
+    Args:
+        session (AsyncSession): The session to make the requests with.
+        volume_id (int): The ID of the volume to search for.
+        issue_id (Union[int, None], optional): The id of the issue to search for,
+        in the case that you want to search for an issue instead of a volume.
+            Defaults to None.
+
     Returns:
         List[MatchedSearchResultData]: List with chosen search results.
     """
@@ -316,7 +456,7 @@ def auto_search(
 
     search_results = [
         r
-        for r in manual_search(volume_id, issue_id)
+        for r in await _manual_search(session, volume_id, issue_id)
         if r['match']
     ]
 
@@ -334,52 +474,8 @@ def auto_search(
     chosen_downloads: List[MatchedSearchResultData] = []
     searchable_issue_numbers = {i[1] for i in searchable_issues}
     for result in search_results:
-        # Determine what issues the result covers
-        if result['issue_number'] is not None:
-            # Normal issue, VAS with issue number,
-            # OS/HC/Omnibus using issue 1
-            result['_issue_number'] = result['issue_number']
-            covered_issues = volume.get_issues_in_range(
-                *force_range(result['issue_number'])
-            )
-
-        elif (
-            special_version == SpecialVersion.VOLUME_AS_ISSUE
-            and result['special_version'] == SpecialVersion.TPB
-        ):
-            # VAS with volume number
-            if result['volume_number'] is None:
-                continue
-
-            if isinstance(result['volume_number'], tuple):
-                result['_issue_number'] = (
-                    float(result['volume_number'][0]),
-                    float(result['volume_number'][1])
-                )
-            else:
-                result['_issue_number'] = float(result['volume_number'])
-
-            covered_issues = volume.get_issues_in_range(
-                *force_range(result['volume_number'])
-            )
-
-        elif (
-            special_version in (
-                SpecialVersion.ONE_SHOT,
-                SpecialVersion.HARD_COVER,
-                SpecialVersion.TPB,
-                SpecialVersion.OMNIBUS
-            )
-            and result['special_version'] in (
-                special_version,
-                SpecialVersion.TPB
-            )
-        ):
-            # OS/HC/Omnibus using no issue number, TPB
-            result['_issue_number'] = 1.0
-            covered_issues = volume.get_issues()
-
-        else:
+        covered_issues = _get_covered_issues(volume, special_version, result)
+        if covered_issues is None:
             continue
 
         if any(
@@ -414,7 +510,210 @@ def auto_search(
     ]
 
     for missing_issue in missing_issues:
-        chosen_downloads.extend(auto_search(volume_id, missing_issue[0]))
+        chosen_downloads.extend(
+            await _auto_search(session, volume_id, missing_issue[0])
+        )
 
     LOGGER.debug('Auto search results: %s', chosen_downloads)
     return chosen_downloads
+
+
+def _get_search_host_limits() -> Dict[str, TokenBucket]:
+    """Get the rate limits for the hosts that are contacted when searching.
+
+    Returns:
+        Dict[str, TokenBucket]: The rate limits, mapped by host name.
+    """
+    result = {
+        URL(Constants.GC_SITE_URL).host or '': TokenBucket(
+            Constants.GC_BURST_SIZE,
+            Constants.GC_REQUEST_RATE
+        )
+    }
+
+    flaresolverr_base_url = Settings().sv.flaresolverr_base_url
+    if flaresolverr_base_url:
+        result[URL(flaresolverr_base_url).host or ''] = TokenBucket(
+            Constants.FS_BURST_SIZE,
+            Constants.FS_REQUEST_RATE
+        )
+
+    return result
+
+
+def auto_search_multiple(
+    volume_ids: Sequence[int],
+    update_progress: Union[Callable[[int, int], None], None] = None,
+    should_stop: Callable[[], bool] = lambda: False
+) -> Dict[int, List[MatchedSearchResultData]]:
+    """Auto search for multiple volumes at the same time. The searches share
+    one session, the amount of searches running at once is limited by the
+    `concurrent_searches` setting and the requests to GetComics and
+    FlareSolverr are rate limited.
+
+    Args:
+        volume_ids (Sequence[int]): The IDs of the volumes to search for.
+
+        update_progress (Union[Callable[[int, int], None], None], optional):
+        Called after each finished search with the amount of finished searches
+        and the total amount.
+            Defaults to None.
+
+        should_stop (Callable[[], bool], optional): Checked before each search
+        starts. When it returns `True`, the remaining searches are skipped.
+            Defaults to lambda: False.
+
+    Returns:
+        Dict[int, List[MatchedSearchResultData]]: Map of the volume IDs to
+        their chosen search results.
+    """
+    limit = Semaphore(Settings().sv.concurrent_searches)
+    finished_count = 0
+
+    async def search_volume(
+        session: AsyncSession,
+        volume_id: int
+    ) -> List[MatchedSearchResultData]:
+        nonlocal finished_count
+        async with limit:
+            if should_stop():
+                return []
+
+            try:
+                result = await _auto_search(session, volume_id)
+            except Exception:
+                LOGGER.exception(
+                    'Auto search failed for volume %d: ', volume_id
+                )
+                result = []
+
+        finished_count += 1
+        if update_progress is not None:
+            update_progress(finished_count, len(volume_ids))
+        return result
+
+    async def search_volumes() -> Dict[int, List[MatchedSearchResultData]]:
+        async with AsyncSession(_get_search_host_limits()) as session:
+            results = await gather(*(
+                search_volume(session, volume_id)
+                for volume_id in volume_ids
+            ))
+        return dict(zip(volume_ids, results))
+
+    return run(search_volumes())
+
+
+def _build_volume_index() -> Dict[str, List[Tuple[Union[int, None], int]]]:
+    """Build an index of the monitored volumes, to quickly find the volumes
+    that a release could be for.
+
+    Returns:
+        Dict[str, List[Tuple[Union[int, None], int]]]: Map of the normalised
+        (alternative) titles to the year and ID of the volumes with that
+        title, newest volume first.
+    """
+    index: Dict[str, List[Tuple[Union[int, None], int]]] = {}
+    for volume in get_db().execute(
+        "SELECT id, title, alt_title, year FROM volumes WHERE monitored = 1;"
+    ):
+        for title in (volume['title'], volume['alt_title']):
+            if title:
+                index.setdefault(clean_title(title), []).append(
+                    (volume['year'], volume['id'])
+                )
+
+    for entries in index.values():
+        entries.sort(key=lambda e: e[0] or 0, reverse=True)
+
+    return index
+
+
+def release_sync() -> Dict[int, List[MatchedSearchResultData]]:
+    """Check the latest posts on GetComics for releases of monitored issues
+    that don't have a file yet. Unlike searching for every volume, the amount
+    of requests doesn't depend on the size of the library.
+
+    Returns:
+        Dict[int, List[MatchedSearchResultData]]: Map of the volume IDs to
+        the chosen posts.
+    """
+    async def fetch_posts() -> List[SearchResultData]:
+        async with AsyncSession(_get_search_host_limits()) as session:
+            return await get_latest_posts(session)
+
+    posts = run(fetch_posts())
+    LOGGER.info(f'Release sync: checking {len(posts)} posts')
+    if not posts:
+        return {}
+
+    volume_index = _build_volume_index()
+    volumes: Dict[int, Tuple[
+        Volume, VolumeData, List[IssueData],
+        Dict[float, Union[int, None]], Set[float]
+    ]] = {}
+    chosen_downloads: Dict[int, List[MatchedSearchResultData]] = {}
+
+    for post in posts:
+        for volume_year, volume_id in volume_index.get(
+            clean_title(post['series']), []
+        ):
+            if (
+                volume_year is not None
+                and post['year'] is not None
+                and volume_year > post['year'] + 1
+            ):
+                # Release is from before the volume started
+                continue
+
+            if volume_id not in volumes:
+                volume = Volume(volume_id)
+                volume_issues = volume.get_issues(_skip_files=True)
+                volumes[volume_id] = (
+                    volume,
+                    volume.get_data(),
+                    volume_issues,
+                    {
+                        i.calculated_issue_number:
+                            extract_year_from_date(i.date)
+                        for i in volume_issues
+                    },
+                    {i[1] for i in volume.get_open_issues()}
+                )
+
+            (
+                volume, volume_data, volume_issues,
+                number_to_year, open_issue_numbers
+            ) = volumes[volume_id]
+
+            result: MatchedSearchResultData = {
+                **post,
+                **check_search_result_match(
+                    post, volume_data, volume_issues, number_to_year
+                )
+            }
+            if not result['match']:
+                continue
+
+            covered_issues = _get_covered_issues(
+                volume, volume_data.special_version, result
+            )
+            if not covered_issues or any(
+                i.calculated_issue_number not in open_issue_numbers
+                for i in covered_issues
+            ):
+                # Nothing that is needed, or (partially) downloaded already
+                continue
+
+            volume_downloads = chosen_downloads.setdefault(volume_id, [])
+            if not any(
+                check_overlapping_issues(
+                    part.get('_issue_number', 0.0),
+                    result['_issue_number']
+                )
+                for part in volume_downloads
+            ):
+                volume_downloads.append(result)
+            break
+
+    LOGGER.debug('Release sync results: %s', chosen_downloads)
+    return chosen_downloads
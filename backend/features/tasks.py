@@ -15,10 +15,11 @@ from flask import Flask
 
 from backend.base.custom_exceptions import (InvalidComicVineApiKey,
                                             TaskNotDeletable, TaskNotFound)
-from backend.base.helpers import Singleton, get_subclasses
+from backend.base.helpers import Singleton, first_of_subarrays, get_subclasses
 from backend.base.logging import LOGGER
 from backend.features.download_queue import DownloadHandler
-from backend.features.search import auto_search
+from backend.features.search import (auto_search, auto_search_multiple,
+                                     release_sync)
 from backend.implementations.conversion import mass_convert
 from backend.implementations.naming import mass_rename
 from backend.implementations.volumes import Issue, Volume, refresh_and_scan
@@ -277,13 +278,21 @@ class RefreshAndScanVolume(Task):
     def issue_id(self) -> None:
         return None
 
-    def __init__(self, volume_id: int) -> None:
+    def __init__(
+        self,
+        volume_id: int,
+        force_full_scan: bool = False
+    ) -> None:
         """Create the task
 
         Args:
             volume_id (int): The id of the volume for which to perform the task
+            force_full_scan (bool, optional): Process all files again instead
+                of only the new or changed ones.
+                Defaults to False.
         """
         self._volume_id = volume_id
+        self.force_full_scan = force_full_scan
         return
 
     def run(self) -> None:
@@ -292,7 +301,11 @@ class RefreshAndScanVolume(Task):
         WebSocket().update_task_status(self)
 
         try:
-            refresh_and_scan(self._volume_id, update_websocket=True)
+            refresh_and_scan(
+                self._volume_id,
+                update_websocket=True,
+                force_full_scan=self.force_full_scan
+            )
         except InvalidComicVineApiKey:
             pass
 
@@ -417,14 +430,23 @@ class UpdateAll(Task):
     def issue_id(self) -> None:
         return None
 
-    def __init__(self, allow_skipping: bool = False) -> None:
+    def __init__(
+        self,
+        allow_skipping: bool = False,
+        force_full_scan: bool = False
+    ) -> None:
         """Create the task
 
         Args:
-            allow_skipping (bool, optional): Skip volumes that have been updated in the last 24 hours.
+            allow_skipping (bool, optional): Only refresh the volumes that
+            have changed on CV since the last complete sync.
+                Defaults to False.
+            force_full_scan (bool, optional): Process all files again instead
+                of only the new or changed ones.
                 Defaults to False.
         """
         self.allow_skipping = allow_skipping
+        self.force_full_scan = force_full_scan
         return
 
     def run(self) -> None:
@@ -434,7 +456,8 @@ class UpdateAll(Task):
         try:
             refresh_and_scan(
                 update_websocket=True,
-                allow_skipping=self.allow_skipping
+                allow_skipping=self.allow_skipping,
+                force_full_scan=self.force_full_scan
             )
         except InvalidComicVineApiKey:
             pass
@@ -464,23 +487,66 @@ class SearchAll(Task):
 
     def run(self) -> List[Tuple[str, int, Union[int, None]]]:
         cursor = get_db(force_new=True)
-        cursor.execute(
-            "SELECT id, title FROM volumes WHERE monitored = 1;"
-        )
-        downloads: List[Tuple[str, int, Union[int, None]]] = []
+        volume_ids: List[int] = first_of_subarrays(cursor.execute(
+            "SELECT id FROM volumes WHERE monitored = 1;"
+        ))
         ws = WebSocket()
-        for volume_id, volume_title in cursor:
-            if self.stop:
-                break
-            self.message = f'Searching for {volume_title}'
+
+        def update_progress(finished_count: int, total_count: int) -> None:
+            self.message = (
+                f'Searched for {finished_count}/{total_count} volumes'
+            )
             ws.update_task_status(self)
-            # Get search results and download them
-            results = auto_search(volume_id)
-            if results:
-                downloads += [
-                    (result['link'], volume_id, None)
-                    for result in results
-                ]
+            return
+
+        self.message = f'Searching for {len(volume_ids)} volumes'
+        ws.update_task_status(self)
+
+        # Get search results and download them
+        search_results = auto_search_multiple(
+            volume_ids,
+            update_progress,
+            lambda: self.stop
+        )
+        downloads: List[Tuple[str, int, Union[int, None]]] = [
+            (result['link'], volume_id, None)
+            for volume_id, results in search_results.items()
+            for result in results
+        ]
+        return downloads
+
+
+class ReleaseSync(Task):
+    "Check the latest releases on GetComics for monitored issues"
+
+    stop = False
+    message = ''
+    action = 'release_sync'
+    display_title = 'Release Sync'
+    category = 'download'
+
+    @property
+    def volume_id(self) -> None:
+        return None
+
+    @property
+    def issue_id(self) -> None:
+        return None
+
+    def __init__(self) -> None:
+        return
+
+    def run(self) -> List[Tuple[str, int, Union[int, None]]]:
+        self.message = 'Checking latest releases'
+        WebSocket().update_task_status(self)
+
+        # Get matching releases and download them
+        search_results = release_sync()
+        downloads: List[Tuple[str, int, Union[int, None]]] = [
+            (result['link'], volume_id, None)
+            for volume_id, results in search_results.items()
+            for result in results
+        ]
         return downloads
 
 
@@ -606,7 +672,7 @@ class TaskHandler(metaclass=Singleton):
         return any(
             t
             for t in TaskHandler.queue
-            if (isinstance(t['task'], (UpdateAll, SearchAll))
+            if (isinstance(t['task'], (UpdateAll, SearchAll, ReleaseSync))
                 or t['task'].volume_id == volume_id)
         )
 
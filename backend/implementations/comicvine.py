@@ -5,9 +5,11 @@ Search for volumes/issues and fetch metadata for them on ComicVine
 """
 
 from asyncio import gather, run, sleep
+from datetime import datetime, timedelta
 from json import JSONDecodeError
 from re import IGNORECASE, compile
-from typing import Any, Dict, List, Sequence, Union
+from threading import Lock
+from typing import Any, Dict, List, Mapping, Sequence, Set, Union
 
 from aiohttp import ContentTypeError
 from aiohttp.client_exceptions import ClientError
@@ -20,13 +22,15 @@ from backend.base.definitions import (Constants, FilenameData, IssueMetadata,
                                       SpecialVersion, T, VolumeMetadata)
 from backend.base.file_extraction import (extract_issue_number,
                                           extract_volume_number, volume_regex)
-from backend.base.helpers import (AsyncSession, DictKeyedDict, Session,
-                                  batched, force_range, force_suffix,
+from backend.base.helpers import (AsyncSession, DictKeyedDict, Singleton,
+                                  TokenBucket, batched, force_range,
+                                  force_suffix, get_async_session,
                                   normalise_string, normalise_year,
                                   to_full_string_cv_id, to_string_cv_id)
 from backend.base.logging import LOGGER
 from backend.implementations.matching import _match_title, _match_year
 from backend.internals.db import get_db
+from backend.internals.response_cache import ResponseCache
 from backend.internals.settings import Settings
 
 translation_regex = compile(
@@ -42,6 +46,10 @@ translation_regex = compile(
     IGNORECASE)
 headers = {'h2', 'h3', 'h4', 'h5', 'h6'}
 lists = {'ul', 'ol'}
+cv_cache = ResponseCache(
+    Constants.CV_CACHE_FILENAME,
+    Constants.CV_CACHE_MAX_SIZE
+)
 
 
 def _clean_description(description: str, short: bool = False) -> str:
@@ -122,6 +130,91 @@ def _clean_description(description: str, short: bool = False) -> str:
     return result
 
 
+class CVRateLimiter(metaclass=Singleton):
+    """
+    Schedules the requests to the CV API of the whole process, to keep within
+    the limit per resource and to avoid the velocity detection of CV.
+    """
+
+    def __init__(self) -> None:
+        self.velocity = TokenBucket(
+            Constants.CV_BURST_SIZE,
+            1 / Constants.CV_BRAKE_TIME
+        )
+        self.resources: Dict[str, TokenBucket] = {}
+        self._lock = Lock()
+
+        for resource in ('volume', 'issue', 'search'):
+            self.__get_bucket(resource)
+        return
+
+    @staticmethod
+    def get_resource(url_path: str) -> str:
+        """Get the resource that a request counts towards.
+
+        Args:
+            url_path (str): The path of the url of the request
+            (e.g. '/volume/4050-2127/').
+
+        Returns:
+            str: The resource (e.g. 'volume').
+        """
+        # '/volume/...' and '/volumes/' are the same resource
+        return url_path.strip('/').split('/')[0].rstrip('s')
+
+    def __get_bucket(self, resource: str) -> TokenBucket:
+        with self._lock:
+            if resource not in self.resources:
+                self.resources[resource] = TokenBucket(
+                    Constants.CV_RESOURCE_LIMIT,
+                    Constants.CV_RESOURCE_LIMIT
+                    / Constants.CV_RESOURCE_LIMIT_PERIOD
+                )
+            return self.resources[resource]
+
+    async def wait(self, resource: str) -> None:
+        """Wait until a request to the resource is allowed.
+
+        Args:
+            resource (str): The resource of the request.
+        """
+        wait_time = max(
+            self.__get_bucket(resource).reserve(),
+            self.velocity.reserve()
+        )
+        if wait_time:
+            LOGGER.debug(
+                f"Waiting {wait_time:.1f}s to keep the CV rate limit happy"
+            )
+            await sleep(wait_time)
+        return
+
+    def limit_reached(self, resource: str) -> None:
+        """Register that CV reported that the limit of the resource has been
+        reached.
+
+        Args:
+            resource (str): The resource.
+        """
+        self.__get_bucket(resource).drain()
+        return
+
+    def get_budget(self) -> Dict[str, int]:
+        """Get the amount of requests that can be made right now for each
+        resource that has been used.
+
+        Returns:
+            Dict[str, int]: The resource mapped to the remaining requests.
+        """
+        with self._lock:
+            resources = dict(self.resources)
+
+        return {
+            resource: int(bucket.available)
+            for resource, bucket in resources.items()
+        }
+
+
 class ComicVine:
 
     volume_field_list = ','.join((
@@ -170,7 +263,11 @@ class ComicVine:
     with one issue.
     """
 
-    def __init__(self, comicvine_api_key: Union[str, None] = None) -> None:
+    def __init__(
+        self,
+        comicvine_api_key: Union[str, None] = None,
+        use_cache: bool = True
+    ) -> None:
         """Start interacting with ComicVine.
 
         Args:
@@ -178,6 +275,11 @@ class ComicVine:
             that is used.
                 Defaults to None.
 
+            use_cache (bool, optional): Serve fresh responses from the cache.
+            If `False`, all requests go to CV, though the responses are still
+            stored in the cache.
+                Defaults to True.
+
         Raises:
             InvalidComicVineApiKey: No ComicVine API key is set in the settings.
         """
@@ -188,10 +290,14 @@ class ComicVine:
             raise InvalidComicVineApiKey
 
         self.date_type = settings.date_type.value
+        self.use_cache = use_cache
+        self.requests_failed = False
+        """
+        Whether a request to CV has failed, meaning that the returned data
+        could be incomplete or outdated
+        """
 
-        self.ssn = Session()
         self._params = {'format': 'json', 'api_key': api_key}
-        self.ssn.params.update(self._params) # type: ignore
         return
 
     async def __call_request(
@@ -219,7 +325,8 @@ class ComicVine:
         session: AsyncSession,
         url_path: str,
         params: Dict[str, Any] = {},
-        default: Union[T, None] = None
+        default: Union[T, None] = None,
+        cache: bool = True
     ) -> Union[Dict[str, Any], T]:
         """Make an CV API call asynchronously (with error handling).
 
@@ -238,9 +345,14 @@ class ComicVine:
             instead of raising error.
                 Defaults to None.
 
+            cache (bool, optional): Whether the response can be served from and
+            stored in the cache, if the resource is cached at all.
+                Defaults to True.
+
         Raises:
             CVRateLimitReached: The CV rate limit for this endpoint has been
-            reached, and no `default` was supplied.
+            reached, and no `default` was supplied or cached response is
+            available.
             InvalidComicVineApiKey: The CV api key is not valid.
             VolumeNotMatched: The volume with the given ID is not found.
 
@@ -249,24 +361,74 @@ class ComicVine:
             `default` on error.
         """
         url_path = force_suffix('/' + url_path.lstrip('/'), '/')
+        resource = CVRateLimiter.get_resource(url_path)
+
+        cache_ttl = (
+            Constants.CV_CACHE_TTLS.get(url_path.split('/')[1])
+            if cache else
+            None
+        )
+        cache_key = cv_cache.get_key(url_path, params)
+        validators: Dict[str, str] = {}
+        if cache_ttl is not None:
+            if self.use_cache:
+                cached_result = cv_cache.get(cache_key, cache_ttl)
+                if cached_result is not None:
+                    return cached_result
+
+            # Let CV confirm that the cached response is still up to date
+            validators = cv_cache.get_validators(cache_key)
 
         try:
+            await CVRateLimiter().wait(resource)
             response = await session.get(
                 self.api_url + url_path,
-                params={**self._params, **params}
+                params={**self._params, **params},
+                headers=validators
             )
+            if response.status == 304:
+                response.release()
+                cached_result = cv_cache.revalidate(cache_key)
+                if cached_result is not None:
+                    return cached_result
+
+                # Response got evicted in the meantime
+                response = await session.get(
+                    self.api_url + url_path,
+                    params={**self._params, **params}
+                )
+
             result: Dict[str, Any] = await response.json()
 
             if result['status_code'] == 107:
+                CVRateLimiter().limit_reached(resource)
                 raise ClientError
             elif result['status_code'] == 101:
                 raise VolumeNotMatched
             elif result['status_code'] == 100:
                 raise InvalidComicVineApiKey
 
+            if cache_ttl is not None and result['status_code'] == 1:
+                cv_cache.set(
+                    cache_key,
+                    result,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+
             return result
 
         except (ClientError, ContentTypeError, JSONDecodeError):
+            self.requests_failed = True
+            if cache_ttl is not None:
+                # Better outdated data than no data
+                cached_result = cv_cache.get(cache_key)
+                if cached_result is not None:
+                    LOGGER.debug(
+                        f'Serving stale cached response for {url_path}'
+                    )
+                    return cached_result
+
             if default is not None:
                 return default
             raise CVRateLimitReached
@@ -401,12 +563,12 @@ class ComicVine:
         """
         async def _test_token():
             try:
-                async with AsyncSession() as session:
-                    await self.__call_api(
-                        session,
-                        '/publisher/4010-31',
-                        {'field_list': 'id'}
-                    )
+                session = await get_async_session()
+                await self.__call_api(
+                    session,
+                    '/publisher/4010-31',
+                    {'field_list': 'id'}
+                )
 
             except (CVRateLimitReached, InvalidComicVineApiKey):
                 return False
@@ -435,35 +597,42 @@ class ComicVine:
 
         LOGGER.debug(f'Fetching volume data for {cv_id}')
 
-        async with AsyncSession() as session:
-            result = await self.__call_api(
-                session,
-                f'/volume/{cv_id}',
-                {'field_list': self.volume_field_list}
-            )
+        session = await get_async_session()
+        result = await self.__call_api(
+            session,
+            f'/volume/{cv_id}',
+            {'field_list': self.volume_field_list}
+        )
 
-            volume_info = self.__format_volume_output(result['results'])
+        volume_info = self.__format_volume_output(result['results'])
 
-            LOGGER.debug(f'Fetching issue data for volume {cv_id}')
-            volume_info['issues'] = await self.fetch_issues((cv_id,))
+        LOGGER.debug(f'Fetching issue data for volume {cv_id}')
+        volume_info['issues'] = await self.fetch_issues((cv_id,))
 
-            LOGGER.debug(f'Fetching volume data result: {volume_info}')
+        LOGGER.debug(f'Fetching volume data result: {volume_info}')
 
-            volume_info['cover'] = await self.__call_request(
-                session,
-                volume_info['cover_link']
-            )
-            return volume_info
+        volume_info['cover'] = await self.__call_request(
+            session,
+            volume_info['cover_link']
+        )
+        return volume_info
 
     async def fetch_volumes(
         self,
-        cv_ids: Sequence[Union[str, int]]
+        cv_ids: Sequence[Union[str, int]],
+        known_cover_links: Mapping[int, str] = {}
     ) -> List[VolumeMetadata]:
         """Get the metadata of the volumes from ComicVine, without their issues.
 
         Args:
             cv_ids (Sequence[Union[str, int]]): The CV ID's of the volumes.
 
+            known_cover_links (Mapping[int, str], optional): Map of CV ID's to
+            the link of the cover that is already stored for the volume. If
+            the link is unchanged, the cover isn't fetched again and the
+            `cover` key of the volume is `None`.
+                Defaults to {}.
+
         Returns:
             List[VolumeMetadata]: The metadata of the volumes, without issues.
         """
@@ -475,55 +644,61 @@ class ComicVine:
         LOGGER.debug(f'Fetching volume data for {formatted_cv_ids}')
 
         volume_infos = []
-        batch_brake_time = Constants.CV_BRAKE_TIME * 10
-        async with AsyncSession() as session:
-            # 10 requests of 100 vol per round
-            for request_batch in batched(formatted_cv_ids, 1000):
-
-                if request_batch[0] != formatted_cv_ids[0]:
-                    # From second round on
-                    LOGGER.debug(
-                        f"Waiting {batch_brake_time}s to keep the CV rate limit happy")
-                    await sleep(batch_brake_time)
-
-                # Fetch 10 batches of 100 volumes
-                tasks = [
-                    self.__call_api(
-                        session,
-                        '/volumes',
-                        {
-                            'field_list': self.volume_field_list,
-                            'filter': f'id:{"|".join(id_batch)}'
-                        },
-                        {'results': []}
-                    )
-                    for id_batch in batched(request_batch, 100)
-                ]
-                responses = await gather(*tasks)
-
-                # Format volume responses and prep cover requests
-                cover_map: Dict[int, Any] = {}
-                current_infos: List[VolumeMetadata] = []
-                for batch in responses:
-                    for result in batch['results']:
-                        volume_info = self.__format_volume_output(result)
-                        current_infos.append(volume_info)
-
-                        cover_map[volume_info['comicvine_id']] = self.__call_request(
-                            session, volume_info['cover_link'])
-
-                # Fetch covers and add them to the volume info
-                cover_responses = dict(zip(
-                    cover_map.keys(),
-                    await gather(*cover_map.values())
-                ))
-                for vi in current_infos:
-                    vi['cover'] = cover_responses.get(vi['comicvine_id'])
-
-                # Add volume info of this round to total list
-                volume_infos.extend(current_infos)
+        skipped_covers = 0
+        session = await get_async_session()
+        # 10 requests of 100 vol per round,
+        # paced by the CVRateLimiter
+        for request_batch in batched(formatted_cv_ids, 1000):
+            # Fetch 10 batches of 100 volumes
+            tasks = [
+                self.__call_api(
+                    session,
+                    '/volumes',
+                    {
+                        'field_list': self.volume_field_list,
+                        'filter': f'id:{"|".join(id_batch)}'
+                    },
+                    {'results': []}
+                )
+                for id_batch in batched(request_batch, 100)
+            ]
+            responses = await gather(*tasks)
+
+            # Format volume responses and prep cover requests
+            cover_map: Dict[int, Any] = {}
+            current_infos: List[VolumeMetadata] = []
+            for batch in responses:
+                for result in batch['results']:
+                    volume_info = self.__format_volume_output(result)
+                    current_infos.append(volume_info)
+
+                    if (
+                        known_cover_links.get(volume_info['comicvine_id'])
+                        == volume_info['cover_link']
+                    ):
+                        skipped_covers += 1
+                        continue
+
+                    cover_map[volume_info['comicvine_id']] = self.__call_request(
+                        session, volume_info['cover_link'])
+
+            # Fetch covers and add them to the volume info
+            cover_responses = dict(zip(
+                cover_map.keys(),
+                await gather(*cover_map.values())
+            ))
+            for vi in current_infos:
+                vi['cover'] = cover_responses.get(vi['comicvine_id'])
+
+            # Add volume info of this round to total list
+            volume_infos.extend(current_infos)
+
+        if skipped_covers:
+            LOGGER.info(
+                f'Skipped fetching {skipped_covers} unchanged covers'
+            )
 
-            return volume_infos
+        return volume_infos
 
     async def fetch_issues(
         self,
@@ -546,60 +721,155 @@ class ComicVine:
         LOGGER.debug(f'Fetching issue data for volumes {formatted_cv_ids}')
 
         issue_infos = []
-        batch_brake_time = Constants.CV_BRAKE_TIME * 10
-        async with AsyncSession() as session:
-            for id_batch in batched(formatted_cv_ids, 50):
-                try:
-                    results = await self.__call_api(
-                        session,
-                        '/issues',
-                        {'field_list': self.issue_field_list,
-                        'filter': f'volume:{"|".join(id_batch)}'}
-                    )
-
-                except CVRateLimitReached:
-                    break
+        session = await get_async_session()
+        for id_batch in batched(formatted_cv_ids, 50):
+            try:
+                results = await self.__call_api(
+                    session,
+                    '/issues',
+                    {'field_list': self.issue_field_list,
+                    'filter': f'volume:{"|".join(id_batch)}'}
+                )
 
-                issue_infos += [
-                    self.__format_issue_output(r)
-                    for r in results['results']
-                ]
+            except CVRateLimitReached:
+                break
 
-                if results['number_of_total_results'] > 100:
+            issue_infos += [
+                self.__format_issue_output(r)
+                for r in results['results']
+            ]
 
-                    for offset_batch in batched(
-                        range(100, results['number_of_total_results'], 100),
-                        10
-                    ):
+            if results['number_of_total_results'] > 100:
 
-                        if offset_batch[0] != 100:
-                            # From second round on
-                            LOGGER.debug(
-                                f"Waiting {batch_brake_time}s to keep the CV rate limit happy")
-                            await sleep(batch_brake_time)
-
-                        tasks = [
-                            self.__call_api(
-                                session,
-                                '/issues',
-                                {
-                                    'field_list': self.issue_field_list,
-                                    'filter': f'volume:{"|".join(id_batch)}',
-                                    'offset': offset
-                                },
-                                {'results': []}
-                            )
-                            for offset in offset_batch
+                for offset_batch in batched(
+                    range(100, results['number_of_total_results'], 100),
+                    10
+                ):
+                    tasks = [
+                        self.__call_api(
+                            session,
+                            '/issues',
+                            {
+                                'field_list': self.issue_field_list,
+                                'filter': f'volume:{"|".join(id_batch)}',
+                                'offset': offset
+                            },
+                            {'results': []}
+                        )
+                        for offset in offset_batch
+                    ]
+                    responses = await gather(*tasks)
+
+                    for batch in responses:
+                        issue_infos += [
+                            self.__format_issue_output(r)
+                            for r in batch['results']
                         ]
-                        responses = await gather(*tasks)
 
-                        for batch in responses:
-                            issue_infos += [
-                                self.__format_issue_output(r)
-                                for r in batch['results']
-                            ]
+        return issue_infos
 
-            return issue_infos
+    async def fetch_changed_volumes(
+        self,
+        cv_ids: Sequence[Union[str, int]],
+        since: datetime
+    ) -> Set[int]:
+        """Find out which of the volumes, or the issues inside them, have been
+        updated on ComicVine since the given time. The amount of requests
+        scales with the amount of changes on CV, but never exceeds the amount
+        needed to check each volume.
+
+        Args:
+            cv_ids (Sequence[Union[str, int]]): The CV ID's of the volumes.
+            since (datetime): The time to look for changes since.
+
+        Raises:
+            CVRateLimitReached: The ComicVine rate limit is reached.
+
+        Returns:
+            Set[int]: The CV ID's of the volumes that have changed.
+        """
+        try:
+            formatted_cv_ids = to_string_cv_id(cv_ids)
+        except ValueError:
+            raise VolumeNotMatched
+
+        date_format = '%Y-%m-%d %H:%M:%S'
+        date_filter = (
+            'date_last_updated:'
+            + since.strftime(date_format)
+            + '|'
+            + (datetime.now() + timedelta(days=1)).strftime(date_format)
+        )
+
+        LOGGER.debug(f'Fetching volumes changed on CV since {since}')
+
+        changed_cv_ids: Set[int] = set()
+        session = await get_async_session()
+        for url_path, id_field, batch_size, get_volume_id in (
+            ('/volumes', 'id', 100, lambda r: r['id']),
+            ('/issues', 'volume', 50, lambda r: r['volume']['id'])
+        ):
+            params = {
+                'field_list': id_field,
+                'filter': date_filter,
+                'sort': 'id:asc'
+            }
+
+            # First page of all changes on CV, to see how many there are
+            response = await self.__call_api(
+                session, url_path, params, cache=False
+            )
+            changed_cv_ids.update(
+                get_volume_id(r) for r in response['results']
+            )
+
+            offsets = range(100, response['number_of_total_results'], 100)
+            library_batches = tuple(batched(formatted_cv_ids, batch_size))
+            if len(offsets) <= len(library_batches):
+                # Go through all changes on CV
+                responses = await gather(*(
+                    self.__call_api(
+                        session,
+                        url_path,
+                        {**params, 'offset': offset},
+                        cache=False
+                    )
+                    for offset in offsets
+                ))
+                for response in responses:
+                    changed_cv_ids.update(
+                        get_volume_id(r) for r in response['results']
+                    )
+                continue
+
+            # More changes on CV than volumes in the library, so only
+            # check the volumes in the library
+            responses = await gather(*(
+                self.__call_api(
+                    session,
+                    url_path,
+                    {
+                        **params,
+                        'filter': f'{id_field}:{"|".join(id_batch)},{date_filter}'
+                    },
+                    cache=False
+                )
+                for id_batch in library_batches
+            ))
+            for id_batch, response in zip(library_batches, responses):
+                if (
+                    response['number_of_total_results']
+                    > len(response['results'])
+                ):
+                    # Too many changes to fit in one response,
+                    # so just consider all volumes changed
+                    changed_cv_ids.update(int(i) for i in id_batch)
+                else:
+                    changed_cv_ids.update(
+                        get_volume_id(r) for r in response['results']
+                    )
+
+        return changed_cv_ids.intersection(int(i) for i in formatted_cv_ids)
 
     async def search_volumes(
         self,
@@ -626,25 +896,25 @@ class ComicVine:
                 if not query:
                     return []
 
-                async with AsyncSession() as session:
-                    results = [(await self.__call_api(
-                        session,
-                        f'/volume/{query}',
-                        {'field_list': self.search_field_list}
-                    ))['results']]
+                session = await get_async_session()
+                results = [(await self.__call_api(
+                    session,
+                    f'/volume/{query}',
+                    {'field_list': self.search_field_list}
+                ))['results']]
 
             else:
-                async with AsyncSession() as session:
-                    results = (await self.__call_api(
-                        session,
-                        '/search',
-                        {
-                            'query': query,
-                            'resources': 'volume',
-                            'limit': 50,
-                            'field_list': self.search_field_list
-                        }
-                    ))['results']
+                session = await get_async_session()
+                results = (await self.__call_api(
+                    session,
+                    '/search',
+                    {
+                        'query': query,
+                        'resources': 'volume',
+                        'limit': 50,
+                        'field_list': self.search_field_list
+                    }
+                ))['results']
 
         except CVRateLimitReached:
             return []
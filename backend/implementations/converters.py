@@ -68,7 +68,7 @@ def extract_files_from_folder(
 
     volume = Volume(volume_id)
     volume_data = volume.get_data()
-    volume_issues = volume.get_issues()
+    volume_issues = volume.get_issue_index().issues
     end_year = volume.get_ending_year() or volume_data.year
 
     # Filter non-relevant files
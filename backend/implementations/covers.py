@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Storing the covers of volumes on disk, addressed by the hash of their content,
+and generating thumbnails of them.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from os import replace
+from os.path import dirname, exists, join
+from typing import Iterable, Union
+
+from PIL import Image
+
+from backend.base.definitions import Constants
+from backend.base.files import create_folder, delete_file_folder
+from backend.base.logging import LOGGER
+from backend.internals.db import DBConnection, get_db
+
+thumbnail_executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="cover_thumbnails"
+)
+
+
+def _get_cover_folder(cover_hash: str) -> str:
+    """Get the folder that the cover and its thumbnails are stored in.
+
+    Args:
+        cover_hash (str): The hash of the cover.
+
+    Returns:
+        str: The folder.
+    """
+    return join(
+        dirname(DBConnection.file),
+        Constants.COVERS_FOLDER,
+        cover_hash[:2]
+    )
+
+
+def _get_thumbnail_path(cover_hash: str, width: int) -> str:
+    return join(_get_cover_folder(cover_hash), f'{cover_hash}_{width}.jpg')
+
+
+def get_cover_path(
+    cover_hash: str,
+    size: Union[int, None] = None
+) -> str:
+    """Get the path to a cover file.
+
+    Args:
+        cover_hash (str): The hash of the cover.
+
+        size (Union[int, None], optional): The minimum width that is needed.
+        The smallest thumbnail that is at least this wide is selected. Give
+        `None` for the original cover.
+            Defaults to None.
+
+    Returns:
+        str: The path to the file. If no fitting thumbnail is available,
+        the path to the original cover.
+    """
+    if size is not None:
+        for width in sorted(Constants.COVER_THUMBNAIL_SIZES):
+            if width < size:
+                continue
+
+            thumbnail_path = _get_thumbnail_path(cover_hash, width)
+            if exists(thumbnail_path):
+                return thumbnail_path
+            break
+
+    return join(_get_cover_folder(cover_hash), f'{cover_hash}.jpg')
+
+
+def _generate_thumbnails(cover_hash: str) -> None:
+    """Generate the thumbnails of a cover. Sizes larger than the cover itself
+    are skipped.
+
+    Args:
+        cover_hash (str): The hash of the cover.
+    """
+    try:
+        with Image.open(get_cover_path(cover_hash)) as image:
+            image = image.convert('RGB')
+            for width in Constants.COVER_THUMBNAIL_SIZES:
+                thumbnail_path = _get_thumbnail_path(cover_hash, width)
+                if width >= image.width or exists(thumbnail_path):
+                    continue
+
+                thumbnail = image.resize((
+                    width,
+                    round(image.height * width / image.width)
+                ))
+                thumbnail.save(thumbnail_path + '.tmp', 'JPEG', quality=85)
+                replace(thumbnail_path + '.tmp', thumbnail_path)
+
+    except OSError:
+        LOGGER.exception(
+            "Failed to generate thumbnails of cover %s: ",
+            cover_hash
+        )
+
+    return
+
+
+def store_cover(cover: bytes) -> str:
+    """Store a cover on disk, if it isn't already, and start generating the
+    thumbnails of it in the background.
+
+    Args:
+        cover (bytes): The content of the cover.
+
+    Returns:
+        str: The hash of the cover, to be used as the reference to it.
+    """
+    cover_hash = sha256(cover).hexdigest()
+    cover_path = get_cover_path(cover_hash)
+    if exists(cover_path):
+        return cover_hash
+
+    create_folder(dirname(cover_path))
+    with open(cover_path + '.tmp', 'wb') as f:
+        f.write(cover)
+    replace(cover_path + '.tmp', cover_path)
+
+    thumbnail_executor.submit(_generate_thumbnails, cover_hash)
+    return cover_hash
+
+
+def delete_unused_covers(cover_hashes: Iterable[str]) -> None:
+    """Delete covers from disk if they're not used by any volume anymore.
+
+    Args:
+        cover_hashes (Iterable[str]): The hashes of the covers to check.
+    """
+    cursor = get_db()
+    for cover_hash in set(cover_hashes):
+        if cursor.execute(
+            "SELECT 1 FROM volume_covers WHERE cover_hash = ? LIMIT 1;",
+            (cover_hash,)
+        ).exists():
+            continue
+
+        LOGGER.debug(f'Deleting unused cover {cover_hash}')
+        for width in Constants.COVER_THUMBNAIL_SIZES:
+            delete_file_folder(_get_thumbnail_path(cover_hash, width))
+        delete_file_folder(get_cover_path(cover_hash))
+
+    return
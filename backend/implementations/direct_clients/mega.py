@@ -1,16 +1,21 @@
 # -*- coding: utf-8 -*-
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from base64 import b64decode, b64encode
+from concurrent.futures import Future, ThreadPoolExecutor
 from hashlib import pbkdf2_hmac
 from json import JSONDecodeError, dumps, loads
 from random import randint
 from re import compile, search
-from time import perf_counter, time
-from typing import Any, Callable, Dict, Generator, List, Sequence, Tuple, Union
+from time import time
+from typing import (IO, Any, Callable, Dict, Generator, List, Sequence, Tuple,
+                    Union)
 from zipfile import ZIP_DEFLATED, ZipFile
 
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers import (Cipher, CipherContext,
+                                                    algorithms, modes)
 from requests.exceptions import (JSONDecodeError as RequestsJSONDecodeError,
                                  RetryError)
 from urllib3.exceptions import ProtocolError, TimeoutError
@@ -21,7 +26,7 @@ from backend.base.custom_exceptions import (ClientNotWorking,
 from backend.base.definitions import (BaseEnum, BrokenClientReason, Constants,
                                       CredentialData, CredentialSource,
                                       DownloadSource)
-from backend.base.helpers import Session
+from backend.base.helpers import SpeedMeter, get_session
 from backend.base.logging import LOGGER
 from backend.implementations.credentials import Credentials
 
@@ -223,29 +228,43 @@ class MegaCrypto:
         Interface for checking CBC-MAC checksum.
         """
 
-        def __init__(self, key: Sequence[int]) -> None:
+        def __init__(
+            self,
+            key: Sequence[int],
+            state: Union[bytes, None] = None
+        ) -> None:
+            """Start a checksum.
+
+            Args:
+                key (Sequence[int]): The key of the file.
+
+                state (Union[bytes, None], optional): The hash of an earlier
+                checksum to continue from. Give `None` to start a new one.
+                    Defaults to None.
+            """
             k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
-            self.hash = b"\0" * 16
-            self.key = MegaCrypto.a32_to_bytes(k)
+            self.hash = state or b"\0" * 16
+            self.key = algorithms.AES(MegaCrypto.a32_to_bytes(k))
             self.iv = MegaCrypto.a32_to_bytes(iv[0:2] * 2)
 
             self.AES = Cipher(
-                algorithms.AES(self.key),
+                self.key,
                 modes.CBC(self.hash)
             ).encryptor()
             return
 
         def update(self, chunk: bytes) -> None:
+            if len(chunk) % 16:
+                # Only the last chunk of a file can end with a partial block
+                chunk = chunk + b"\0" * (16 - len(chunk) % 16)
+
+            # The MAC of the chunk is the last block of its CBC encryption,
+            # so encrypt the chunk in one go instead of block by block.
             encryptor = Cipher(
-                algorithms.AES(self.key),
+                self.key,
                 modes.CBC(self.iv)
             ).encryptor()
-
-            hash = b''
-            for j in range(0, len(chunk), 16):
-                block = chunk[j: j + 16].ljust(16, b"\0")
-                hash = encryptor.update(block)
-
+            hash = encryptor.update(chunk)[-16:]
             encryptor.finalize()
 
             self.hash = self.AES.update(hash)
@@ -260,6 +279,71 @@ class MegaCrypto:
             return d[0] ^ d[1], d[2] ^ d[3]
 
 
+class MegaChunkProcessor:
+    """
+    Decrypts, checksums and writes the chunks of a file on a worker thread,
+    so that the next chunk can be downloaded in the meantime.
+    """
+
+    def __init__(
+        self,
+        decryptor: CipherContext,
+        cbc_mac: MegaCrypto.Checksum,
+        file: IO[bytes]
+    ) -> None:
+        self.decryptor = decryptor
+        self.cbc_mac = cbc_mac
+        self.file = file
+
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="MegaChunkProcessor"
+        )
+        self.__pending: Union[Future[bytes], None] = None
+        return
+
+    def __process(self, chunk: bytes) -> bytes:
+        chunk = self.decryptor.update(chunk)
+        self.file.write(chunk)
+        self.cbc_mac.update(chunk)
+        return self.cbc_mac.hash
+
+    def submit(self, chunk: bytes) -> Union[bytes, None]:
+        """Start processing a chunk, once the previous one is done.
+
+        Args:
+            chunk (bytes): The encrypted chunk.
+
+        Returns:
+            Union[bytes, None]: The checksum state after the previous chunk,
+            or `None` if there was none.
+        """
+        mac_state = self.wait()
+        self.__pending = self.__executor.submit(self.__process, chunk)
+        return mac_state
+
+    def wait(self) -> Union[bytes, None]:
+        """Wait for the chunk that is being processed.
+
+        Returns:
+            Union[bytes, None]: The checksum state after the chunk, or `None`
+            if no chunk was being processed.
+        """
+        if self.__pending is None:
+            return None
+
+        pending, self.__pending = self.__pending, None
+        return pending.result()
+
+    def __enter__(self) -> MegaChunkProcessor:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.__executor.shutdown(wait=True)
+        self.__pending = None
+        return
+
+
 class MegaAPIClient:
     def __init__(
         self,
@@ -289,13 +373,12 @@ class MegaAPIClient:
         if self.node_id:
             get_params["n"] = self.node_id
 
-        with Session() as session:
-            response = session.post(
-                Constants.MEGA_API_URL,
-                params=get_params,
-                data=dumps([kwargs]),
-                headers={'User-Agent': Constants.BROWSER_USERAGENT}
-            ).json()
+        response = get_session().post(
+            Constants.MEGA_API_URL,
+            params=get_params,
+            data=dumps([kwargs]),
+            headers={'User-Agent': Constants.BROWSER_USERAGENT}
+        ).json()
 
         self.id += 1
 
@@ -548,6 +631,14 @@ class MegaABC(ABC):
     pure_link: str
     mega_filename: str
 
+    resumable: bool = False
+    """
+    Whether the download can be continued from `size_downloaded` and
+    `mac_state`, which are kept up to date while downloading.
+    """
+    size_downloaded: int = 0
+    mac_state: Union[bytes, None] = None
+
     @abstractmethod
     def __init__(self, download_link: str) -> None:
         ...
@@ -566,6 +657,8 @@ class MegaABC(ABC):
 
 
 class Mega(MegaABC):
+    resumable = True
+
     def __init__(self, download_link: str) -> None:
         self.client = MegaAPIClient()
         self.download_link = download_link
@@ -684,24 +777,36 @@ class Mega(MegaABC):
     ) -> None:
         websocket_updater()
         self.downloading = True
-        size_downloaded = 0
+        size_downloaded = self.size_downloaded
+        self.progress = round(size_downloaded / self.size * 100, 2)
 
         k, iv, meta_mac = MegaCrypto.get_cipher_key(
             self.__master_key
         )
+        # The counter of CTR mode increments per block of 16 bytes,
+        # so start it at the block that is resumed from.
+        counter = (
+            int.from_bytes(MegaCrypto.a32_to_bytes(iv), 'big')
+            + size_downloaded // 16
+        )
         decryptor = Cipher(
             algorithms.AES(MegaCrypto.a32_to_bytes(k)),
-            modes.CTR(MegaCrypto.a32_to_bytes(iv))
+            modes.CTR(counter.to_bytes(16, 'big'))
         ).decryptor()
-        cbc_mac = MegaCrypto.Checksum(self.__master_key)
+        cbc_mac = MegaCrypto.Checksum(self.__master_key, self.mac_state)
 
-        start_time = perf_counter()
+        speed_meter = SpeedMeter()
         tries_left = Constants.TOTAL_RETRIES
-        with open(filename, 'wb') as f:
+        with \
+            open(filename, 'r+b' if size_downloaded else 'wb') as f, \
+            MegaChunkProcessor(decryptor, cbc_mac, f) as processor:
+
+            f.seek(size_downloaded)
+            f.truncate()
             while tries_left > 0:
                 tries_left -= 1
 
-                with Session().get(
+                with get_session().get(
                     f'{self.pure_link}/{size_downloaded}-',
                     stream=True
                 ).raw as r:
@@ -727,20 +832,18 @@ class Mega(MegaABC):
                             # Download limit reached mid download
                             raise DownloadLimitReached(DownloadSource.MEGA)
 
-                        chunk = decryptor.update(chunk)
-                        f.write(chunk)
-                        cbc_mac.update(chunk)
+                        mac_state = processor.submit(chunk)
+                        if mac_state is not None:
+                            # Everything before this chunk is processed
+                            self.size_downloaded = size_downloaded
+                            self.mac_state = mac_state
 
                         size_downloaded += chunk_size
-                        self.speed = round(
-                            chunk_size / (perf_counter() - start_time),
-                            2
-                        )
+                        self.speed = round(speed_meter.add(chunk_size), 2)
                         self.progress = round(
                             size_downloaded / self.size * 100,
                             2
                         )
-                        start_time = perf_counter()
                         websocket_updater()
 
                     else:
@@ -753,6 +856,11 @@ class Mega(MegaABC):
                 # Failed to download file
                 raise ClientNotWorking(BrokenClientReason.CONNECTION_ERROR)
 
+            mac_state = processor.wait()
+            if mac_state is not None:
+                self.size_downloaded = size_downloaded
+                self.mac_state = mac_state
+
         if self.downloading:
             if cbc_mac.digest() != meta_mac:
                 raise ClientNotWorking(
@@ -859,6 +967,7 @@ class MegaFolder(MegaABC):
         websocket_updater()
         self.downloading = True
         size_downloaded = 0
+        speed_meter = SpeedMeter()
 
         with ZipFile(filename, 'w', ZIP_DEFLATED) as zip:
             for file in self.files:
@@ -897,13 +1006,15 @@ class MegaFolder(MegaABC):
 
                 self.pure_link = res['g']
                 file_size_downloaded = 0
-                start_time = perf_counter()
                 tries_left = Constants.TOTAL_RETRIES
-                with zip.open(file["name"], "w", force_zip64=True) as f:
+                with \
+                    zip.open(file["name"], "w", force_zip64=True) as f, \
+                    MegaChunkProcessor(decryptor, cbc_mac, f) as processor:
+
                     while tries_left > 0:
                         tries_left -= 1
 
-                        with Session().get(
+                        with get_session().get(
                             f'{self.pure_link}/{file_size_downloaded}-',
                             stream=True
                         ).raw as r:
@@ -930,23 +1041,18 @@ class MegaFolder(MegaABC):
                                         DownloadSource.MEGA
                                     )
 
-                                chunk = decryptor.update(chunk)
-                                f.write(chunk)
-                                cbc_mac.update(chunk)
+                                processor.submit(chunk)
 
                                 size_downloaded += chunk_size
                                 file_size_downloaded += chunk_size
                                 self.speed = round(
-                                    chunk_size
-                                    /
-                                    (perf_counter() - start_time),
+                                    speed_meter.add(chunk_size),
                                     2
                                 )
                                 self.progress = round(
                                     size_downloaded / self.size * 100,
                                     2
                                 )
-                                start_time = perf_counter()
                                 websocket_updater()
 
                             else:
@@ -961,6 +1067,8 @@ class MegaFolder(MegaABC):
                             BrokenClientReason.CONNECTION_ERROR
                         )
 
+                    processor.wait()
+
                 if self.downloading:
                     if cbc_mac.digest() != meta_mac:
                         raise ClientNotWorking(
@@ -7,10 +7,11 @@ All download implementations.
 from __future__ import annotations
 
 from base64 import b64decode, b64encode
-from os.path import basename, join, sep, splitext
+from concurrent.futures import ThreadPoolExecutor, wait
+from os.path import basename, getsize, isfile, join, sep, splitext
 from re import IGNORECASE, compile
-from threading import Event, Thread
-from time import perf_counter
+from threading import Event, Lock, Thread
+from time import monotonic
 from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Type, Union, final
 from urllib.parse import unquote_plus
 
@@ -21,12 +22,15 @@ from backend.base.custom_exceptions import (ClientNotWorking,
                                             CredentialInvalid,
                                             DownloadLimitReached,
                                             IssueNotFound, LinkBroken)
-from backend.base.definitions import (BrokenClientReason, Constants,
+from backend.base.definitions import (DOWNLOAD_SOURCE_SEGMENT_LIMITS,
+                                      BrokenClientReason, Constants,
                                       CredentialSource, Download,
                                       DownloadSource, DownloadState,
                                       DownloadType, ExternalDownload,
                                       ExternalDownloadClient)
-from backend.base.helpers import Session, first_of_range, get_torrent_info
+from backend.base.files import preallocate_file
+from backend.base.helpers import (SpeedMeter, first_of_range, get_session,
+                                  get_torrent_info)
 from backend.base.logging import LOGGER
 from backend.implementations.credentials import Credentials
 from backend.implementations.direct_clients.mega import (Mega, MegaABC,
@@ -35,6 +39,8 @@ from backend.implementations.external_clients import ExternalClients
 from backend.implementations.naming import generate_issue_name
 from backend.implementations.remote_mapping import RemoteMappings
 from backend.implementations.volumes import Issue, Volume
+from backend.internals.db import commit
+from backend.internals.db_models import DownloadProgressDB
 from backend.internals.server import WebSocket
 from backend.internals.settings import Settings
 
@@ -54,6 +60,14 @@ WETRANSFER_API_LINK = "https://wetransfer.com/api/v4/transfers/{transfer_id}/dow
 
 # region Base Direct Download
 class BaseDirectDownload(Download):
+    segmentable: bool = False
+    """
+    Whether the file can be downloaded in multiple segments simultaneously
+    using range requests. The amount of segments is set with the
+    `direct_download_segments` setting, limited per source by
+    `DOWNLOAD_SOURCE_SEGMENT_LIMITS`.
+    """
+
     @property
     def id(self) -> int:
         return self._id # type: ignore
@@ -178,7 +192,8 @@ class BaseDirectDownload(Download):
         settings = Settings().sv
         volume = Volume(volume_id)
 
-        self.__r = None
+        self.__responses: List[Response] = []
+        self.__progress_lock = Lock()
         self._download_link = download_link
         self._volume_id = volume_id
         self._issue_id = None
@@ -196,7 +211,7 @@ class BaseDirectDownload(Download):
         self._download_thread = None
         self._download_folder = settings.download_folder
 
-        self._ssn = Session()
+        self._ssn = get_session()
 
         # Create and fetch pure link to extract last info
         # This can fail if the link is broken, so do before other
@@ -206,7 +221,6 @@ class BaseDirectDownload(Download):
             self._pure_link = self._convert_to_pure_link()
             with self._fetch_pure_link() as response:
                 response.raise_for_status()
-                self._ssn.close()
 
         except RequestException as e:
             if (
@@ -220,6 +234,11 @@ class BaseDirectDownload(Download):
             raise LinkBroken(download_link)
 
         self._size = int(response.headers.get('Content-Length', -1))
+        self._accept_ranges = (
+            response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        )
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
 
         self._filename_body = ''
         try:
@@ -249,8 +268,23 @@ class BaseDirectDownload(Download):
     def _convert_to_pure_link(self) -> str:
         return self.download_link
 
-    def _fetch_pure_link(self) -> Response:
-        return self._ssn.get(self.pure_link, stream=True)
+    def _fetch_pure_link(
+        self,
+        byte_range: Union[Tuple[int, int], None] = None
+    ) -> Response:
+        return self._ssn.get(
+            self.pure_link,
+            headers=self._get_range_header(byte_range),
+            stream=True
+        )
+
+    @staticmethod
+    def _get_range_header(
+        byte_range: Union[Tuple[int, int], None]
+    ) -> Dict[str, str]:
+        if byte_range is None:
+            return {}
+        return {'Range': f'bytes={byte_range[0]}-{byte_range[1]}'}
 
     def _extract_default_filename_body(
         self,
@@ -291,18 +325,106 @@ class BaseDirectDownload(Download):
             '_'.join(self._filename_body.split(sep)) + extension
         )
 
-    def run(self) -> None:
-        self._state = DownloadState.DOWNLOADING_STATE
-        size_downloaded = 0
-        ws = WebSocket()
-        ws.update_queue_status(self)
+    def _get_segment_count(self) -> int:
+        """Get the amount of segments to download the file in.
+
+        Returns:
+            int: The amount of segments. 0 when the server doesn't support
+            range requests, so the file has to be downloaded in a single
+            stream without them.
+        """
+        if not (self._accept_ranges and self.size > 0):
+            return 0
 
+        if not self.segmentable:
+            return 1
+
+        segments = Settings().sv.direct_download_segments
+        return max(1, min(
+            segments,
+            DOWNLOAD_SOURCE_SEGMENT_LIMITS.get(self.source_type, segments),
+            self.size // Constants.MIN_DOWNLOAD_SEGMENT_SIZE
+        ))
+
+    def __register_progress(
+        self,
+        amount: int,
+        segment: Union[int, None] = None
+    ) -> None:
+        with self.__progress_lock:
+            if segment is not None:
+                self.__written[segment] += amount
+            self.__size_downloaded += amount
+            self._speed = round(self.__speed_meter.add(amount), 2)
+            if self.size == -1:
+                # No file size so progress is amount downloaded
+                self._progress = self.__size_downloaded
+            else:
+                self._progress = round(
+                    self.__size_downloaded / self.size * 100,
+                    2
+                )
+
+        WebSocket().report_queue_progress(self)
+        return
+
+    def __reset_progress(self) -> None:
+        self.__size_downloaded = 0
+        self.__written: List[int] = []
+        self.__speed_meter = SpeedMeter()
+        self._progress = 0.0
+        self._speed = 0.0
+        return
+
+    def __save_progress(self) -> None:
+        "Store how far the segments are, so that the download can be resumed"
+        with self.__progress_lock:
+            written = list(self.__written)
+
+        DownloadProgressDB.update(
+            self.id,
+            self.size,
+            self._etag,
+            self._last_modified,
+            written
+        )
+        commit()
+        return
+
+    def __load_progress(self) -> Union[List[int], None]:
+        """Get the stored progress of an earlier run of the download, if it
+        can be resumed.
+
+        Returns:
+            Union[List[int], None]: The amount of bytes written per segment,
+            or `None` if the download can't be resumed.
+        """
+        progress = DownloadProgressDB.fetch(self.id)
+        if progress is None:
+            return None
+
+        if (
+            progress["size"] != self.size
+            or progress["etag"] != self._etag
+            or progress["last_modified"] != self._last_modified
+            or not self._get_segment_count()
+            or not isfile(self.files[0])
+            or getsize(self.files[0]) != self.size
+        ):
+            # File changed at the server, or the partial file is gone
+            DownloadProgressDB.delete(self.id)
+            commit()
+            return None
+
+        return progress["written"]
+
+    def __download_single(self) -> None:
+        "Download the file in a single stream"
         with \
             self._fetch_pure_link() as r, \
             open(self.files[0], 'wb') as f:
 
-            self.__r = r
-            start_time = perf_counter()
+            self.__responses.append(r)
             try:
                 for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     if self.state in (
@@ -312,33 +434,175 @@ class BaseDirectDownload(Download):
                         break
 
                     f.write(chunk)
-
-                    # Update progress
-                    chunk_size = len(chunk)
-                    size_downloaded += chunk_size
-                    self._speed = round(
-                        chunk_size / (perf_counter() - start_time),
-                        2
-                    )
-                    if self.size == -1:
-                        # No file size so progress is amount downloaded
-                        self._progress = size_downloaded
-                    else:
-                        self._progress = round(
-                            size_downloaded / self.size * 100,
-                            2
-                        )
-
-                    start_time = perf_counter()
-                    ws.update_queue_status(self)
+                    self.__register_progress(len(chunk))
 
             except RequestException:
                 self._state = DownloadState.FAILED_STATE
 
             finally:
-                self.__r = None
+                self.__responses.remove(r)
+
+        return
+
+    def __download_segment(
+        self,
+        segment: int,
+        end: int,
+        abort: Event
+    ) -> bool:
+        """Download the remaining part of a segment of the file and write it
+        at its position in the file.
+
+        Args:
+            segment (int): The index of the segment.
+            end (int): The position of the last byte of the segment.
+            abort (Event): Set when the other segments should stop.
+
+        Returns:
+            bool: Whether the server honoured the range request.
+        """
+        start = self.size * segment // len(self.__written)
+        start += self.__written[segment]
+        if start > end:
+            # Already downloaded in an earlier run
+            return True
+
+        try:
+            with self._fetch_pure_link((start, end)) as r:
+                if r.status_code != 206:
+                    abort.set()
+                    return False
+
+                self.__responses.append(r)
+                try:
+                    with open(self.files[0], 'r+b') as f:
+                        f.seek(start)
+                        remaining = end - start + 1
+                        for chunk in r.iter_content(
+                            chunk_size=DOWNLOAD_CHUNK_SIZE
+                        ):
+                            if abort.is_set() or self.state in (
+                                DownloadState.CANCELED_STATE,
+                                DownloadState.SHUTDOWN_STATE
+                            ):
+                                break
+
+                            chunk = chunk[:remaining]
+                            f.write(chunk)
+                            remaining -= len(chunk)
+                            self.__register_progress(len(chunk), segment)
+
+                            if not remaining:
+                                break
+
+                finally:
+                    self.__responses.remove(r)
+
+        except RequestException:
+            self._state = DownloadState.FAILED_STATE
+            abort.set()
+
+        return True
+
+    def __download_segmented(
+        self,
+        segments: int,
+        written: Union[List[int], None] = None
+    ) -> bool:
+        """Download the file in one or more segments simultaneously, using
+        range requests. The progress is stored regularly, so that the download
+        can be resumed later.
+
+        Args:
+            segments (int): The amount of segments.
+
+            written (Union[List[int], None], optional): The amount of bytes
+            per segment that were already written in an earlier run. Give
+            `None` to start from the beginning.
+                Defaults to None.
+
+        Returns:
+            bool: Whether the file was downloaded using range requests.
+            `False` if the server didn't honour them after all, in which case
+            the file should be downloaded in a single stream instead.
+        """
+        if written is None:
+            LOGGER.debug(
+                'Downloading %s in %d segments',
+                self.pure_link, segments
+            )
+            preallocate_file(self.files[0], self.size)
+            self.__written = [0] * segments
+
+        else:
+            LOGGER.info(
+                f'Resuming download {self.id} at {sum(written)} bytes'
+            )
+            self.__written = written
+            self.__size_downloaded = sum(written)
+            self._progress = round(self.__size_downloaded / self.size * 100, 2)
+
+        abort = Event()
+        with ThreadPoolExecutor(
+            max_workers=len(self.__written),
+            thread_name_prefix=f"download_{self.id}_segment"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self.__download_segment,
+                    segment,
+                    self.size * (segment + 1) // len(self.__written) - 1,
+                    abort
+                )
+                for segment in range(len(self.__written))
+            ]
+            while wait(
+                futures,
+                timeout=Constants.DOWNLOAD_PROGRESS_SAVE_INTERVAL
+            ).not_done:
+                self.__save_progress()
+
+        if (
+            all(f.result() for f in futures)
+            or self.state != DownloadState.DOWNLOADING_STATE
+        ):
+            return True
+
+        LOGGER.debug(
+            'Range requests refused for %s, downloading in a single stream',
+            self.pure_link
+        )
+        DownloadProgressDB.delete(self.id)
+        commit()
+        self.__reset_progress()
+        return False
+
+    def run(self) -> None:
+        self._state = DownloadState.DOWNLOADING_STATE
+        self.__reset_progress()
+        ws = WebSocket()
+        ws.update_queue_status(self)
+
+        written = self.__load_progress()
+        if written is not None:
+            use_ranges = self.__download_segmented(len(written), written)
+        else:
+            segments = self._get_segment_count()
+            use_ranges = (
+                segments > 0
+                and self.__download_segmented(segments)
+            )
+
+        if not use_ranges:
+            self.__download_single()
+
+        if self.state == DownloadState.SHUTDOWN_STATE:
+            if use_ranges:
+                # Keep the partial file to resume from after the restart
+                self.__save_progress()
+            return
 
-        if self.size != -1 and size_downloaded != self.size:
+        if self.size != -1 and self.__size_downloaded != self.size:
             # Download completed, but downloaded size is not equal
             # to reported size of file
             self._state = DownloadState.FAILED_STATE
@@ -349,12 +613,12 @@ class BaseDirectDownload(Download):
         state: DownloadState = DownloadState.CANCELED_STATE
     ) -> None:
         self._state = state
-        if (
-            self.__r
-            and self.__r.raw._fp
-            and not isinstance(self.__r.raw._fp, str)
-        ):
-            self.__r.raw._fp.fp.raw._sock.shutdown(2) # SHUT_RDWR
+        for r in tuple(self.__responses):
+            if (
+                r.raw._fp
+                and not isinstance(r.raw._fp, str)
+            ):
+                r.raw._fp.fp.raw._sock.shutdown(2) # SHUT_RDWR
         return
 
     def as_dict(self) -> Dict[str, Any]:
@@ -390,6 +654,7 @@ class DirectDownload(BaseDirectDownload):
     "For downloading a file directly from a link"
 
     identifier: str = 'direct'
+    segmentable: bool = True
 
 
 # region MediaFire
@@ -398,6 +663,7 @@ class MediaFireDownload(BaseDirectDownload):
     "For downloading a MediaFire file"
 
     identifier: str = 'mf'
+    segmentable: bool = True
 
     def _convert_to_pure_link(self) -> str:
         r = self._ssn.get(
@@ -433,7 +699,10 @@ class MediaFireFolderDownload(BaseDirectDownload):
     def _convert_to_pure_link(self) -> str:
         return self.download_link.split("/folder/")[1].split("/")[0]
 
-    def _fetch_pure_link(self) -> Response:
+    def _fetch_pure_link(
+        self,
+        byte_range: Union[Tuple[int, int], None] = None
+    ) -> Response:
         return self._ssn.post(
             MEDIAFIRE_FOLDER_LINK,
             files={
@@ -479,48 +748,49 @@ class PixelDrainDownload(BaseDirectDownload):
     "For downloading a file from PixelDrain"
 
     identifier: str = "pd"
+    segmentable: bool = True
 
     @staticmethod
     def login(api_key: str) -> None:
         LOGGER.debug("Logging into Pixeldrain with user api key")
-        with Session() as session:
-            enc_api_key = b64encode(
-                f":{api_key}".encode()
-            ).decode()
+        session = get_session()
+        enc_api_key = b64encode(
+            f":{api_key}".encode()
+        ).decode()
 
-            try:
-                r = session.get(
-                    Constants.PIXELDRAIN_API_URL + "/user",
-                    headers={
-                        "Authorization": "Basic " + enc_api_key
-                    }
-                )
+        try:
+            r = session.get(
+                Constants.PIXELDRAIN_API_URL + "/user",
+                headers={
+                    "Authorization": "Basic " + enc_api_key
+                }
+            )
 
-            except RequestException:
-                raise ClientNotWorking(BrokenClientReason.CONNECTION_ERROR)
+        except RequestException:
+            raise ClientNotWorking(BrokenClientReason.CONNECTION_ERROR)
 
-            if r.status_code == 401:
-                raise CredentialInvalid
+        if r.status_code == 401:
+            raise CredentialInvalid
 
-            response = r.json()
-            if (response["subscription"]["type"] or "free").lower() == "free":
-                # Free account, so fetch standard rate limits
-                limits = session.get(
-                    Constants.PIXELDRAIN_API_URL + '/misc/rate_limits',
-                    headers={
-                        "Authorization": "Basic " + enc_api_key
-                    }
-                ).json()
+        response = r.json()
+        if (response["subscription"]["type"] or "free").lower() == "free":
+            # Free account, so fetch standard rate limits
+            limits = session.get(
+                Constants.PIXELDRAIN_API_URL + '/misc/rate_limits',
+                headers={
+                    "Authorization": "Basic " + enc_api_key
+                }
+            ).json()
 
-                transfer_limit_used = limits["transfer_limit_used"]
-                transfer_limit = limits["transfer_limit"]
+            transfer_limit_used = limits["transfer_limit_used"]
+            transfer_limit = limits["transfer_limit"]
 
-            else:
-                # Paid account, so grab transfer limits from user data
-                transfer_limit_used = response["monthly_transfer_used"]
-                transfer_limit = response["monthly_transfer_cap"]
-                if transfer_limit == -1:
-                    transfer_limit = float("inf")
+        else:
+            # Paid account, so grab transfer limits from user data
+            transfer_limit_used = response["monthly_transfer_used"]
+            transfer_limit = response["monthly_transfer_cap"]
+            if transfer_limit == -1:
+                transfer_limit = float("inf")
 
         LOGGER.debug(
             f"Pixeldrain account transfer state: {transfer_limit_used}/{transfer_limit}"
@@ -535,7 +805,10 @@ class PixelDrainDownload(BaseDirectDownload):
         download_id = self.download_link.rstrip("/").split("/")[-1]
         return Constants.PIXELDRAIN_API_URL + '/file/' + download_id
 
-    def _fetch_pure_link(self) -> Response:
+    def _fetch_pure_link(
+        self,
+        byte_range: Union[Tuple[int, int], None] = None
+    ) -> Response:
         if self._first_fetch:
             cred = Credentials()
             for pd_cred in cred.get_from_source(CredentialSource.PIXELDRAIN):
@@ -553,7 +826,7 @@ class PixelDrainDownload(BaseDirectDownload):
 
             self._first_fetch = False
 
-        headers = {}
+        headers = self._get_range_header(byte_range)
         if self._api_key:
             headers["Authorization"] = "Basic " + b64encode(
                 f":{self._api_key}".encode()
@@ -572,6 +845,7 @@ class PixelDrainFolderDownload(PixelDrainDownload):
     "For downloading a PixelDrain folder (for PD file, use PixelDrainDownload)"
 
     identifier: str = 'pd_folder'
+    segmentable: bool = False
 
     def _convert_to_pure_link(self) -> str:
         self._api_key = None
@@ -694,18 +968,75 @@ class MegaDownload(BaseDirectDownload):
     def _extract_extension(self, response: Union[Response, None]) -> str:
         return splitext(self._mega.mega_filename)[1]
 
+    def __load_progress(self) -> None:
+        "Continue from the stored progress of an earlier run, if possible"
+        if not self._mega.resumable:
+            return
+
+        progress = DownloadProgressDB.fetch(self.id)
+        if progress is None:
+            return
+
+        if (
+            progress["size"] != self.size
+            or not progress["mac_state"]
+            or not isfile(self.files[0])
+            or getsize(self.files[0]) < progress["written"][0]
+        ):
+            DownloadProgressDB.delete(self.id)
+            commit()
+            return
+
+        LOGGER.info(
+            f'Resuming download {self.id} at {progress["written"][0]} bytes'
+        )
+        self._mega.size_downloaded = progress["written"][0]
+        self._mega.mac_state = bytes.fromhex(progress["mac_state"])
+        return
+
+    def __save_progress(self) -> None:
+        "Store how far the download is, so that it can be resumed"
+        if not (self._mega.resumable and self._mega.mac_state):
+            return
+
+        DownloadProgressDB.update(
+            self.id,
+            self.size,
+            None,
+            None,
+            [self._mega.size_downloaded],
+            self._mega.mac_state.hex()
+        )
+        commit()
+        self.__last_save = monotonic()
+        return
+
+    def __report_progress(self) -> None:
+        WebSocket().report_queue_progress(self)
+        if (
+            monotonic() - self.__last_save
+            >= Constants.DOWNLOAD_PROGRESS_SAVE_INTERVAL
+        ):
+            self.__save_progress()
+        return
+
     def run(self) -> None:
         self._state = DownloadState.DOWNLOADING_STATE
-        ws = WebSocket()
+        self.__load_progress()
+        self.__last_save = monotonic()
         try:
             self._mega.download(
                 self.files[0],
-                lambda: ws.update_queue_status(self)
+                self.__report_progress
             )
 
         except ClientNotWorking:
             self._state = DownloadState.FAILED_STATE
 
+        if self.state == DownloadState.SHUTDOWN_STATE:
+            # Keep the partial file to resume from after the restart
+            self.__save_progress()
+
         return
 
     def stop(self,
@@ -812,7 +1143,7 @@ class TorrentDownload(ExternalDownload, BaseDirectDownload):
         # Find name of torrent as that becomes folder that media is
         # downloaded in
         try:
-            response = Session().post(
+            response = get_session().post(
                 'https://magnet2torrent.com/upload/',
                 data={'magnet': download_link}
             )
@@ -189,14 +189,14 @@ class FlareSolverr:
             headers={'Content-Type': 'application/json'}
         )).json())["solution"]
 
-        await session.post(
+        (await session.post(
             self.base_url + Constants.FS_API_BASE,
             json={
                 'cmd': 'sessions.destroy',
                 'session': session_id
             },
             headers={'Content-Type': 'application/json'}
-        )
+        )).release()
 
         self.ua_mapping[url] = result["userAgent"]
         self.cookie_mapping[url] = {
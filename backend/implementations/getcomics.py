@@ -4,15 +4,19 @@
 Getting downloads from a GC page
 """
 
-from asyncio import gather
+from asyncio import Semaphore, create_task, gather
+from collections import OrderedDict
 from functools import reduce
 from hashlib import sha1
 from re import IGNORECASE, compile
-from typing import Callable, List, Tuple, Type, Union
+from threading import Lock
+from time import time
+from typing import Callable, Dict, List, Tuple, Type, Union
 
 from aiohttp import ClientError
 from bencoding import bencode
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from bs4.builder import builder_registry
 
 from backend.base.custom_exceptions import (DownloadLimitReached,
                                             EnqueuingDownloadFailure,
@@ -24,8 +28,9 @@ from backend.base.definitions import (GC_DOWNLOAD_SOURCE_TERMS,
                                       GCDownloadSource, SearchResultData,
                                       SpecialVersion)
 from backend.base.file_extraction import extract_filename_data
-from backend.base.helpers import (AsyncSession, check_overlapping_issues,
-                                  fix_year, force_range,
+from backend.base.helpers import (AsyncSession, Singleton,
+                                  check_overlapping_issues, fix_year,
+                                  force_range, get_async_session,
                                   get_torrent_info, normalise_year)
 from backend.base.logging import LOGGER
 from backend.implementations.blocklist import (add_to_blocklist,
@@ -43,6 +48,8 @@ from backend.implementations.external_clients import ExternalClients
 from backend.implementations.matching import gc_group_filter
 from backend.implementations.volumes import Volume
 from backend.internals.db import iter_commit
+from backend.internals.db_models import PurifiedLinksDB
+from backend.internals.response_cache import ResponseCache
 from backend.internals.settings import Settings
 
 mediafire_dd_regex = compile(
@@ -50,8 +57,44 @@ mediafire_dd_regex = compile(
     IGNORECASE
 )
 
+html_parser = 'lxml' if builder_registry.lookup('lxml') else 'html.parser'
+"Use the (much faster) lxml parser if it's installed"
+
+listing_strainer = SoupStrainer(['article', 'a', 'span'])
+"The elements of GC listing pages (search results, latest posts) that are used"
+
+article_strainer = SoupStrainer(['h1', 'section'])
+"The elements of GC articles that are used"
+
 
 # region Scraping
+def _parse_listing_page(html: str) -> BeautifulSoup:
+    """Parse a GC listing page (search results or latest posts). Only the
+    parts of the page that contain the articles and page numbers are
+    processed.
+
+    Args:
+        html (str): The HTML of the page.
+
+    Returns:
+        BeautifulSoup: The soup of the page.
+    """
+    return BeautifulSoup(html, html_parser, parse_only=listing_strainer)
+
+
+def _parse_article(html: str) -> BeautifulSoup:
+    """Parse a GC article. Only the parts of the page that contain the title
+    and the download links are processed.
+
+    Args:
+        html (str): The HTML of the article.
+
+    Returns:
+        BeautifulSoup: The soup of the article.
+    """
+    return BeautifulSoup(html, html_parser, parse_only=article_strainer)
+
+
 def _get_max_page(
     soup: BeautifulSoup
 ) -> int:
@@ -516,24 +559,44 @@ def _create_link_paths(
     return link_paths
 
 
+purified_download_classes: Dict[str, Type[Download]] = {
+    c.identifier: c
+    for c in (
+        DirectDownload, MediaFireDownload, MediaFireFolderDownload,
+        WeTransferDownload, PixelDrainDownload, PixelDrainFolderDownload,
+        MegaDownload, MegaFolderDownload, TorrentDownload
+    )
+}
+
+
 async def __purify_link(
+    session: AsyncSession,
     source: GCDownloadSource,
-    link: str
-) -> Tuple[str, Type[Download]]:
+    link: str,
+    use_stored: bool = True
+) -> Tuple[str, Type[Download], bool]:
     """Extract the link that directly leads to the download from the link
-    in the GC article.
+    in the GC article. The result is stored, so that purifying the same link
+    again within `Constants.GC_PURIFIED_LINK_TTL` doesn't require any requests.
 
     Args:
+        session (AsyncSession): The session to make the request with.
+
         source (GCDownloadSource): The service that the link is of.
+
         link (str): The link in the GC article.
 
+        use_stored (bool, optional): Use the stored result of an earlier
+        purification of the link, if there is one.
+            Defaults to True.
+
     Raises:
         LinkBroken: Link is invalid, not supported or broken.
         ClientError: Failed to fetch link.
 
     Returns:
-        Tuple[str, Type[Download]]: The pure link, and the download class for
-        the correct service.
+        Tuple[str, Type[Download], bool]: The pure link, the download class for
+        the correct service and whether the stored result was used.
     """
     LOGGER.debug(f'Purifying link: {link}')
     if (
@@ -541,14 +604,60 @@ async def __purify_link(
         and link.startswith("magnet:?")
     ):
         # Direct magnet link
-        return link, TorrentDownload
+        return link, TorrentDownload, False
+
+    purified_link = None
+    if use_stored:
+        purified_link = PurifiedLinksDB.fetch(
+            link, Constants.GC_PURIFIED_LINK_TTL
+        )
+    if (
+        purified_link is not None
+        and purified_link[1] in purified_download_classes
+    ):
+        LOGGER.debug(f'Using earlier purification of link: {link}')
+        return (
+            purified_link[0],
+            purified_download_classes[purified_link[1]],
+            True
+        )
+
+    pure_link, DownloadClass = await __fetch_pure_link(session, source, link)
+    PurifiedLinksDB.update(link, pure_link, DownloadClass.identifier)
+    return pure_link, DownloadClass, False
+
+
+async def __fetch_pure_link(
+    session: AsyncSession,
+    source: GCDownloadSource,
+    link: str
+) -> Tuple[str, Type[Download]]:
+    """Follow the link in the GC article to find the link that directly leads
+    to the download.
+
+    Args:
+        session (AsyncSession): The session to make the request with.
+        source (GCDownloadSource): The service that the link is of.
+        link (str): The link in the GC article.
+
+    Raises:
+        LinkBroken: Link is invalid, not supported or broken.
+        ClientError: Failed to fetch link.
 
-    async with AsyncSession() as session:
-        r = await session.get(link)
-    if not r.ok:
-        raise LinkBroken(link)
-    url = str(r.real_url)
-    content_type = r.headers.getone("Content-Type", "")
+    Returns:
+        Tuple[str, Type[Download]]: The pure link, and the download class for
+        the correct service.
+    """
+    async with session.get(link) as r:
+        if not r.ok:
+            raise LinkBroken(link)
+        url = str(r.real_url)
+        content_type = r.headers.getone("Content-Type", "")
+        torrent_file = (
+            await r.read()
+            if content_type == "application/x-bittorrent" else
+            b''
+        )
 
     if source == GCDownloadSource.MEGA:
         if "#F!" in url or "/folder/" in url:
@@ -590,7 +699,7 @@ async def __purify_link(
         and content_type == "application/x-bittorrent"
     ):
         # Link is to torrent file
-        hash = sha1(bencode(get_torrent_info(await r.read()))).hexdigest()
+        hash = sha1(bencode(get_torrent_info(torrent_file))).hexdigest()
         return (
             "magnet:?xt=urn:btih:" + hash + "&tr=udp://tracker.cyberia.is:6969/announce&tr=udp://tracker.port443.xyz:6969/announce&tr=http://tracker3.itzmx.com:6961/announce&tr=udp://tracker.moeking.me:6969/announce&tr=http://vps02.net.orel.ru:80/announce&tr=http://tracker.openzim.org:80/announce&tr=udp://tracker.skynetcloud.tk:6969/announce&tr=https://1.tracker.eu.org:443/announce&tr=https://3.tracker.eu.org:443/announce&tr=http://re-tracker.uz:80/announce&tr=https://tracker.parrotsec.org:443/announce&tr=udp://explodie.org:6969/announce&tr=udp://tracker.filemail.com:6969/announce&tr=udp://tracker.nyaa.uk:6969/announce&tr=udp://retracker.netbynet.ru:2710/announce&tr=http://tracker.gbitt.info:80/announce&tr=http://tracker2.dler.org:80/announce",
             TorrentDownload
@@ -603,6 +712,8 @@ async def __purify_link(
 
 
 async def __purify_download_group(
+    session: AsyncSession,
+    limit: Semaphore,
     group: DownloadGroup,
     volume_id: int,
     issue_id: Union[int, None],
@@ -611,8 +722,15 @@ async def __purify_download_group(
     forced_match: bool = False
 ) -> Tuple[Union[Download, None], bool]:
     """Turn a download group into a working link and client for the link.
+    The links of the group are purified concurrently, and the first link
+    (in order of service preference) that works is chosen.
 
     Args:
+        session (AsyncSession): The session to make the requests with.
+
+        limit (Semaphore): Limits the amount of links that are purified at
+        the same time.
+
         group (DownloadGroup): The download group to convert.
 
         volume_id (int): The ID of the volume that the download group is for.
@@ -633,32 +751,19 @@ async def __purify_download_group(
         `False`. If unsuccessful, `None` and whether it failed because the
         limit of a service was reached.
     """
-    limit_reached = False
-    for source, links in group['links'].items():
-        for link in iter_commit(links):
+    async def purify(
+        source: GCDownloadSource,
+        link: str,
+        use_stored: bool = True
+    ) -> Tuple[str, Type[Download], bool]:
+        async with limit:
+            return await __purify_link(session, source, link, use_stored)
+
+    async def get_download(source: GCDownloadSource, link: str) -> Download:
+        pure_link, DownloadClass, stored = await purifications[(source, link)]
+        while True:
             try:
-                pure_link, DownloadClass = await __purify_link(source, link)
-
-            except LinkBroken:
-                # Link broken
-                add_to_blocklist(
-                    web_link=web_link,
-                    web_title=web_title,
-                    web_sub_title=group['web_sub_title'],
-                    download_link=link,
-                    source=source,
-                    volume_id=volume_id,
-                    issue_id=issue_id,
-                    reason=BlocklistReason.LINK_BROKEN
-                )
-                continue
-
-            except ClientError:
-                # Page blocked by CF and FS not setup
-                continue
-
-            try:
-                dl_instance: Download = DownloadClass(
+                return DownloadClass(
                     download_link=pure_link,
                     volume_id=volume_id,
                     covered_issues=group["info"]["issue_number"],
@@ -671,18 +776,54 @@ async def __purify_download_group(
                 )
 
             except LinkBroken:
+                PurifiedLinksDB.delete(link)
+                if not stored:
+                    raise
+
+            # The pure link that was stored earlier might not be valid
+            # anymore, while the link in the article still is
+            LOGGER.debug(f'Purifying link again: {link}')
+            pure_link, DownloadClass, stored = await purify(
+                source, link, use_stored=False
+            )
+
+    candidates = [
+        (source, link)
+        for source, links in group['links'].items()
+        for link in links
+    ]
+
+    # The links are purified concurrently, but once a working link is found,
+    # the purifications of the less preferred links that haven't finished
+    # yet are cancelled.
+    purifications = {
+        (source, link): create_task(purify(source, link))
+        for source, link in candidates
+    }
+
+    limit_reached = False
+    try:
+        for source, link in iter_commit(candidates):
+            try:
+                dl_instance = await get_download(source, link)
+
+            except LinkBroken as e:
                 # Link broken
                 add_to_blocklist(
                     web_link=web_link,
                     web_title=web_title,
                     web_sub_title=group['web_sub_title'],
-                    download_link=pure_link,
+                    download_link=e.link,
                     source=source,
                     volume_id=volume_id,
                     issue_id=issue_id,
                     reason=BlocklistReason.LINK_BROKEN
                 )
 
+            except ClientError:
+                # Page blocked by CF and FS not setup
+                continue
+
             except IssueNotFound:
                 # The group refers to issues that don't exist in the
                 # volume, and download is not forced.
@@ -696,6 +837,11 @@ async def __purify_download_group(
             else:
                 return dl_instance, limit_reached
 
+    finally:
+        for task in purifications.values():
+            task.cancel()
+        await gather(*purifications.values(), return_exceptions=True)
+
     return None, limit_reached
 
 
@@ -734,11 +880,17 @@ async def _test_paths(
     Returns:
         List[Download]: A list of downloads.
     """
+    PurifiedLinksDB.delete_expired(Constants.GC_PURIFIED_LINK_TTL)
+
     downloads: Tuple[Union[Download, None], ...] = tuple()
     limit_reached: Tuple[bool, ...] = tuple()
+    limit = Semaphore(Constants.GC_PURIFY_CONCURRENCY)
+    session = await get_async_session()
     for path in link_paths:
         downloads, limit_reached = zip(*(await gather(*(
             __purify_download_group(
+                session,
+                limit,
                 group,
                 volume_id,
                 issue_id,
@@ -768,6 +920,175 @@ async def _test_paths(
 
 
 # region Searching
+def _format_articles(*soups: BeautifulSoup) -> List[SearchResultData]:
+    """Extract the articles from GC listing pages (search results or latest
+    posts) and parse their titles.
+
+    Args:
+        *soups (BeautifulSoup): The soups of the pages.
+
+    Returns:
+        List[SearchResultData]: The articles, in the order that they appear.
+    """
+    return [
+        {
+            **extract_filename_data(
+                article[1],
+                assume_volume_number=False,
+                fix_year=True
+            ),
+            "link": article[0],
+            "display_title": article[1],
+            "source": Constants.GC_SOURCE_TERM
+        }
+        for soup in soups
+        for article in _get_articles(soup)
+    ]
+
+
+class GCSearchCache(metaclass=Singleton):
+    def __init__(self) -> None:
+        """Cache of the (parsed) search results of GC, keyed by query. The
+        results are kept in memory, and optionally also on disk so that they
+        survive a restart. How long results are valid for is set with the
+        `search_cache_ttl` setting.
+        """
+        self.hits = 0
+        "Amount of searches that were served from the cache"
+        self.misses = 0
+        "Amount of searches that weren't found in the cache or were expired"
+
+        self._lock = Lock()
+        self._entries: OrderedDict[
+            str, Tuple[int, List[SearchResultData]]
+        ] = OrderedDict()
+        self._disk_cache = ResponseCache(
+            Constants.GC_SEARCH_CACHE_FILENAME,
+            Constants.GC_SEARCH_CACHE_MAX_SIZE
+        )
+        return
+
+    @staticmethod
+    def _get_key(query: str) -> str:
+        return query.strip().lower()
+
+    @staticmethod
+    def _copy_results(
+        results: List[SearchResultData]
+    ) -> List[SearchResultData]:
+        # The results are altered by the matching code, so never hand out
+        # the cached dicts themselves.
+        return [
+            SearchResultData(**result) # type: ignore
+            for result in results
+        ]
+
+    def get(self, query: str) -> Union[List[SearchResultData], None]:
+        """Get the cached search results for a query.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            Union[List[SearchResultData], None]: The search results, or `None`
+            if they're not cached, expired or the cache is disabled.
+        """
+        settings = Settings().sv
+        ttl = settings.search_cache_ttl
+        if not ttl:
+            return None
+
+        key = self._get_key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time() - ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and settings.persist_search_cache:
+            disk_results = self._disk_cache.get(key, max_age=ttl)
+            if disk_results is not None:
+                # JSON has no tuples, so restore the issue/volume ranges
+                for result in disk_results:
+                    for range_key in ('volume_number', 'issue_number'):
+                        if isinstance(result.get(range_key), list):
+                            result[range_key] = tuple(result[range_key])
+
+                entry = (round(time()), disk_results)
+                self.__store(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._copy_results(entry[1])
+
+    def set(self, query: str, results: List[SearchResultData]) -> None:
+        """Store the search results of a query.
+
+        Args:
+            query (str): The query.
+            results (List[SearchResultData]): The search results.
+        """
+        settings = Settings().sv
+        if not settings.search_cache_ttl:
+            return
+
+        key = self._get_key(query)
+        self.__store(key, (round(time()), self._copy_results(results)))
+
+        if settings.persist_search_cache:
+            self._disk_cache.set(key, results)
+
+        return
+
+    def __store(
+        self,
+        key: str,
+        entry: Tuple[int, List[SearchResultData]]
+    ) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > Constants.GC_SEARCH_CACHE_ENTRIES:
+                self._entries.popitem(last=False)
+        return
+
+    def clear(self) -> None:
+        "Remove all search results from the cache, both in memory and on disk"
+        LOGGER.info('Clearing search cache')
+        with self._lock:
+            self._entries.clear()
+        self._disk_cache.clear()
+        return
+
+    def get_stats(self) -> Dict[str, Union[int, bool, Dict[str, int]]]:
+        """Get statistics about the usage of the cache.
+
+        Returns:
+            Dict[str, Union[int, bool, Dict[str, int]]]: The statistics.
+        """
+        settings = Settings().sv
+        with self._lock:
+            result: Dict[str, Union[int, bool, Dict[str, int]]] = {
+                'ttl': settings.search_cache_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': Constants.GC_SEARCH_CACHE_ENTRIES,
+                'persistent': settings.persist_search_cache
+            }
+
+        if settings.persist_search_cache:
+            result['disk'] = self._disk_cache.get_stats()
+
+        return result
+
+
 async def search_getcomics(
     session: AsyncSession,
     query: str
@@ -781,6 +1102,12 @@ async def search_getcomics(
     Returns:
         List[SearchResultData]: The search results.
     """
+    search_cache = GCSearchCache()
+    cached_results = search_cache.get(query)
+    if cached_results is not None:
+        LOGGER.debug(f'Using cached search results for "{query}"')
+        return cached_results
+
     # Fetch first page and determine max pages
     first_page = await session.get_text(
         Constants.GC_SITE_URL,
@@ -790,7 +1117,7 @@ async def search_getcomics(
     if not first_page:
         return []
 
-    first_soup = BeautifulSoup(first_page, "html.parser")
+    first_soup = _parse_listing_page(first_page)
     max_page = min(
         _get_max_page(first_soup),
         10
@@ -817,30 +1144,52 @@ async def search_getcomics(
         ]
 
     other_soups = [
-        BeautifulSoup(html, "html.parser")
+        _parse_listing_page(html)
         for html in other_htmls
         if html
     ]
 
     # Process the search results on each page
-    formatted_results: List[SearchResultData] = [
-        {
-            **extract_filename_data(
-                article[1],
-                assume_volume_number=False,
-                fix_year=True
-            ),
-            "link": article[0],
-            "display_title": article[1],
-            "source": Constants.GC_SOURCE_TERM
-        }
-        for soup in (first_soup, *other_soups)
-        for article in _get_articles(soup)
-    ]
+    formatted_results = _format_articles(first_soup, *other_soups)
+
+    if len(other_soups) == len(other_tasks):
+        # Only cache complete results
+        search_cache.set(query, formatted_results)
 
     return formatted_results
 
 
+async def get_latest_posts(
+    session: AsyncSession,
+    pages: int = Constants.GC_FEED_PAGES
+) -> List[SearchResultData]:
+    """Give the most recent posts on GC, newest first. The amount of requests
+    is constant, no matter the size of the library.
+
+    Args:
+        session (AsyncSession): The session to make the requests with.
+
+        pages (int, optional): The amount of listing pages to fetch.
+            Defaults to Constants.GC_FEED_PAGES.
+
+    Returns:
+        List[SearchResultData]: The posts.
+    """
+    soups: List[BeautifulSoup] = []
+    for page in range(1, pages + 1):
+        html = await session.get_text(
+            Constants.GC_SITE_URL
+            if page == 1 else
+            f"{Constants.GC_SITE_URL}/page/{page}",
+            quiet_fail=True
+        )
+        if not html:
+            break
+        soups.append(_parse_listing_page(html))
+
+    return _format_articles(*soups)
+
+
 # region Processing
 class GetComicsPage:
     def __init__(self, link: str) -> None:
@@ -863,18 +1212,18 @@ class GetComicsPage:
         """
         LOGGER.debug(f"Extracting download links from {self.link}")
 
-        async with AsyncSession() as session:
-            try:
-                response = await session.get(self.link)
+        session = await get_async_session()
+        try:
+            async with session.get(self.link) as response:
                 if not response.ok:
                     raise ClientError
 
-                soup = BeautifulSoup(await response.text(), 'html.parser')
+                soup = _parse_article(await response.text())
 
-            except ClientError:
-                raise EnqueuingDownloadFailure(
-                    EnqueuingDownloadFailureReason.WEBPAGE_BROKEN
-                )
+        except ClientError:
+            raise EnqueuingDownloadFailure(
+                EnqueuingDownloadFailureReason.WEBPAGE_BROKEN
+            )
 
         self.title = _get_title(soup)
         self.download_groups = _get_download_groups(soup)
@@ -23,6 +23,18 @@ clean_title_regex = compile(
 )
 
 
+def clean_title(title: str) -> str:
+    """Normalise a title so that it can be compared to other titles.
+
+    Args:
+        title (str): The title to normalise.
+
+    Returns:
+        str: The normalised title.
+    """
+    return clean_title_regex.sub('', title.lower()).replace(' ', '')
+
+
 def _match_title(
     title1: str,
     title2: str,
@@ -40,20 +52,13 @@ def _match_title(
     Returns:
         bool: Whether the titles match.
     """
-    clean_reference_title = clean_title_regex.sub(
-        '',
-        title1.lower()
-    ).replace(' ', '')
-
-    clean_title = clean_title_regex.sub(
-        '',
-        title2.lower()
-    ).replace(' ', '')
+    clean_reference_title = clean_title(title1)
+    clean_title2 = clean_title(title2)
 
     if allow_contains:
-        return clean_title in clean_reference_title
+        return clean_title2 in clean_reference_title
     else:
-        return clean_reference_title == clean_title
+        return clean_reference_title == clean_title2
 
 
 def _match_year(
@@ -3,48 +3,56 @@
 from __future__ import annotations
 
 from asyncio import run
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 from functools import lru_cache
-from io import BytesIO
+from hashlib import sha1
 from os.path import dirname, exists, isdir, relpath
 from re import IGNORECASE, compile
 from time import time
-from typing import Any, Dict, List, Mapping, Set, Tuple, Union
+from typing import (Any, AsyncIterator, Dict, List, Mapping, Sequence, Set,
+                    Tuple, Union)
 
 from typing_extensions import assert_never
 
-from backend.base.custom_exceptions import (InvalidKey, InvalidKeyValue,
-                                            IssueNotFound,
+from backend.base.custom_exceptions import (CVRateLimitReached, InvalidKey,
+                                            InvalidKeyValue, IssueNotFound,
                                             TaskForVolumeRunning,
                                             VolumeAlreadyAdded,
                                             VolumeDownloadedFor,
                                             VolumeNotFound)
 from backend.base.definitions import (Constants, FileConstants, FileData,
                                       GeneralFileData, GeneralFileType,
-                                      IssueData, LibraryFilter,
-                                      LibrarySorting, MonitorScheme,
-                                      SpecialVersion, VolumeData)
+                                      IssueData, IssueMetadata,
+                                      LibraryFilter, LibrarySorting,
+                                      MonitorScheme, RootFolder,
+                                      ScanManifestData, SpecialVersion,
+                                      VolumeData, VolumeMetadata)
 from backend.base.file_extraction import extract_filename_data
-from backend.base.files import (change_basefolder, create_folder,
-                                delete_empty_child_folders,
+from backend.base.files import (FolderTrie, change_basefolder,
+                                create_folder, delete_empty_child_folders,
                                 delete_empty_parent_folders,
                                 delete_file_folder, folder_is_inside_folder,
-                                list_files, rename_file)
-from backend.base.helpers import (PortablePool, extract_year_from_date,
+                                list_files, list_files_incremental,
+                                rename_file)
+from backend.base.helpers import (CommaList, batched, extract_year_from_date,
                                   filtered_iter, first_of_subarrays,
                                   force_range, to_number_cv_id)
 from backend.base.logging import LOGGER
 from backend.implementations.comicvine import ComicVine
-from backend.implementations.matching import (_match_title,
+from backend.implementations.covers import (delete_unused_covers,
+                                            get_cover_path, store_cover)
+from backend.implementations.matching import (_match_title, clean_title,
                                               file_importing_filter)
 from backend.implementations.root_folders import RootFolders
-from backend.internals.db import commit, get_db
-from backend.internals.db_models import FilesDB, GeneralFilesDB
+from backend.internals.db import commit, get_db, search_index_supported
+from backend.internals.db_models import (ComicVineSyncDB, FilesDB,
+                                         GeneralFilesDB, ScanManifestDB,
+                                         VolumeSearchDB)
 from backend.internals.server import WebSocket
 from backend.internals.settings import Settings
 
 # autopep8: off
-ONE_DAY = timedelta(days=1)
 THIRTY_DAYS = timedelta(days=30)
 split_regex = compile(r'(?<!vs)(?<!r\.i\.p)(?:(?<=[\.!\?])\s|(?<=[\.!\?]</p>)(?!$))', IGNORECASE)
 remove_link_regex = compile(r'<a[^>]*>.*?</a>', IGNORECASE)
@@ -225,6 +233,41 @@ class Issue:
         return
 
 
+class IssueIndex:
+    def __init__(self, issues: List[IssueData]) -> None:
+        """Index the issues of a volume on their calculated issue number, for
+        fast range lookups.
+
+        Args:
+            issues (List[IssueData]): The issues of the volume.
+        """
+        self.issues = sorted(issues, key=lambda i: i.calculated_issue_number)
+        self.numbers = [i.calculated_issue_number for i in self.issues]
+        return
+
+    def get_range(
+        self,
+        calculated_issue_number_start: Union[float, int],
+        calculated_issue_number_end: Union[float, int]
+    ) -> List[IssueData]:
+        """Get the issues that are between two calculated issue numbers.
+
+        Args:
+            calculated_issue_number_start (Union[float, int]): The start of the
+            range.
+            calculated_issue_number_end (Union[float, int]): The end of the
+            range.
+
+        Returns:
+            List[IssueData]: The issues in the range, sorted on calculated
+            issue number.
+        """
+        return self.issues[
+            bisect_left(self.numbers, calculated_issue_number_start):
+            bisect_right(self.numbers, calculated_issue_number_end)
+        ]
+
+
 # =====================
 # region Volume
 # =====================
@@ -246,6 +289,7 @@ class Volume:
                 Can only be raised when check_existence is `True`.
         """
         self.id = id
+        self._issue_index: Union[IssueIndex, None] = None
 
         if not check_existence:
             return
@@ -299,32 +343,14 @@ class Volume:
                 monitored, monitor_new_issues,
                 v.folder, root_folder,
                 rf.folder AS root_folder_path,
-                (
-                    SELECT COUNT(*)
-                    FROM issues
-                    WHERE volume_id = v.id
-                ) AS issue_count,
-                (
-                    SELECT COUNT(DISTINCT issue_id)
-                    FROM issues i
-                    INNER JOIN issues_files if
-                    ON i.id = if.issue_id
-                    WHERE volume_id = v.id
-                ) AS issues_downloaded,
-                (
-                    SELECT SUM(size) FROM (
-                        SELECT DISTINCT f.id, size
-                        FROM issues i
-                        INNER JOIN issues_files if
-                        INNER JOIN files f
-                        ON i.id = if.issue_id
-                            AND if.file_id = f.id
-                        WHERE volume_id = v.id
-                    )
-                ) AS total_size
+                vs.issue_count,
+                vs.issues_downloaded,
+                vs.total_size
             FROM volumes v
             INNER JOIN root_folders rf
+            INNER JOIN volume_stats vs
             ON v.root_folder = rf.id
+                AND v.id = vs.volume_id
             WHERE v.id = ?
             LIMIT 1;
             """,
@@ -344,17 +370,25 @@ class Volume:
     def vd(self) -> VolumeData:
         return self.get_data()
 
-    def get_cover(self) -> BytesIO:
+    def get_cover(self, size: Union[int, None] = None) -> Union[str, None]:
         """Get the cover of the volume.
 
+        Args:
+            size (Union[int, None], optional): The minimum width that is
+            needed, to select a thumbnail. Give `None` for the original cover.
+                Defaults to None.
+
         Returns:
-            BytesIO: The cover.
+            Union[str, None]: The path to the cover file, or `None` if the
+            volume doesn't have a cover.
         """
-        cover = get_db().execute(
-            "SELECT cover FROM volumes_covers WHERE volume_id = ? LIMIT 1",
+        cover_hash = get_db().execute(
+            "SELECT cover_hash FROM volume_covers WHERE volume_id = ? LIMIT 1;",
             (self.id,)
-        ).fetchone()[0]
-        return BytesIO(cover)
+        ).exists()
+        if cover_hash is None:
+            return None
+        return get_cover_path(cover_hash, size)
 
     def get_ending_year(self) -> Union[int, None]:
         """Get the year of the last issue that has a release date.
@@ -433,8 +467,24 @@ class Volume:
             )
             for i in issues
         ]
+
+        # Data is fresh, so use it to (re)build the index
+        self._issue_index = IssueIndex(result)
+
         return result
 
+    def get_issue_index(self) -> IssueIndex:
+        """Get the issue index of the volume. It's built once and then re-used
+        until the issues are fetched again using `get_issues()`. Files of the
+        issues are not fetched.
+
+        Returns:
+            IssueIndex: The issue index.
+        """
+        if self._issue_index is None:
+            self.get_issues(_skip_files=True)
+        return self._issue_index # type: ignore
+
     def get_issues_in_range(
         self,
         calculated_issue_number_start: Union[float, int],
@@ -452,18 +502,10 @@ class Volume:
         Returns:
             List[IssueData]: The list of issues in the range.
         """
-        return [
-            issue
-            for issue in sorted(
-                self.get_issues(_skip_files=True),
-                key=lambda i: i.calculated_issue_number
-            )
-            if (
-                calculated_issue_number_start
-                <= issue.calculated_issue_number
-                <= calculated_issue_number_end
-            )
-        ]
+        return self.get_issue_index().get_range(
+            calculated_issue_number_start,
+            calculated_issue_number_end
+        )
 
     def get_open_issues(self) -> List[Tuple[int, float]]:
         """Get the issues that are not matched to a file and are monitored.
@@ -594,6 +636,7 @@ class Volume:
         else:
             assert_never(monitoring_scheme)
 
+        self._issue_index = None
         return
 
     def __volume_folder_used_by_other_volume(
@@ -795,9 +838,19 @@ class Volume:
         FilesDB.delete_linked_files(self.id)
 
         # Delete metadata entries
-        # ON DELETE CASCADE will take care of issues
+        # ON DELETE CASCADE will take care of issues and cover
+        cover_hash = get_db().execute(
+            "SELECT cover_hash FROM volume_covers WHERE volume_id = ? LIMIT 1;",
+            (self.id,)
+        ).exists()
+        VolumeSearchDB.delete(self.id)
         get_db().execute("DELETE FROM volumes WHERE id = ?", (self.id,))
 
+        if cover_hash:
+            # Only remove the file of the cover once the deletion is final
+            commit()
+            delete_unused_covers((cover_hash,))
+
         return
 
     def __repr__(self) -> str:
@@ -810,7 +863,8 @@ class Volume:
 class Library:
     def get_public_volumes(self,
         sort: LibrarySorting = LibrarySorting.TITLE,
-        filter: Union[LibraryFilter, int, None] = None
+        filter: Union[LibraryFilter, int, None] = None,
+        volume_ids: Union[Sequence[int], None] = None
     ) -> List[dict]:
         """Get all volumes in the library
 
@@ -822,6 +876,10 @@ class Library:
             the list if not `None`.
                 Defaults to None.
 
+            volume_ids (Union[Sequence[int], None], optional): Only return the
+            volumes with these ID's if not `None`.
+                Defaults to None.
+
         Returns:
             List[dict]: The list of volumes in the library.
         """
@@ -832,47 +890,29 @@ class Library:
         else:
             sql_filter = ''
 
+        if volume_ids is not None:
+            sql_filter += (
+                (" AND " if sql_filter else "WHERE ")
+                + f"id IN ({','.join('?' * len(volume_ids))})"
+            )
+
         volumes = get_db().execute(f"""
-            WITH
-                vol_issues AS (
-                    SELECT id, monitored, date
-                    FROM issues
-                    WHERE volume_id = volumes.id
-                ),
-                issues_to_files AS (
-                    SELECT issue_id, monitored, f.id, size
-                    FROM issues i
-                    INNER JOIN issues_files if
-                    INNER JOIN files f
-                    ON i.id = if.issue_id
-                        AND if.file_id = f.id
-                    WHERE volume_id = volumes.id
-                )
             SELECT
                 id, comicvine_id,
                 title, year, publisher,
                 volume_number, description,
                 monitored, monitor_new_issues,
                 folder,
-                (
-                    SELECT COUNT(id) FROM vol_issues
-                ) AS issue_count,
-                (
-                    SELECT COUNT(id) FROM vol_issues WHERE monitored = 1
-                ) AS issue_count_monitored,
-                (
-                    SELECT COUNT(DISTINCT issue_id) FROM issues_to_files
-                ) AS issues_downloaded,
-                (
-                    SELECT COUNT(DISTINCT issue_id) FROM issues_to_files WHERE monitored = 1
-                ) AS issues_downloaded_monitored,
-                (
-                    SELECT SUM(size) FROM (SELECT DISTINCT id, size FROM issues_to_files)
-                ) AS total_size
+                issue_count, issue_count_monitored,
+                issues_downloaded, issues_downloaded_monitored,
+                total_size
             FROM volumes
+            INNER JOIN volume_stats
+            ON id = volume_id
             {sql_filter}
             ORDER BY {sort.value};
-            """
+            """,
+            volume_ids or ()
         ).fetchalldict()
 
         return volumes
@@ -896,6 +936,8 @@ class Library:
 
         Returns:
             List[dict]: The resulting list of matching volumes in the library.
+            When the search index is used, the volumes are ordered by
+            relevance, and by `sort` for equally relevant volumes.
         """
         if query.startswith(('4050-', 'cv:')):
             try:
@@ -905,15 +947,92 @@ class Library:
             except ValueError:
                 volumes = []
 
-        else:
+        elif not search_index_supported():
             volumes = [
                 v
                 for v in self.get_public_volumes(sort, filter)
                 if _match_title(v['title'], query, allow_contains=True)
             ]
 
+        else:
+            ranks = self.__search_index(query, filter)
+            if ranks is None:
+                volumes = self.get_public_volumes(sort, filter)
+            else:
+                volumes = self.get_public_volumes(
+                    sort,
+                    volume_ids=list(ranks)
+                )
+                volumes.sort(key=lambda v: ranks[v['id']])
+
         return volumes
 
+    @staticmethod
+    def __search_index(
+        query: str,
+        filter: Union[LibraryFilter, None] = None,
+        limit: int = Constants.LIBRARY_SEARCH_LIMIT
+    ) -> Union[Dict[int, float], None]:
+        """Find the volumes whose title, alternative title or publisher
+        contains the query, using the search index.
+
+        Args:
+            query (str): The query to search with.
+
+            filter (Union[LibraryFilter, None], optional): Apply a filter to
+            the results if not `None`.
+                Defaults to None.
+
+            limit (int, optional): The maximum amount of results.
+                Defaults to Constants.LIBRARY_SEARCH_LIMIT.
+
+        Returns:
+            Union[Dict[int, float], None]: The ID's of the best matching
+            volumes mapped to their rank (lower is better), or `None` if the
+            query matches all volumes.
+        """
+        clean_query = clean_title(query)
+        if not clean_query:
+            return None
+
+        if len(clean_query) >= 3:
+            # The trigram tokenizer allows matching substrings,
+            # with the title weighing heaviest in the ranking
+            match_sql = """
+                SELECT
+                    rowid AS match_id,
+                    bm25(volumes_fts, 10.0, 5.0, 1.0) AS match_rank
+                FROM volumes_fts
+                WHERE volumes_fts MATCH :query
+            """
+            clean_query = '"' + clean_query.replace('"', '""') + '"'
+
+        else:
+            # Trigrams can't match shorter queries
+            match_sql = """
+                SELECT
+                    rowid AS match_id,
+                    instr(title, :query) = 0 AS match_rank
+                FROM volumes_fts
+                WHERE instr(title, :query)
+                    OR instr(alt_title, :query)
+                    OR instr(publisher, :query)
+            """
+
+        return dict(get_db().execute(f"""
+            SELECT id, match_rank
+            FROM volumes
+            INNER JOIN volume_stats
+            INNER JOIN ({match_sql})
+            ON id = volume_stats.volume_id
+                AND id = match_id
+            {filter.value if filter else ''}
+            ORDER BY match_rank
+            LIMIT :limit;
+            """,
+            {"query": clean_query, "limit": limit}
+        ).fetchall())
+
     def get_stats(self) -> Dict[str, int]:
         result = get_db().execute("""
             WITH v AS (
@@ -925,8 +1044,8 @@ class Library:
                 v.volumes,
                 v.monitored,
                 v.volumes - v.monitored AS unmonitored,
-                (SELECT COUNT(*) FROM issues) AS issues,
-                (SELECT COUNT(DISTINCT issue_id) FROM issues_files) AS downloaded_issues,
+                (SELECT IFNULL(SUM(issue_count), 0) FROM volume_stats) AS issues,
+                (SELECT IFNULL(SUM(issues_downloaded), 0) FROM volume_stats) AS downloaded_issues,
                 (SELECT COUNT(*) FROM files) AS files,
                 (SELECT IFNULL(SUM(size), 0) FROM files) AS total_file_size
             FROM v;
@@ -1056,113 +1175,132 @@ class Library:
 
         vd = run(ComicVine().fetch_volume(comicvine_id))
 
-        cursor = get_db()
-        with cursor:
-            volume_id = cursor.execute(
-                """
-                INSERT INTO volumes(
-                    comicvine_id,
-                    title,
-                    alt_title,
-                    year,
-                    publisher,
-                    volume_number,
-                    description,
-                    site_url,
-                    monitored,
-                    monitor_new_issues,
-                    root_folder,
-                    custom_folder,
-                    last_cv_fetch,
-                    special_version,
-                    special_version_locked
-                ) VALUES (
-                    :comicvine_id, :title, :alt_title,
-                    :year, :publisher, :volume_number, :description,
-                    :site_url, :monitored, :monitor_new_issues,
-                    :root_folder, :custom_folder,
-                    :last_cv_fetch, :special_version, :special_version_locked
-                );
-                """,
-                {
-                    "comicvine_id": vd["comicvine_id"],
-                    "title": vd["title"],
-                    "alt_title": (vd["aliases"] or [None])[0],
-                    "year": vd["year"],
-                    "publisher": vd["publisher"],
-                    "volume_number": vd["volume_number"],
-                    "description": vd["description"],
-                    "site_url": vd["site_url"],
-                    "monitored": monitored,
-                    "monitor_new_issues": monitor_new_issues,
-                    "root_folder": root_folder.id,
-                    "custom_folder": volume_folder is not None,
-                    "last_cv_fetch": round(time()),
-                    "special_version": None,
-                    "special_version_locked": special_version is not None
-                }
-            ).lastrowid
-
-            cursor.execute(
-                """
-                INSERT INTO volumes_covers(volume_id, cover)
-                VALUES (:volume_id, :cover);
-                """,
-                {
-                    "volume_id": volume_id,
-                    "cover": vd["cover"]
-                }
-            )
+        # The file of the cover is written outside of the transaction,
+        # so that it can be removed again when it's rolled back
+        cover_hash = store_cover(vd["cover"]) if vd["cover"] else None
 
-            cursor.executemany("""
-                INSERT INTO issues(
-                    volume_id,
-                    comicvine_id,
-                    issue_number,
-                    calculated_issue_number,
-                    title,
-                    date,
-                    description,
-                    monitored
-                ) VALUES (
-                    :volume_id, :comicvine_id,
-                    :issue_number, :calculated_issue_number,
-                    :title, :date, :description,
-                    :monitored
-                );
-                """,
-                (
+        cursor = get_db()
+        try:
+            with cursor:
+                volume_id = cursor.execute(
+                    """
+                    INSERT INTO volumes(
+                        comicvine_id,
+                        title,
+                        alt_title,
+                        year,
+                        publisher,
+                        volume_number,
+                        description,
+                        site_url,
+                        monitored,
+                        monitor_new_issues,
+                        root_folder,
+                        custom_folder,
+                        last_cv_fetch,
+                        special_version,
+                        special_version_locked
+                    ) VALUES (
+                        :comicvine_id, :title, :alt_title,
+                        :year, :publisher, :volume_number, :description,
+                        :site_url, :monitored, :monitor_new_issues,
+                        :root_folder, :custom_folder,
+                        :last_cv_fetch, :special_version, :special_version_locked
+                    );
+                    """,
                     {
-                        "volume_id": volume_id,
-                        "comicvine_id": i["comicvine_id"],
-                        "issue_number": i["issue_number"],
-                        "calculated_issue_number": i["calculated_issue_number"],
-                        "title": i["title"],
-                        "date": i["date"],
-                        "description": i["description"],
-                        "monitored": True
+                        "comicvine_id": vd["comicvine_id"],
+                        "title": vd["title"],
+                        "alt_title": (vd["aliases"] or [None])[0],
+                        "year": vd["year"],
+                        "publisher": vd["publisher"],
+                        "volume_number": vd["volume_number"],
+                        "description": vd["description"],
+                        "site_url": vd["site_url"],
+                        "monitored": monitored,
+                        "monitor_new_issues": monitor_new_issues,
+                        "root_folder": root_folder.id,
+                        "custom_folder": volume_folder is not None,
+                        "last_cv_fetch": round(time()),
+                        "special_version": None,
+                        "special_version_locked": special_version is not None
                     }
-                    for i in vd["issues"] or []
+                ).lastrowid
+
+                if cover_hash:
+                    cursor.execute(
+                        """
+                        INSERT INTO volume_covers(volume_id, cover_hash, cover_link)
+                        VALUES (:volume_id, :cover_hash, :cover_link);
+                        """,
+                        {
+                            "volume_id": volume_id,
+                            "cover_hash": cover_hash,
+                            "cover_link": vd["cover_link"]
+                        }
+                    )
+
+                VolumeSearchDB.update((_get_search_entry(
+                    volume_id,
+                    vd["title"],
+                    (vd["aliases"] or [None])[0],
+                    vd["publisher"]
+                ),))
+
+                cursor.executemany("""
+                    INSERT INTO issues(
+                        volume_id,
+                        comicvine_id,
+                        issue_number,
+                        calculated_issue_number,
+                        title,
+                        date,
+                        description,
+                        monitored
+                    ) VALUES (
+                        :volume_id, :comicvine_id,
+                        :issue_number, :calculated_issue_number,
+                        :title, :date, :description,
+                        :monitored
+                    );
+                    """,
+                    (
+                        {
+                            "volume_id": volume_id,
+                            "comicvine_id": i["comicvine_id"],
+                            "issue_number": i["issue_number"],
+                            "calculated_issue_number": i["calculated_issue_number"],
+                            "title": i["title"],
+                            "date": i["date"],
+                            "description": i["description"],
+                            "monitored": True
+                        }
+                        for i in vd["issues"] or []
+                    )
                 )
-            )
 
-            volume = Volume(volume_id)
+                volume = Volume(volume_id)
 
-            if special_version is None:
-                special_version = determine_special_version(volume.id)
-            volume['special_version'] = special_version
+                if special_version is None:
+                    special_version = determine_special_version(volume.id)
+                volume['special_version'] = special_version
 
-            folder = generate_volume_folder_path(
-                root_folder.folder,
-                volume_folder or volume_id
-            )
-            volume['folder'] = folder
+                folder = generate_volume_folder_path(
+                    root_folder.folder,
+                    volume_folder or volume_id
+                )
+                volume['folder'] = folder
+
+                if Settings().sv.create_empty_volume_folders:
+                    create_folder(folder)
+                    scan_files(volume_id)
 
-            if Settings().sv.create_empty_volume_folders:
-                create_folder(folder)
-                scan_files(volume_id)
+                volume.apply_monitor_scheme(monitor_scheme)
 
-            volume.apply_monitor_scheme(monitor_scheme)
+        except BaseException:
+            if cover_hash:
+                delete_unused_covers((cover_hash,))
+            raise
 
         if auto_search:
             from backend.features.tasks import AutoSearchVolume, TaskHandler
@@ -1177,63 +1315,337 @@ class Library:
         )
         return volume_id
 
+    def add_multiple(self,
+        volumes: Sequence[Tuple[int, int, Union[str, None]]],
+        monitored: bool,
+        monitor_scheme: MonitorScheme = MonitorScheme.ALL,
+        monitor_new_issues: bool = True,
+        special_version: Union[SpecialVersion, None] = None,
+        auto_search: bool = False
+    ) -> Dict[int, int]:
+        """Add multiple volumes to the library at once. The metadata is fetched
+        in shared batches, each batch is inserted completely (folder, special
+        version and monitoring included) in its own short transaction and one
+        scan is done for all of them afterwards. Volumes that are already
+        added or that aren't found on CV are skipped.
+
+        Args:
+            volumes (Sequence[Tuple[int, int, Union[str, None]]]): The CV ID,
+            the ID of the root folder and the custom volume folder (or `None`)
+            of each volume.
+
+            monitored (bool): Whether the volumes should be monitored.
+
+            monitor_scheme (MonitorScheme, optional): Which issues to monitor.
+                Defaults to `MonitorScheme.ALL`.
+
+            monitor_new_issues (bool, optional): Whether to monitor new issues.
+                Defaults to True.
+
+            special_version (Union[SpecialVersion, None], optional): Give `None`
+            to let Kapowarr determine the special version ('auto'). Otherwise,
+            give a `SpecialVersion` to override and lock the special version
+            state.
+                Defaults to None.
+
+            auto_search (bool, optional): Start an auto search for the volumes
+            after adding them.
+                Defaults to False.
+
+        Raises:
+            RootFolderNotFound: The root folder with the given ID was not found.
+
+        Returns:
+            Dict[int, int]: Map of the CV ID's of the added volumes to their
+            new ID.
+        """
+        from backend.implementations.naming import generate_volume_folder_path
+
+        LOGGER.info(
+            'Adding %d volumes to the library: '
+            'M %s, MS %s, MNI %s, SV %s',
+            len(volumes),
+            monitored,
+            monitor_scheme.value,
+            monitor_new_issues,
+            special_version
+        )
+
+        cursor = get_db()
+        added_cv_ids: Set[int] = set()
+        for cv_ids_batch in batched(tuple(v[0] for v in volumes), 900):
+            added_cv_ids.update(first_of_subarrays(cursor.execute(f"""
+                SELECT comicvine_id
+                FROM volumes
+                WHERE comicvine_id IN ({",".join("?" * len(cv_ids_batch))});
+                """,
+                cv_ids_batch
+            )))
+
+        # Raises RootFolderNotFound when ID is invalid
+        root_folders = RootFolders()
+        cv_to_folders: Dict[int, Tuple[RootFolder, Union[str, None]]] = {
+            cv_id: (root_folders.get_one(root_folder_id), volume_folder)
+            for cv_id, root_folder_id, volume_folder in volumes
+            if cv_id not in added_cv_ids
+        }
+        if not cv_to_folders:
+            return {}
+
+        async def fetch_and_insert() -> Dict[int, int]:
+            cv_to_id: Dict[int, int] = {}
+            async for volume_datas, issue_datas in _fetch_refresh_batches(
+                ComicVine(), tuple(cv_to_folders), {}
+            ):
+                if not volume_datas:
+                    continue
+
+                # The files of the covers are written outside of the
+                # transaction, so that they can be removed again when it's
+                # rolled back
+                cover_hashes: Dict[int, str] = {
+                    vd["comicvine_id"]: store_cover(vd["cover"])
+                    for vd in volume_datas
+                    if vd["cover"]
+                }
+
+                # Each batch is written in its own transaction, so that the
+                # database isn't locked while the next batch is fetched
+                try:
+                    with cursor:
+                        cursor.executemany(
+                            """
+                            INSERT INTO volumes(
+                                comicvine_id,
+                                title,
+                                alt_title,
+                                year,
+                                publisher,
+                                volume_number,
+                                description,
+                                site_url,
+                                monitored,
+                                monitor_new_issues,
+                                root_folder,
+                                custom_folder,
+                                last_cv_fetch,
+                                special_version,
+                                special_version_locked
+                            ) VALUES (
+                                :comicvine_id, :title, :alt_title,
+                                :year, :publisher, :volume_number, :description,
+                                :site_url, :monitored, :monitor_new_issues,
+                                :root_folder, :custom_folder,
+                                :last_cv_fetch, :special_version, :special_version_locked
+                            );
+                            """,
+                            (
+                                {
+                                    "comicvine_id": vd["comicvine_id"],
+                                    "title": vd["title"],
+                                    "alt_title": (vd["aliases"] or [None])[0],
+                                    "year": vd["year"],
+                                    "publisher": vd["publisher"],
+                                    "volume_number": vd["volume_number"],
+                                    "description": vd["description"],
+                                    "site_url": vd["site_url"],
+                                    "monitored": monitored,
+                                    "monitor_new_issues": monitor_new_issues,
+                                    "root_folder": cv_to_folders[vd["comicvine_id"]][0].id,
+                                    "custom_folder": (
+                                        cv_to_folders[vd["comicvine_id"]][1] is not None
+                                    ),
+                                    "last_cv_fetch": round(time()),
+                                    "special_version": special_version,
+                                    "special_version_locked": special_version is not None
+                                }
+                                for vd in volume_datas
+                            )
+                        )
+
+                        batch_cv_to_id: Dict[int, int] = dict(cursor.execute(f"""
+                            SELECT comicvine_id, id
+                            FROM volumes
+                            WHERE comicvine_id IN ({",".join("?" * len(volume_datas))});
+                            """,
+                            tuple(vd["comicvine_id"] for vd in volume_datas)
+                        ).fetchall())
+                        cv_to_id.update(batch_cv_to_id)
+
+                        cursor.executemany(
+                            """
+                            INSERT INTO volume_covers(volume_id, cover_hash, cover_link)
+                            VALUES (:volume_id, :cover_hash, :cover_link);
+                            """,
+                            ({
+                                "volume_id": batch_cv_to_id[vd["comicvine_id"]],
+                                "cover_hash": cover_hashes[vd["comicvine_id"]],
+                                "cover_link": vd["cover_link"]
+                            }
+                                for vd in volume_datas
+                                if vd["comicvine_id"] in cover_hashes
+                            ))
+
+                        VolumeSearchDB.update(
+                            _get_search_entry(
+                                batch_cv_to_id[vd["comicvine_id"]],
+                                vd["title"],
+                                (vd["aliases"] or [None])[0],
+                                vd["publisher"]
+                            )
+                            for vd in volume_datas
+                        )
+
+                        cursor.executemany("""
+                            INSERT INTO issues(
+                                volume_id,
+                                comicvine_id,
+                                issue_number,
+                                calculated_issue_number,
+                                title,
+                                date,
+                                description,
+                                monitored
+                            ) VALUES (
+                                :volume_id, :comicvine_id,
+                                :issue_number, :calculated_issue_number,
+                                :title, :date, :description,
+                                :monitored
+                            );
+                            """,
+                            (
+                                {
+                                    "volume_id": batch_cv_to_id[i["volume_id"]],
+                                    "comicvine_id": i["comicvine_id"],
+                                    "issue_number": i["issue_number"],
+                                    "calculated_issue_number": i["calculated_issue_number"],
+                                    "title": i["title"],
+                                    "date": i["date"],
+                                    "description": i["description"],
+                                    "monitored": True
+                                }
+                                for i in issue_datas
+                            )
+                        )
+
+                        if special_version is None:
+                            cursor.executemany(
+                                "UPDATE volumes SET special_version = ? WHERE id = ?;",
+                                (
+                                    (sv, volume_id)
+                                    for volume_id, sv in determine_special_versions(
+                                        tuple(batch_cv_to_id.values())
+                                    ).items()
+                                )
+                            )
+
+                        for cv_id, volume_id in batch_cv_to_id.items():
+                            root_folder, volume_folder = cv_to_folders[cv_id]
+                            folder = generate_volume_folder_path(
+                                root_folder.folder,
+                                volume_folder or volume_id
+                            )
+                            volume = Volume(volume_id)
+                            volume['folder'] = folder
+                            volume.apply_monitor_scheme(monitor_scheme)
+
+                            if create_empty_volume_folders:
+                                create_folder(folder)
+
+                except BaseException:
+                    delete_unused_covers(cover_hashes.values())
+                    raise
+
+            return cv_to_id
+
+        create_empty_volume_folders = Settings().sv.create_empty_volume_folders
+        cv_to_id = run(fetch_and_insert())
+
+        not_found = len(cv_to_folders) - len(cv_to_id)
+        if not_found:
+            LOGGER.warning(f'{not_found} volumes were not found on CV')
+
+        scan_library(list(cv_to_id.values()))
+
+        if monitor_scheme == MonitorScheme.MISSING:
+            # Which issues are missing is only known after scanning
+            with cursor:
+                for volume_id in cv_to_id.values():
+                    Volume(volume_id).apply_monitor_scheme(monitor_scheme)
+
+        if auto_search:
+            from backend.features.tasks import AutoSearchVolume, TaskHandler
+
+            for volume_id in cv_to_id.values():
+                TaskHandler().add(AutoSearchVolume(volume_id))
+
+        LOGGER.info(f'Added {len(cv_to_id)} volumes')
+        return cv_to_id
+
 
 # =====================
 # region Scanning and updating
 # =====================
-def determine_special_version(volume_id: int) -> SpecialVersion:
-    """Determine if a volume is a special version.
+def _classify_special_version(
+    title: str,
+    description: Union[str, None],
+    issues: Sequence[Tuple[Union[str, None], Union[str, None]]]
+) -> SpecialVersion:
+    """Determine if a volume is a special version, based on its data.
 
     Args:
-        volume_id (int): The ID of the volume to determine for.
+        title (str): The title of the volume.
+        description (Union[str, None]): The description of the volume.
+        issues (Sequence[Tuple[Union[str, None], Union[str, None]]]): The
+        title and date of each issue of the volume.
 
     Returns:
         SpecialVersion: The result.
     """
-    volume = Volume(volume_id)
-    volume_data = volume.get_data()
-    issues = volume.get_issues()
     one_issue = len(issues) == 1
+    first_issue_title, first_issue_date = (
+        issues[0] if issues else (None, None)
+    )
 
     if issues and all(
-        vol_regex.search(i.title or '')
-        for i in issues
+        vol_regex.search(issue_title or '')
+        for issue_title, _ in issues
     ):
         return SpecialVersion.VOLUME_AS_ISSUE
 
     if one_issue:
-        if omnibus_regex.search(volume_data.title):
+        if omnibus_regex.search(title):
             return SpecialVersion.OMNIBUS
 
-        if os_regex.search(volume_data.title):
+        if os_regex.search(title):
             return SpecialVersion.ONE_SHOT
 
-        if hc_regex.search(volume_data.title):
+        if hc_regex.search(title):
             return SpecialVersion.HARD_COVER
 
-        if (issues[0].title or '').lower() == 'omnibus':
+        if (first_issue_title or '').lower() == 'omnibus':
             return SpecialVersion.OMNIBUS
 
-        if (issues[0].title or '').lower().replace(' ', '') in (
+        if (first_issue_title or '').lower().replace(' ', '') in (
             'hc', 'hard-cover', 'hardcover'
         ):
             return SpecialVersion.HARD_COVER
 
-        if (issues[0].title or '').lower().replace(' ', '') in (
+        if (first_issue_title or '').lower().replace(' ', '') in (
             'os', 'one-shot', 'oneshot'
         ):
             return SpecialVersion.ONE_SHOT
 
-    if 'annual' in volume_data.title.lower():
+    if 'annual' in title.lower():
         # Volume is annual
         return SpecialVersion.NORMAL
 
-    if one_issue and volume_data.description:
+    if one_issue and description:
         # Look for Special Version in first sentence of description.
         # Only first sentence as to avoid false hits (e.g. referring in desc
         # to other volume that is Special Version à la
         # "Also available as one shot")
-        first_sentence = split_regex.split(volume_data.description)[0]
+        first_sentence = split_regex.split(description)[0]
         first_sentence = remove_link_regex.sub('', first_sentence)
         if omnibus_regex.search(first_sentence):
             return SpecialVersion.OMNIBUS
@@ -1244,9 +1656,9 @@ def determine_special_version(volume_id: int) -> SpecialVersion:
         if hc_regex.search(first_sentence):
             return SpecialVersion.HARD_COVER
 
-    if one_issue and issues[0].date:
+    if one_issue and first_issue_date:
         thirty_plus_days_ago = (
-            datetime.now() - datetime.strptime(issues[0].date, "%Y-%m-%d")
+            datetime.now() - datetime.strptime(first_issue_date, "%Y-%m-%d")
             > THIRTY_DAYS
         )
 
@@ -1256,133 +1668,306 @@ def determine_special_version(volume_id: int) -> SpecialVersion:
     return SpecialVersion.NORMAL
 
 
-def scan_files(
-    volume_id: int,
-    filepath_filter: List[str] = [],
-    del_unmatched_files: bool = True,
-    update_websocket: bool = False
-) -> None:
-    """Scan inside the volume folder for files and map them to issues.
+def determine_special_version(volume_id: int) -> SpecialVersion:
+    """Determine if a volume is a special version.
 
     Args:
-        volume_id (int): The ID of the volume to scan for.
-
-        filepath_filter (List[str], optional): Only scan specific files.
-        Intended for adding files to a volume only.
-            Defaults to [].
-
-        del_unmatched_files (bool, optional): Delete file entries in the DB
-        that aren't linked to anything anymore.
-            Defaults to True.
+        volume_id (int): The ID of the volume to determine for.
 
-        update_websocket (bool, optional): Send websocket messages on changes
-        about the download status of the issues.
-            Defaults to False.
+    Returns:
+        SpecialVersion: The result.
     """
-    LOGGER.debug(f'Scanning for files for {volume_id}')
-
-    settings = Settings().get_settings()
-    volume = Volume(volume_id)
-    volume_data = volume.get_data()
+    return determine_special_versions((volume_id,))[volume_id]
 
-    if not isdir(volume_data.folder):
-        if settings.create_empty_volume_folders:
-            create_folder(volume_data.folder)
-        else:
-            return
 
-    volume_issues = volume.get_issues(_skip_files=True)
-    general_files = tuple(
-        (gf['id'], gf['file_type'])
-        for gf in volume.get_general_files()
-    )
-    volume_files = {
-        f['filepath']: f['id']
-        for f in volume.get_all_files()
-    }
-    number_to_year: Dict[float, Union[int, None]] = {
-        i.calculated_issue_number: extract_year_from_date(i.date)
-        for i in volume_issues
-    }
+def determine_special_versions(
+    volume_ids: Sequence[int]
+) -> Dict[int, SpecialVersion]:
+    """Determine if volumes are a special version. The data of all volumes is
+    fetched with a few queries instead of per volume.
 
-    bindings: List[Tuple[int, int]] = []
-    general_bindings: List[Tuple[int, str]] = []
-    folder_contents = list_files(
-        folder=volume_data.folder,
-        ext=FileConstants.SCANNABLE_EXTENSIONS
-    )
-    for file in filtered_iter(folder_contents, set(filepath_filter)):
-        file_data = extract_filename_data(file)
-
-        # Check if file matches volume
-        if not file_importing_filter(
-            file_data,
-            volume_data,
-            volume_issues,
-            number_to_year
-        ):
-            continue
+    Args:
+        volume_ids (Sequence[int]): The IDs of the volumes to determine for.
 
-        if (
-            file_data['special_version'] == SpecialVersion.COVER
-            and file_data["issue_number"] is None
+    Returns:
+        Dict[int, SpecialVersion]: Map of volume ID to the result.
+    """
+    cursor = get_db()
+    result: Dict[int, SpecialVersion] = {}
+    for volume_ids_batch in batched(volume_ids, 900):
+        placeholders = ",".join("?" * len(volume_ids_batch))
+
+        volume_issues: Dict[
+            int, List[Tuple[Union[str, None], Union[str, None]]]
+        ] = {}
+        for issue in cursor.execute(f"""
+            SELECT volume_id, title, date
+            FROM issues
+            WHERE volume_id IN ({placeholders});
+            """,
+            volume_ids_batch
         ):
-            # Volume cover file
-            if file not in volume_files:
-                volume_files[file] = FilesDB.add_file(file)
-
-            general_bindings.append(
-                (volume_files[file], GeneralFileType.COVER.value)
+            volume_issues.setdefault(issue[0], []).append(
+                (issue[1], issue[2])
             )
 
-        elif (
-            file_data['special_version'] == SpecialVersion.METADATA
-            and file_data["issue_number"] is None
-        ):
-            # Volume metadata file
-            if file not in volume_files:
-                volume_files[file] = FilesDB.add_file(file)
-
-            general_bindings.append(
-                (volume_files[file], GeneralFileType.METADATA.value)
+        for volume in cursor.execute(f"""
+            SELECT id, title, description
+            FROM volumes
+            WHERE id IN ({placeholders});
+            """,
+            volume_ids_batch
+        ).fetchall():
+            result[volume[0]] = _classify_special_version(
+                volume[1],
+                volume[2],
+                volume_issues.get(volume[0], [])
             )
 
-        elif (
-            volume_data.special_version not in (
-                SpecialVersion.VOLUME_AS_ISSUE,
-                SpecialVersion.NORMAL
-            )
-            and file_data['special_version']
-        ):
-            # Special Version
-            if file not in volume_files:
-                volume_files[file] = FilesDB.add_file(file)
+    return result
 
-            bindings.append((volume_files[file], volume_issues[0].id))
 
-        elif (
-            file_data['issue_number'] is not None
-            or volume_data.special_version == SpecialVersion.VOLUME_AS_ISSUE
-        ):
-            # Normal issue
-            issue_range = file_data["issue_number"]
-            if (
-                volume_data.special_version == SpecialVersion.VOLUME_AS_ISSUE
-                and file_data["issue_number"] is None
-            ):
-                issue_range = file_data['volume_number']
+def _get_search_entry(
+    volume_id: int,
+    title: str,
+    alt_title: Union[str, None],
+    publisher: Union[str, None]
+) -> Tuple[int, str, Union[str, None], Union[str, None]]:
+    """Get the entry of a volume for the search index.
 
-            matching_issues = volume.get_issues_in_range(
-                *force_range(issue_range) # type: ignore
-            )
+    Args:
+        volume_id (int): The ID of the volume.
+        title (str): The title of the volume.
+        alt_title (Union[str, None]): The alternative title of the volume.
+        publisher (Union[str, None]): The publisher of the volume.
+
+    Returns:
+        Tuple[int, str, Union[str, None], Union[str, None]]: The ID and the
+        normalised title, alternative title and publisher.
+    """
+    return (
+        volume_id,
+        clean_title(title),
+        clean_title(alt_title) if alt_title else None,
+        clean_title(publisher) if publisher else None
+    )
+
+
+def rebuild_search_index() -> None:
+    """Fill the search index with all volumes in the library from scratch"""
+    VolumeSearchDB.clear()
+    VolumeSearchDB.update(
+        _get_search_entry(*v)
+        for v in get_db().execute(
+            "SELECT id, title, alt_title, publisher FROM volumes;"
+        ).fetchall()
+    )
+    return
+
+
+def _get_scan_hash(
+    volume_data: VolumeData,
+    volume_issues: List[IssueData]
+) -> str:
+    """Get a hash of all the data of a volume that file matching depends on.
+    If the hash changes, the cached match results of the files of the volume
+    are invalid.
+
+    Args:
+        volume_data (VolumeData): The data of the volume.
+        volume_issues (List[IssueData]): The data of the issues of the volume.
+
+    Returns:
+        str: The hash.
+    """
+    return sha1(repr((
+        volume_data.title,
+        volume_data.year,
+        volume_data.volume_number,
+        volume_data.special_version.value,
+        tuple(
+            (i.id, i.calculated_issue_number, i.date)
+            for i in volume_issues
+        )
+    )).encode()).hexdigest()
+
+
+def _match_file(
+    file: str,
+    volume: Volume,
+    volume_data: VolumeData,
+    volume_issues: List[IssueData],
+    number_to_year: Mapping[float, Union[int, None]]
+) -> Tuple[Union[str, None], List[int]]:
+    """Determine what a file in the volume folder is for.
+
+    Args:
+        file (str): The filepath of the file.
+        volume (Volume): The volume.
+        volume_data (VolumeData): The data of the volume.
+        volume_issues (List[IssueData]): The data of the issues of the volume.
+        number_to_year (Mapping[float, Union[int, None]]):
+            calculated_issue_number to release year for all issues of volume.
+
+    Returns:
+        Tuple[Union[str, None], List[int]]: The general file type if the file
+        is a general file, and the IDs of the issues that the file covers.
+        `(None, [])` if the file doesn't match to anything.
+    """
+    file_data = extract_filename_data(file)
+
+    # Check if file matches volume
+    if not file_importing_filter(
+        file_data,
+        volume_data,
+        volume_issues,
+        number_to_year
+    ):
+        return None, []
+
+    if (
+        file_data['special_version'] == SpecialVersion.COVER
+        and file_data["issue_number"] is None
+    ):
+        # Volume cover file
+        return GeneralFileType.COVER.value, []
+
+    if (
+        file_data['special_version'] == SpecialVersion.METADATA
+        and file_data["issue_number"] is None
+    ):
+        # Volume metadata file
+        return GeneralFileType.METADATA.value, []
+
+    if (
+        volume_data.special_version not in (
+            SpecialVersion.VOLUME_AS_ISSUE,
+            SpecialVersion.NORMAL
+        )
+        and file_data['special_version']
+    ):
+        # Special Version
+        return None, [volume_issues[0].id]
+
+    if (
+        file_data['issue_number'] is not None
+        or volume_data.special_version == SpecialVersion.VOLUME_AS_ISSUE
+    ):
+        # Normal issue
+        issue_range = file_data["issue_number"]
+        if (
+            volume_data.special_version == SpecialVersion.VOLUME_AS_ISSUE
+            and file_data["issue_number"] is None
+        ):
+            issue_range = file_data['volume_number']
+
+        return None, [
+            issue.id
+            for issue in volume.get_issues_in_range(
+                *force_range(issue_range) # type: ignore
+            )
+        ]
 
-            if matching_issues:
-                if file not in volume_files:
-                    volume_files[file] = FilesDB.add_file(file)
+    return None, []
 
-                for issue in matching_issues:
-                    bindings.append((volume_files[file], issue.id))
 
+def _match_volume_files(
+    volume: Volume,
+    volume_data: VolumeData,
+    manifest: Dict[str, ScanManifestData],
+    filepath_filter: List[str]
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, str]]]:
+    """Match the files in the manifest of a volume to its issues. Files whose
+    manifest entry has a valid cached result aren't matched again. The
+    manifest is updated in-place with the new results.
+
+    Args:
+        volume (Volume): The volume.
+        volume_data (VolumeData): The data of the volume.
+        manifest (Dict[str, ScanManifestData]): The manifest of the volume
+            folder.
+        filepath_filter (List[str]): Only match specific files.
+
+    Returns:
+        Tuple[List[Tuple[int, int]], List[Tuple[int, str]]]: The file to issue
+        bindings and the file to general file type bindings.
+    """
+    volume_issues = volume.get_issues(_skip_files=True)
+    volume_files = {
+        f['filepath']: f['id']
+        for f in volume.get_all_files()
+    }
+    number_to_year: Dict[float, Union[int, None]] = {
+        i.calculated_issue_number: extract_year_from_date(i.date)
+        for i in volume_issues
+    }
+    volume_hash = _get_scan_hash(volume_data, volume_issues)
+
+    bindings: List[Tuple[int, int]] = []
+    general_bindings: List[Tuple[int, str]] = []
+    changed_sizes: List[Tuple[str, int]] = []
+    folder_contents = [
+        filepath
+        for filepath, entry in manifest.items()
+        if not entry['is_dir']
+    ]
+    for file in filtered_iter(folder_contents, set(filepath_filter)):
+        entry = manifest[file]
+        if entry['volume_hash'] != volume_hash:
+            # File is new or changed, or the volume changed
+            file_type, issue_ids = _match_file(
+                file, volume, volume_data, volume_issues, number_to_year
+            )
+            entry = manifest[file] = {
+                **entry,
+                'volume_hash': volume_hash,
+                'file_type': file_type,
+                'issue_ids': str(CommaList(map(str, issue_ids)))
+            }
+            if file in volume_files:
+                changed_sizes.append((file, entry['size']))
+
+        else:
+            file_type = entry['file_type']
+            issue_ids = [int(i) for i in CommaList(entry['issue_ids'] or '')]
+
+        if not (file_type or issue_ids):
+            continue
+
+        if file not in volume_files:
+            volume_files[file] = FilesDB.add_file(file)
+
+        if file_type:
+            general_bindings.append((volume_files[file], file_type))
+
+        for issue_id in issue_ids:
+            bindings.append((volume_files[file], issue_id))
+
+    FilesDB.update_sizes(changed_sizes)
+
+    return bindings, general_bindings
+
+
+def _apply_volume_bindings(
+    volume_id: int,
+    bindings: List[Tuple[int, int]],
+    general_bindings: List[Tuple[int, str]],
+    filepath_filter: List[str],
+    update_websocket: bool
+) -> None:
+    """Update the file bindings of a volume in the database to the given
+    bindings.
+
+    Args:
+        volume_id (int): The ID of the volume.
+        bindings (List[Tuple[int, int]]): The file to issue bindings.
+        general_bindings (List[Tuple[int, str]]): The file to general file
+            type bindings.
+        filepath_filter (List[str]): The filter that was used when matching
+            the files. If given, bindings are only added, not removed.
+        update_websocket (bool): Send websocket messages on changes about the
+            download status of the issues.
+    """
     cursor = get_db()
 
     # Find out what exactly is deleted, added, which issues are now downloaded,
@@ -1399,6 +1984,10 @@ def scan_files(
             (volume_id,)
         )
     ]
+    general_files = tuple(
+        (gf['id'], gf['file_type'])
+        for gf in GeneralFilesDB.fetch(volume_id)
+    )
     delete_bindings = tuple(
         b
         for b in current_bindings
@@ -1438,7 +2027,7 @@ def scan_files(
             delete_bindings
         )
 
-        if settings.unmonitor_deleted_issues:
+        if Settings().sv.unmonitor_deleted_issues:
             cursor.executemany(
                 "UPDATE issues SET monitored = 0 WHERE id = ?;",
                 ((issue_id,) for issue_id in deleted_downloaded_issues)
@@ -1485,32 +2074,523 @@ def scan_files(
         """,
         ((b[0], b[1], volume_id) for b in general_bindings)
     )
+    return
+
+
+def _clean_volume_folder(volume_data: VolumeData) -> None:
+    """Delete empty folders in the volume folder, and the volume folder itself
+    if it's empty, based on the settings.
+
+    Args:
+        volume_data (VolumeData): The data of the volume.
+    """
+    settings = Settings().sv
+    if not settings.delete_empty_folders or not isdir(volume_data.folder):
+        return
+
+    delete_empty_child_folders(volume_data.folder, skip_hidden_folders=True)
+    if (
+        not list_files(volume_data.folder)
+        and not settings.create_empty_volume_folders
+    ):
+        delete_empty_parent_folders(
+            volume_data.folder,
+            RootFolders()[volume_data.root_folder]
+        )
+    return
+
+
+def scan_files(
+    volume_id: int,
+    filepath_filter: List[str] = [],
+    del_unmatched_files: bool = True,
+    update_websocket: bool = False,
+    force_full_scan: bool = False
+) -> None:
+    """Scan inside the volume folder for files and map them to issues.
+
+    The result of a scan is stored in a manifest. On the next scan, folders
+    and files that haven't changed since, re-use their result instead of
+    being processed again.
+
+    Args:
+        volume_id (int): The ID of the volume to scan for.
+
+        filepath_filter (List[str], optional): Only scan specific files.
+        Intended for adding files to a volume only.
+            Defaults to [].
+
+        del_unmatched_files (bool, optional): Delete file entries in the DB
+        that aren't linked to anything anymore.
+            Defaults to True.
+
+        update_websocket (bool, optional): Send websocket messages on changes
+        about the download status of the issues.
+            Defaults to False.
+
+        force_full_scan (bool, optional): Ignore the manifest of the previous
+        scan and process all files again.
+            Defaults to False.
+    """
+    LOGGER.debug(f'Scanning for files for {volume_id}')
+
+    volume = Volume(volume_id)
+    volume_data = volume.get_data()
+
+    if not isdir(volume_data.folder):
+        if Settings().sv.create_empty_volume_folders:
+            create_folder(volume_data.folder)
+        else:
+            return
+
+    old_manifest = ScanManifestDB.fetch(volume_id)
+    manifest = list_files_incremental(
+        folder=volume_data.folder,
+        ext=FileConstants.SCANNABLE_EXTENSIONS,
+        manifest={} if force_full_scan else old_manifest
+    )
+
+    bindings, general_bindings = _match_volume_files(
+        volume, volume_data, manifest, filepath_filter
+    )
+    _apply_volume_bindings(
+        volume_id, bindings, general_bindings,
+        filepath_filter, update_websocket
+    )
+    ScanManifestDB.update(volume_id, old_manifest, manifest)
 
     if del_unmatched_files:
         FilesDB.delete_unmatched_files()
 
     commit()
 
-    if settings.delete_empty_folders:
-        delete_empty_child_folders(volume_data.folder, skip_hidden_folders=True)
-        if (
-            not list_files(volume_data.folder)
-            and not settings.create_empty_volume_folders
+    _clean_volume_folder(volume_data)
+    return
+
+
+def scan_library(
+    volume_ids: Union[List[int], None] = None,
+    update_websocket: bool = False,
+    force_full_scan: bool = False
+) -> None:
+    """Scan for files of multiple volumes at once and map them to issues.
+    Instead of listing the folder of each volume separately, each root folder
+    is walked once and the files found are routed to the volumes that they
+    are for. Only folders that are, or contain, a volume folder are walked.
+    All changes are applied in one transaction.
+
+    Args:
+        volume_ids (Union[List[int], None], optional): The IDs of the volumes
+        to scan for. `None` to scan for all volumes.
+            Defaults to None.
+
+        update_websocket (bool, optional): Send task progress updates and
+        changes about the download status of the issues over the websocket.
+            Defaults to False.
+
+        force_full_scan (bool, optional): Ignore the manifest of the previous
+        scan and process all files again.
+            Defaults to False.
+    """
+    LOGGER.debug(f'Scanning for files for library ({volume_ids or "all"})')
+
+    if volume_ids is None:
+        volume_ids = Library().get_volumes()
+
+    create_empty_volume_folders = Settings().sv.create_empty_volume_folders
+    root_folders = RootFolders()
+    volumes: Dict[int, Tuple[Volume, VolumeData]] = {}
+    folder_trie: FolderTrie[int] = FolderTrie()
+    walk_folders: Set[str] = set()
+    for volume_id in volume_ids:
+        volume = Volume(volume_id)
+        volume_data = volume.get_data()
+
+        if not isdir(volume_data.folder):
+            if create_empty_volume_folders:
+                create_folder(volume_data.folder)
+            else:
+                continue
+
+        volumes[volume_id] = (volume, volume_data)
+        folder_trie.add(volume_data.folder, volume_id)
+
+        root_folder = root_folders[volume_data.root_folder]
+        if folder_is_inside_folder(root_folder, volume_data.folder):
+            walk_folders.add(root_folder)
+        else:
+            walk_folders.add(volume_data.folder)
+
+    old_manifests = ScanManifestDB.fetch_multiple(list(volumes))
+    previous_entries: Dict[str, ScanManifestData] = {}
+    if not force_full_scan:
+        for old_manifest in old_manifests.values():
+            previous_entries.update(old_manifest)
+
+    # Walk each folder once
+    manifests: Dict[int, Dict[str, ScanManifestData]] = {
+        volume_id: {}
+        for volume_id in volumes
+    }
+    for walk_folder in walk_folders:
+        if any(
+            other != walk_folder
+            and folder_is_inside_folder(other, walk_folder)
+            for other in walk_folders
         ):
-            delete_empty_parent_folders(
-                volume_data.folder,
-                RootFolders()[volume_data.root_folder]
+            # Already walked as part of other folder
+            continue
+
+        entries = list_files_incremental(
+            folder=walk_folder,
+            ext=FileConstants.SCANNABLE_EXTENSIONS,
+            manifest=previous_entries,
+            skip_folder=lambda f: not folder_trie.is_relevant(f)
+        )
+        for path, entry in entries.items():
+            for volume_id in folder_trie.get_values(path):
+                manifests[volume_id][path] = entry
+
+    # Apply all changes in one go
+    cursor = get_db()
+    ws = WebSocket()
+    total_count = len(volumes)
+    with cursor:
+        for idx, (volume_id, (volume, volume_data)) in enumerate(
+            volumes.items()
+        ):
+            bindings, general_bindings = _match_volume_files(
+                volume, volume_data, manifests[volume_id], []
+            )
+            _apply_volume_bindings(
+                volume_id, bindings, general_bindings,
+                [], update_websocket
+            )
+            ScanManifestDB.update(
+                volume_id,
+                old_manifests.get(volume_id, {}),
+                manifests[volume_id]
+            )
+
+            if update_websocket:
+                ws.update_task_status(
+                    message=f'Scanned files for volume {idx+1}/{total_count}'
+                )
+
+        FilesDB.delete_unmatched_files()
+
+    for volume, volume_data in volumes.values():
+        _clean_volume_folder(volume_data)
+
+    return
+
+
+def _delete_removed_issues(volume_issues: Mapping[int, Set[int]]) -> None:
+    """Delete the issues of volumes that aren't on CV anymore, together with
+    the files linked to them. The volume ID's and CV ID's are staged in
+    temporary tables so that all issues are deleted at once. Doesn't commit.
+
+    Args:
+        volume_issues (Mapping[int, Set[int]]): Map of volume ID's to the CV
+        ID's of all their issues on CV.
+    """
+    if not volume_issues:
+        return
+
+    cursor = get_db()
+    cursor.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS fetched_issues(
+            volume_id INTEGER NOT NULL,
+            comicvine_id INTEGER NOT NULL,
+
+            PRIMARY KEY (volume_id, comicvine_id)
+        ) WITHOUT ROWID;
+    """)
+    # Volumes without any issues on CV have no fetched issues,
+    # so the volumes are staged separately
+    cursor.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS refreshed_volumes(
+            volume_id INTEGER PRIMARY KEY
+        );
+    """)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO refreshed_volumes(volume_id) VALUES (?);",
+        ((volume_id,) for volume_id in volume_issues)
+    )
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO fetched_issues(volume_id, comicvine_id)
+        VALUES (?, ?);
+        """,
+        (
+            (volume_id, issue_cv_id)
+            for volume_id, issue_cv_ids in volume_issues.items()
+            for issue_cv_id in issue_cv_ids
+        )
+    )
+
+    removed_issues = """
+        SELECT id
+        FROM issues i
+        WHERE
+            volume_id IN (SELECT volume_id FROM refreshed_volumes)
+            AND (NOT EXISTS (
+                SELECT 1
+                FROM fetched_issues f
+                WHERE
+                    f.volume_id = i.volume_id
+                    AND f.comicvine_id = i.comicvine_id
+            ))
+    """
+    removed_issue_ids: List[int] = first_of_subarrays(
+        cursor.execute(removed_issues)
+    )
+    if removed_issue_ids:
+        # Issue is in database but not in CV, so remove
+        LOGGER.debug(f"Deleting issues with ID's {removed_issue_ids}")
+        cursor.execute(f"""
+            DELETE FROM files
+            WHERE id IN (
+                SELECT DISTINCT file_id
+                FROM issues_files
+                WHERE issue_id IN ({removed_issues})
+            );
+        """)
+        cursor.execute(f"""
+            DELETE FROM issues
+            WHERE id IN ({removed_issues});
+        """)
+
+    cursor.execute("DELETE FROM fetched_issues;")
+    cursor.execute("DELETE FROM refreshed_volumes;")
+    return
+
+
+async def _fetch_refresh_batches(
+    cv: ComicVine,
+    cv_ids: Sequence[int],
+    known_cover_links: Mapping[int, str]
+) -> AsyncIterator[Tuple[List[VolumeMetadata], List[IssueMetadata]]]:
+    """Fetch the metadata of volumes and their issues from CV in batches, so
+    that each batch can be written before the next one is fetched.
+
+    Args:
+        cv (ComicVine): The CV instance to fetch with.
+        cv_ids (Sequence[int]): The CV ID's of the volumes.
+        known_cover_links (Mapping[int, str]): Map of CV ID's to the link of
+        the cover that is already stored for the volume.
+
+    Yields:
+        AsyncIterator[Tuple[List[VolumeMetadata], List[IssueMetadata]]]: The
+        metadata of a batch of volumes and of their issues.
+    """
+    for id_batch in batched(cv_ids, Constants.CV_REFRESH_BATCH_SIZE):
+        volume_datas = await cv.fetch_volumes(id_batch, known_cover_links)
+        issue_datas = await cv.fetch_issues(
+            tuple(vd["comicvine_id"] for vd in volume_datas)
+        )
+        yield volume_datas, issue_datas
+    return
+
+
+def _write_refresh_batch(
+    cv_to_id_fetch: Mapping[int, Tuple[int, int]],
+    old_cover_hashes: Mapping[int, str],
+    volume_datas: List[VolumeMetadata],
+    issue_datas: List[IssueMetadata],
+    fetch_time: Union[float, None]
+) -> None:
+    """Write the refreshed metadata of a batch of volumes and their issues to
+    the database and commit it.
+
+    Args:
+        cv_to_id_fetch (Mapping[int, Tuple[int, int]]): Map of CV ID's to the
+        ID and last CV fetch time of the volumes.
+
+        old_cover_hashes (Mapping[int, str]): Map of volume ID's to the hash of
+        their currently stored cover.
+
+        volume_datas (List[VolumeMetadata]): The metadata of the volumes.
+
+        issue_datas (List[IssueMetadata]): The metadata of the issues of the
+        volumes.
+
+        fetch_time (Union[float, None]): The time to store as the last CV fetch
+        of the volumes. `None` to keep the current value, e.g. when not all
+        data could be fetched.
+    """
+    cursor = get_db()
+
+    # The files of the covers are written outside of the transaction,
+    # so that they can be removed again when it's rolled back
+    cover_hashes: Dict[int, str] = {
+        vd["comicvine_id"]: store_cover(vd["cover"])
+        for vd in volume_datas
+        if vd["cover"]
+    }
+
+    try:
+        with cursor:
+            cursor.executemany(
+                """
+                UPDATE volumes
+                SET
+                    title = :title,
+                    alt_title = :alt_title,
+                    year = :year,
+                    publisher = :publisher,
+                    volume_number = :volume_number,
+                    description = :description,
+                    site_url = :site_url,
+                    last_cv_fetch = :last_cv_fetch
+                WHERE id = :id;
+                """,
+                (
+                    {
+                        "title": vd["title"],
+                        "alt_title": (vd["aliases"] or [None])[0],
+                        "year": vd["year"],
+                        "publisher": vd["publisher"],
+                        "volume_number": vd["volume_number"],
+                        "description": vd["description"],
+                        "site_url": vd["site_url"],
+                        "last_cv_fetch": (
+                            fetch_time
+                            if fetch_time is not None else
+                            cv_to_id_fetch[vd["comicvine_id"]][1]
+                        ),
+
+                        "id": cv_to_id_fetch[vd["comicvine_id"]][0]
+                    }
+                    for vd in volume_datas
+                )
+            )
+
+            VolumeSearchDB.update(
+                _get_search_entry(
+                    cv_to_id_fetch[vd["comicvine_id"]][0],
+                    vd["title"],
+                    (vd["aliases"] or [None])[0],
+                    vd["publisher"]
+                )
+                for vd in volume_datas
+            )
+
+            # Only changed covers have been fetched
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO volume_covers(volume_id, cover_hash, cover_link)
+                VALUES (:volume_id, :cover_hash, :cover_link);
+                """,
+                ({
+                    "volume_id": cv_to_id_fetch[vd["comicvine_id"]][0],
+                    "cover_hash": cover_hashes[vd["comicvine_id"]],
+                    "cover_link": vd["cover_link"]
+                }
+                    for vd in volume_datas
+                    if vd["comicvine_id"] in cover_hashes
+                ))
+
+            # Update issues
+            monitor_issues_volume_ids: Set[int] = set(first_of_subarrays(cursor.execute(
+                "SELECT id FROM volumes WHERE monitor_new_issues = 1;"
+            )))
+            cursor.executemany(
+                """
+                INSERT INTO issues(
+                    volume_id,
+                    comicvine_id,
+                    issue_number,
+                    calculated_issue_number,
+                    title,
+                    date,
+                    description,
+                    monitored
+                ) VALUES (
+                    :volume_id, :comicvine_id, :issue_number, :calculated_issue_number,
+                    :title, :date, :description, :monitored
+                )
+                ON CONFLICT(comicvine_id) DO
+                UPDATE
+                SET
+                    issue_number = :issue_number,
+                    calculated_issue_number = :calculated_issue_number,
+                    title = :title,
+                    date = :date,
+                    description = :description;
+                """,
+                ({
+                    "volume_id": cv_to_id_fetch[isd["volume_id"]][0],
+                    "comicvine_id": isd["comicvine_id"],
+                    "issue_number": isd["issue_number"],
+                    "calculated_issue_number": isd["calculated_issue_number"] or 0.0,
+                    "title": isd["title"],
+                    "date": isd["date"],
+                    "description": isd["description"],
+                    "monitored": cv_to_id_fetch[isd["volume_id"]][0] in monitor_issues_volume_ids
+                }
+                    for isd in issue_datas
+                ))
+
+            # Delete issues from DB that aren't found in CV response
+            volume_issues_fetched: Dict[int, Set[int]] = {}
+            for isd in issue_datas:
+                (volume_issues_fetched
+                    .setdefault(isd["volume_id"], set())
+                    .add(isd["comicvine_id"]))
+
+            # Only volumes of which all issues have been fetched (not guaranteed
+            # because of CV API rate limit).
+            _delete_removed_issues({
+                cv_to_id_fetch[vd["comicvine_id"]][0]:
+                    volume_issues_fetched.get(vd["comicvine_id"], set())
+                for vd in volume_datas
+                if len(volume_issues_fetched.get(
+                    vd["comicvine_id"]
+                ) or tuple()) == vd["issue_count"]
+            })
+
+            # Refresh Special Version
+            special_versions = determine_special_versions(tuple(
+                cv_to_id_fetch[vd["comicvine_id"]][0]
+                for vd in volume_datas
+            ))
+            cursor.executemany("""
+                UPDATE volumes
+                SET special_version = :special_version
+                WHERE id = :id AND special_version_locked = 0;
+                """,
+                tuple(
+                    {
+                        "special_version": special_version,
+                        "id": volume_id
+                    }
+                    for volume_id, special_version in special_versions.items()
+                )
             )
 
+    except BaseException:
+        delete_unused_covers(cover_hashes.values())
+        raise
+
+    # Replaced covers are only removed once the new ones are committed
+    delete_unused_covers(
+        old_cover_hashes[cv_to_id_fetch[cv_id][0]]
+        for cv_id in cover_hashes
+        if cv_to_id_fetch[cv_id][0] in old_cover_hashes
+    )
     return
 
 
 def refresh_and_scan(
     volume_id: Union[int, None] = None,
     update_websocket: bool = False,
-    allow_skipping: bool = True
+    allow_skipping: bool = True,
+    force_full_scan: bool = False
 ) -> None:
-    """Refresh and scan one or more volumes.
+    """Refresh and scan one or more volumes. The volumes are fetched and
+    written in batches. When refreshing all volumes, an interrupted refresh is
+    resumed by skipping the volumes that it already refreshed.
 
     Args:
         volume_id (Union[int, None], optional): The id of the volume if it is
@@ -1522,15 +2602,38 @@ def refresh_and_scan(
         the websocket.
             Defaults to False.
 
-        allow_skipping (bool, optional): Skip volumes that have been updated in
-        the last 24 hours or that still have the same amount of issues.
+        allow_skipping (bool, optional): When refreshing all volumes, only
+        refresh the volumes that have changed on CV since the last complete
+        sync. If there hasn't been one yet, all volumes are refreshed.
             Defaults to True.
+
+        force_full_scan (bool, optional): Ignore the scan manifest and process
+        all files of the volumes again.
+            Defaults to False.
     """
     cursor = get_db()
 
     current_time = datetime.now()
-    one_day_ago = current_time - ONE_DAY
-    thirty_days_ago = current_time - THIRTY_DAYS
+    sync_start = int(current_time.timestamp())
+    sync_watermark = None
+    checkpoint = None
+    if not volume_id:
+        checkpoint = ComicVineSyncDB.fetch_checkpoint()
+        if checkpoint is not None:
+            LOGGER.info('Resuming the interrupted refresh of the library')
+            sync_start = checkpoint
+        else:
+            ComicVineSyncDB.update_checkpoint(sync_start)
+            commit()
+
+        if allow_skipping:
+            sync_watermark = ComicVineSyncDB.fetch_watermark()
+
+    # A refresh of a specific volume is requested by the user,
+    # so make sure to get the latest data for it. For a delta sync,
+    # the volumes to fetch are known to have changed.
+    cv = ComicVine(use_cache=volume_id is None and sync_watermark is None)
+
     if volume_id:
         cursor.execute("""
             SELECT comicvine_id, id, last_cv_fetch
@@ -1541,230 +2644,136 @@ def refresh_and_scan(
             (volume_id,)
         )
 
-    elif not allow_skipping:
-        cursor.execute("""
-            SELECT comicvine_id, id, last_cv_fetch
-            FROM volumes
-            ORDER BY last_cv_fetch ASC;
-            """
-        )
-
     else:
         cursor.execute("""
             SELECT comicvine_id, id, last_cv_fetch
             FROM volumes
-            WHERE last_cv_fetch <= ?
             ORDER BY last_cv_fetch ASC;
-            """,
-            (one_day_ago.timestamp(),)
+            """
         )
 
     cv_to_id_fetch: Dict[int, Tuple[int, int]] = {
         e["comicvine_id"]: (e["id"], e["last_cv_fetch"])
         for e in cursor
     }
-    if not cv_to_id_fetch:
-        return
-
-    # Update volumes
-    cv = ComicVine()
-    volume_datas = filtered_volume_datas = run(
-        cv.fetch_volumes(tuple(cv_to_id_fetch.keys()))
-    )
 
-    if not volume_id and allow_skipping:
-        cv_id_to_issue_count: Dict[int, int] = dict(cursor.execute("""
-            SELECT v.comicvine_id, COUNT(i.id)
-            FROM volumes v
-            LEFT JOIN issues i
-            ON v.id = i.volume_id
-            WHERE v.last_cv_fetch <= ?
-            GROUP BY i.volume_id;
-            """,
-            (one_day_ago.timestamp(),)
-        ))
+    # Files are scanned for all volumes, not just the ones that are refreshed
+    scan_volume_ids = [id_fetch[0] for id_fetch in cv_to_id_fetch.values()]
+    refresh_possible = True
+
+    if sync_watermark is not None and cv_to_id_fetch:
+        # Delta sync: only refresh the volumes that changed on CV
+        try:
+            changed_cv_ids = run(cv.fetch_changed_volumes(
+                tuple(cv_to_id_fetch.keys()),
+                datetime.fromtimestamp(
+                    sync_watermark - Constants.CV_SYNC_OVERLAP
+                )
+            ))
 
-        filtered_volume_datas = [
-            v
-            for v in volume_datas
-            if cv_id_to_issue_count[v["comicvine_id"]] != v["issue_count"]
-            or cv_to_id_fetch[v["comicvine_id"]][1] <= thirty_days_ago.timestamp()
-        ]
+        except CVRateLimitReached:
+            LOGGER.warning(
+                "Couldn't check for changes on CV because the rate limit "
+                "is reached. Only scanning for files."
+            )
+            changed_cv_ids = set()
+            refresh_possible = False
 
-    cursor.executemany(
-        """
-        UPDATE volumes
-        SET
-            title = :title,
-            alt_title = :alt_title,
-            year = :year,
-            publisher = :publisher,
-            volume_number = :volume_number,
-            description = :description,
-            site_url = :site_url,
-            last_cv_fetch = :last_cv_fetch
-        WHERE id = :id;
-        """,
-        (
-            {
-                "title": vd["title"],
-                "alt_title": (vd["aliases"] or [None])[0],
-                "year": vd["year"],
-                "publisher": vd["publisher"],
-                "volume_number": vd["volume_number"],
-                "description": vd["description"],
-                "site_url": vd["site_url"],
-                "last_cv_fetch": current_time.timestamp(),
-
-                "id": cv_to_id_fetch[vd["comicvine_id"]][0]
-            }
-            for vd in volume_datas
-        )
-    )
+        else:
+            LOGGER.info(
+                f'{len(changed_cv_ids)} volumes have changed on CV since the '
+                'last sync'
+            )
 
-    cursor.executemany(
-        """
-        UPDATE volumes_covers
-        SET
-            cover = :cover
-        WHERE volume_id = :volume_id;
-        """,
-        ({
-            "volume_id": cv_to_id_fetch[vd["comicvine_id"]][0],
-            "cover": vd["cover"]
+        cv_to_id_fetch = {
+            cv_id: id_fetch
+            for cv_id, id_fetch in cv_to_id_fetch.items()
+            if cv_id in changed_cv_ids
         }
-            for vd in volume_datas
-        ))
-
-    commit()
 
-    # Update issues
-    issue_datas = run(cv.fetch_issues(
-        tuple(vd["comicvine_id"] for vd in filtered_volume_datas)
-    ))
-    monitor_issues_volume_ids: Set[int] = set(first_of_subarrays(cursor.execute(
-        "SELECT id FROM volumes WHERE monitor_new_issues = 1;"
-    )))
-    cursor.executemany(
-        """
-        INSERT INTO issues(
-            volume_id,
-            comicvine_id,
-            issue_number,
-            calculated_issue_number,
-            title,
-            date,
-            description,
-            monitored
-        ) VALUES (
-            :volume_id, :comicvine_id, :issue_number, :calculated_issue_number,
-            :title, :date, :description, :monitored
-        )
-        ON CONFLICT(comicvine_id) DO
-        UPDATE
-        SET
-            issue_number = :issue_number,
-            calculated_issue_number = :calculated_issue_number,
-            title = :title,
-            date = :date,
-            description = :description;
-        """,
-        ({
-            "volume_id": cv_to_id_fetch[isd["volume_id"]][0],
-            "comicvine_id": isd["comicvine_id"],
-            "issue_number": isd["issue_number"],
-            "calculated_issue_number": isd["calculated_issue_number"] or 0.0,
-            "title": isd["title"],
-            "date": isd["date"],
-            "description": isd["description"],
-            "monitored": cv_to_id_fetch[isd["volume_id"]][0] in monitor_issues_volume_ids
+    if checkpoint is not None:
+        # Volumes refreshed before the interruption don't need it again
+        cv_to_id_fetch = {
+            cv_id: id_fetch
+            for cv_id, id_fetch in cv_to_id_fetch.items()
+            if id_fetch[1] < sync_start
         }
-            for isd in issue_datas
-        ))
 
-    commit()
+    # Covers with an unchanged link don't need to be fetched again
+    id_to_cv: Dict[int, int] = {
+        id_fetch[0]: cv_id
+        for cv_id, id_fetch in cv_to_id_fetch.items()
+    }
+    old_cover_hashes: Dict[int, str] = {}
+    known_cover_links: Dict[int, str] = {}
+    for e in cursor.execute(
+        "SELECT volume_id, cover_hash, cover_link FROM volume_covers;"
+    ).fetchalldict():
+        old_cover_hashes[e["volume_id"]] = e["cover_hash"]
+        if (
+            e["volume_id"] in id_to_cv
+            and e["cover_link"]
+            and exists(get_cover_path(e["cover_hash"]))
+        ):
+            known_cover_links[id_to_cv[e["volume_id"]]] = e["cover_link"]
 
-    # Delete issues from DB that aren't found in CV response
-    volume_issues_fetched: Dict[int, Set[int]] = {}
-    for isd in issue_datas:
-        (volume_issues_fetched
-            .setdefault(isd["volume_id"], set())
-            .add(isd["comicvine_id"]))
-
-    for vd in filtered_volume_datas:
-        if len(volume_issues_fetched.get(
-            vd["comicvine_id"]
-        ) or tuple()) != vd["issue_count"]:
-            continue
+    async def refresh_volumes() -> None:
+        refreshed_count = 0
+        async for volume_datas, issue_datas in _fetch_refresh_batches(
+            cv, tuple(cv_to_id_fetch.keys()), known_cover_links
+        ):
+            # Only mark the volumes as refreshed when all data was fetched,
+            # so that they aren't skipped when resuming
+            batch_complete = not cv.requests_failed
+            _write_refresh_batch(
+                cv_to_id_fetch,
+                old_cover_hashes,
+                volume_datas,
+                issue_datas,
+                current_time.timestamp() if batch_complete else None
+            )
 
-        # All issues of the volume have been fetched (not guaranteed because of
-        # CV API rate limit).
-        issue_cv_to_id = dict(cursor.execute("""
-            SELECT i.comicvine_id, i.id
-            FROM issues i
-            INNER JOIN volumes v
-            ON i.volume_id = v.id
-            WHERE v.comicvine_id = ?;
-            """,
-            (vd["comicvine_id"],)
-        ).fetchall())
-        for issue_cv, issue_id in issue_cv_to_id.items():
-            if issue_cv not in volume_issues_fetched[vd["comicvine_id"]]:
-                # Issue is in database but not in CV, so remove
-                LOGGER.debug(
-                    f"Deleting issue with ID {issue_id} and CV ID {issue_cv}"
+            refreshed_count += len(volume_datas)
+            if update_websocket:
+                WebSocket().update_task_status(
+                    message=f'Updated info for volume '
+                        f'{refreshed_count}/{len(cv_to_id_fetch)}'
                 )
-                Issue(issue_id).delete()
-                commit()
-
-    # Refresh Special Version
-    cursor.executemany("""
-        UPDATE volumes
-        SET special_version = :special_version
-        WHERE id = :id AND special_version_locked = 0;
-        """,
-        tuple(
-            {
-                "special_version": determine_special_version(
-                    cv_to_id_fetch[vd["comicvine_id"]][0]
-                ),
-                "id": cv_to_id_fetch[vd["comicvine_id"]][0]
-            }
-            for vd in volume_datas
-        )
-    )
-    commit()
 
-    # Scan for files
-    if volume_id:
-        scan_files(volume_id, update_websocket=update_websocket)
+            if not batch_complete:
+                LOGGER.warning(
+                    "Stopped refreshing because not all data could be fetched "
+                    "from CV. The refresh will be resumed the next time."
+                )
+                break
+        return
 
-    else:
-        v_ids = [
-            (v[0], [], False, update_websocket)
-            for v in cv_to_id_fetch.values()
-        ]
-        total_count = len(v_ids)
+    run(refresh_volumes())
 
-        if not total_count:
-            return
+    if not volume_id and refresh_possible and not cv.requests_failed:
+        # Everything that changed on CV up to the start of this sync is in
+        # the database now, so the next sync can start from here
+        ComicVineSyncDB.update_watermark(sync_start)
+        ComicVineSyncDB.update_checkpoint(None)
+        commit()
 
-        with PortablePool(max_processes=min(
-            Constants.DB_MAX_CONCURRENT_CONNECTIONS,
-            total_count
-        )) as pool:
-            if update_websocket:
-                ws = WebSocket()
-                for idx, _ in enumerate(
-                    pool.istarmap_unordered(scan_files, v_ids)
-                ):
-                    ws.update_task_status(
-                        message=f'Scanned files for volume {idx+1}/{total_count}')
+    if not scan_volume_ids:
+        return
 
-            else:
-                pool.starmap(scan_files, v_ids)
+    # Scan for files
+    if volume_id:
+        scan_files(
+            volume_id,
+            update_websocket=update_websocket,
+            force_full_scan=force_full_scan
+        )
 
-        FilesDB.delete_unmatched_files()
+    else:
+        scan_library(
+            scan_volume_ids,
+            update_websocket=update_websocket,
+            force_full_scan=force_full_scan
+        )
 
     return
 
@@ -6,9 +6,11 @@ Setting up the database and handling connections
 
 from __future__ import annotations
 
+from functools import lru_cache
 from os.path import dirname, exists, isdir, join
-from sqlite3 import (PARSE_DECLTYPES, Connection, Cursor, ProgrammingError,
-                     Row, register_adapter, register_converter)
+from sqlite3 import (PARSE_DECLTYPES, Connection, Cursor, OperationalError,
+                     ProgrammingError, Row, connect, register_adapter,
+                     register_converter)
 from threading import current_thread
 from time import time
 from typing import Any, Dict, Generator, Iterable, List, Union
@@ -275,6 +277,28 @@ def setup_db_adapters_and_converters() -> None:
     return
 
 
+@lru_cache(1)
+def search_index_supported() -> bool:
+    """Check whether the SQLite library supports the FTS5 extension with the
+    trigram tokenizer (SQLite 3.34+), which the volume search index needs.
+
+    Returns:
+        bool: Whether the search index can be used.
+    """
+    probe = connect(":memory:")
+    try:
+        probe.execute(
+            "CREATE VIRTUAL TABLE probe USING fts5(a, tokenize = 'trigram');"
+        )
+        return True
+
+    except OperationalError:
+        return False
+
+    finally:
+        probe.close()
+
+
 def setup_db() -> None:
     """
     Setup the database tables and default config when they aren't setup yet
@@ -316,14 +340,16 @@ def setup_db() -> None:
 
             FOREIGN KEY (root_folder) REFERENCES root_folders(id)
         );
-        CREATE TABLE IF NOT EXISTS volumes_covers(
-            volume_id INTEGER UNIQUE NOT NULL,
-            cover BLOB,
+        CREATE TABLE IF NOT EXISTS volume_covers(
+            volume_id INTEGER PRIMARY KEY,
+            cover_hash VARCHAR(64) NOT NULL,
+            cover_link TEXT,
+
             FOREIGN KEY (volume_id) REFERENCES volumes(id)
                 ON DELETE CASCADE
         );
-        CREATE INDEX IF NOT EXISTS volumes_covers_volume_id_index
-            ON volumes_covers(volume_id);
+        CREATE INDEX IF NOT EXISTS volume_covers_cover_hash_index
+            ON volume_covers(cover_hash);
         CREATE TABLE IF NOT EXISTS issues(
             id INTEGER PRIMARY KEY,
             volume_id INTEGER NOT NULL,
@@ -371,6 +397,35 @@ def setup_db() -> None:
             FOREIGN KEY (file_id) REFERENCES files(id)
                 ON DELETE CASCADE
         );
+        CREATE TABLE IF NOT EXISTS volume_stats(
+            volume_id INTEGER PRIMARY KEY,
+            issue_count INTEGER NOT NULL DEFAULT 0,
+            issue_count_monitored INTEGER NOT NULL DEFAULT 0,
+            issues_downloaded INTEGER NOT NULL DEFAULT 0,
+            issues_downloaded_monitored INTEGER NOT NULL DEFAULT 0,
+            total_size INTEGER NOT NULL DEFAULT 0,
+
+            FOREIGN KEY (volume_id) REFERENCES volumes(id)
+                ON DELETE CASCADE
+        );
+        CREATE TABLE IF NOT EXISTS scan_manifest(
+            volume_id INTEGER NOT NULL,
+            filepath TEXT NOT NULL,
+            is_dir BOOL NOT NULL DEFAULT 0,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            volume_hash VARCHAR(40),
+            file_type VARCHAR(15),
+            issue_ids TEXT,
+
+            FOREIGN KEY (volume_id) REFERENCES volumes(id)
+                ON DELETE CASCADE,
+            CONSTRAINT PK_scan_manifest PRIMARY KEY (
+                volume_id,
+                filepath
+            )
+        );
         CREATE TABLE IF NOT EXISTS external_download_clients(
             id INTEGER PRIMARY KEY,
             download_type INTEGER NOT NULL,
@@ -449,6 +504,23 @@ def setup_db() -> None:
             FOREIGN KEY (issue_id) REFERENCES issues(id)
                 ON DELETE SET NULL
         );
+        CREATE TABLE IF NOT EXISTS download_progress(
+            download_id INTEGER PRIMARY KEY,
+            size INTEGER NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            written TEXT NOT NULL,
+            mac_state VARCHAR(32),
+
+            FOREIGN KEY (download_id) REFERENCES download_queue(id)
+                ON DELETE CASCADE
+        );
+        CREATE TABLE IF NOT EXISTS purified_links(
+            link TEXT PRIMARY KEY,
+            pure_link TEXT NOT NULL,
+            download_type VARCHAR(15) NOT NULL,
+            purified_at INTEGER NOT NULL
+        );
         CREATE TABLE IF NOT EXISTS credentials(
             id INTEGER PRIMARY KEY,
             source VARCHAR(30) NOT NULL,
@@ -475,8 +547,181 @@ def setup_db() -> None:
 
     set_log_level(settings_values.log_level)
 
+    fill_search_index = False
+    if search_index_supported():
+        # The index is missing when the database was made with an SQLite
+        # library that didn't support it, so it has to be filled afterwards
+        # if the migration that normally does that has already been done.
+        fill_search_index = (
+            settings_values.database_version > 45
+            and not cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'volumes_fts';"
+            ).exists()
+        )
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS volumes_fts USING fts5(
+                title,
+                alt_title,
+                publisher,
+                tokenize = 'trigram'
+            );
+        """)
+
+    else:
+        LOGGER.warning(
+            "The SQLite library does not support FTS5 with the trigram "
+            "tokenizer (SQLite 3.34+ is needed). Falling back to a slower "
+            "library search."
+        )
+
     migrate_db()
 
+    if fill_search_index:
+        from backend.implementations.volumes import rebuild_search_index
+        rebuild_search_index()
+
+    # Migrations might recreate tables, which drops the triggers on them,
+    # so only add the triggers after migrating.
+    trigger_commands = """
+        CREATE TRIGGER IF NOT EXISTS volume_stats_volume_insert
+        AFTER INSERT ON volumes
+        BEGIN
+            INSERT OR IGNORE INTO volume_stats(volume_id) VALUES (NEW.id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_issue_insert
+        AFTER INSERT ON issues
+        BEGIN
+            UPDATE volume_stats
+            SET
+                issue_count = issue_count + 1,
+                issue_count_monitored = issue_count_monitored + NEW.monitored
+            WHERE volume_id = NEW.volume_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_issue_delete
+        AFTER DELETE ON issues
+        BEGIN
+            UPDATE volume_stats
+            SET
+                issue_count = issue_count - 1,
+                issue_count_monitored = issue_count_monitored - OLD.monitored
+            WHERE volume_id = OLD.volume_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_issue_monitored
+        AFTER UPDATE OF monitored ON issues
+        WHEN OLD.monitored != NEW.monitored
+        BEGIN
+            UPDATE volume_stats
+            SET
+                issue_count_monitored =
+                    issue_count_monitored + NEW.monitored - OLD.monitored,
+                issues_downloaded_monitored =
+                    issues_downloaded_monitored
+                    + (NEW.monitored - OLD.monitored) * EXISTS(
+                        SELECT 1 FROM issues_files WHERE issue_id = NEW.id
+                    )
+            WHERE volume_id = NEW.volume_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_issue_file_insert
+        AFTER INSERT ON issues_files
+        BEGIN
+            UPDATE volume_stats
+            SET
+                issues_downloaded = issues_downloaded + (NOT EXISTS(
+                    SELECT 1
+                    FROM issues_files
+                    WHERE issue_id = NEW.issue_id
+                        AND file_id != NEW.file_id
+                )),
+                issues_downloaded_monitored =
+                    issues_downloaded_monitored + (NOT EXISTS(
+                        SELECT 1
+                        FROM issues_files
+                        WHERE issue_id = NEW.issue_id
+                            AND file_id != NEW.file_id
+                    )) * (SELECT monitored FROM issues WHERE id = NEW.issue_id),
+                total_size = total_size + IFNULL((
+                    SELECT size FROM files WHERE id = NEW.file_id
+                ), 0) * (NOT EXISTS(
+                    SELECT 1
+                    FROM issues_files if
+                    INNER JOIN issues i
+                    ON if.issue_id = i.id
+                    WHERE if.file_id = NEW.file_id
+                        AND if.issue_id != NEW.issue_id
+                        AND i.volume_id = volume_stats.volume_id
+                ))
+            WHERE volume_id = (
+                SELECT volume_id FROM issues WHERE id = NEW.issue_id
+            );
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_issue_file_delete
+        AFTER DELETE ON issues_files
+        BEGIN
+            UPDATE volume_stats
+            SET
+                issues_downloaded = issues_downloaded - (NOT EXISTS(
+                    SELECT 1 FROM issues_files WHERE issue_id = OLD.issue_id
+                )),
+                issues_downloaded_monitored =
+                    issues_downloaded_monitored - (NOT EXISTS(
+                        SELECT 1
+                        FROM issues_files
+                        WHERE issue_id = OLD.issue_id
+                    )) * (SELECT monitored FROM issues WHERE id = OLD.issue_id),
+                total_size = total_size - IFNULL((
+                    SELECT size FROM files WHERE id = OLD.file_id
+                ), 0) * (NOT EXISTS(
+                    SELECT 1
+                    FROM issues_files if
+                    INNER JOIN issues i
+                    ON if.issue_id = i.id
+                    WHERE if.file_id = OLD.file_id
+                        AND i.volume_id = volume_stats.volume_id
+                ))
+            WHERE volume_id = (
+                SELECT volume_id FROM issues WHERE id = OLD.issue_id
+            );
+        END;
+
+        -- The issues_files rows are removed by ON DELETE CASCADE after the
+        -- file is gone, so the size has to be subtracted beforehand.
+        CREATE TRIGGER IF NOT EXISTS volume_stats_file_delete
+        BEFORE DELETE ON files
+        BEGIN
+            UPDATE volume_stats
+            SET total_size = total_size - IFNULL(OLD.size, 0)
+            WHERE volume_id IN (
+                SELECT i.volume_id
+                FROM issues_files if
+                INNER JOIN issues i
+                ON if.issue_id = i.id
+                WHERE if.file_id = OLD.id
+            );
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS volume_stats_file_size
+        AFTER UPDATE OF size ON files
+        WHEN IFNULL(OLD.size, 0) != IFNULL(NEW.size, 0)
+        BEGIN
+            UPDATE volume_stats
+            SET total_size =
+                total_size + IFNULL(NEW.size, 0) - IFNULL(OLD.size, 0)
+            WHERE volume_id IN (
+                SELECT i.volume_id
+                FROM issues_files if
+                INNER JOIN issues i
+                ON if.issue_id = i.id
+                WHERE if.file_id = NEW.id
+            );
+        END;
+    """
+    cursor.executescript(trigger_commands)
+
     # DB Migration might change settings, so update cache just to be sure.
     settings._fetch_settings()
 
@@ -1246,6 +1246,15 @@ class MigrateSeperateCoversTable(DBMigrator):
             PRAGMA foreign_keys = OFF;
             BEGIN TRANSACTION;
 
+            CREATE TABLE IF NOT EXISTS volumes_covers(
+                volume_id INTEGER UNIQUE NOT NULL,
+                cover BLOB,
+                FOREIGN KEY (volume_id) REFERENCES volumes(id)
+                    ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS volumes_covers_volume_id_index
+                ON volumes_covers(volume_id);
+
             INSERT OR IGNORE INTO volumes_covers(volume_id, cover)
                 SELECT id, cover
                 FROM volumes;
@@ -1315,3 +1324,122 @@ class MigrateRemoveUnsupportedSourceBlocklistEntries(DBMigrator):
             (2,) # Source not supported
         )
         return
+
+
+class MigrateFillVolumeStats(DBMigrator):
+    start_version = 44
+
+    def run(self) -> None:
+        # V44 -> V45
+
+        get_db().executescript("""
+            DELETE FROM volume_stats;
+
+            INSERT INTO volume_stats(
+                volume_id,
+                issue_count, issue_count_monitored,
+                issues_downloaded, issues_downloaded_monitored,
+                total_size
+            )
+            SELECT
+                v.id,
+                (
+                    SELECT COUNT(*)
+                    FROM issues
+                    WHERE volume_id = v.id
+                ),
+                (
+                    SELECT COUNT(*)
+                    FROM issues
+                    WHERE volume_id = v.id
+                        AND monitored = 1
+                ),
+                (
+                    SELECT COUNT(DISTINCT issue_id)
+                    FROM issues i
+                    INNER JOIN issues_files if
+                    ON i.id = if.issue_id
+                    WHERE volume_id = v.id
+                ),
+                (
+                    SELECT COUNT(DISTINCT issue_id)
+                    FROM issues i
+                    INNER JOIN issues_files if
+                    ON i.id = if.issue_id
+                    WHERE volume_id = v.id
+                        AND monitored = 1
+                ),
+                (
+                    SELECT IFNULL(SUM(size), 0) FROM (
+                        SELECT DISTINCT f.id, size
+                        FROM issues i
+                        INNER JOIN issues_files if
+                        INNER JOIN files f
+                        ON i.id = if.issue_id
+                            AND if.file_id = f.id
+                        WHERE volume_id = v.id
+                    )
+                )
+            FROM volumes v;
+        """)
+        return
+
+
+class MigrateFillVolumeSearchIndex(DBMigrator):
+    start_version = 45
+
+    def run(self) -> None:
+        # V45 -> V46
+        from backend.implementations.volumes import rebuild_search_index
+
+        rebuild_search_index()
+        return
+
+
+class MigrateCoversToDisk(DBMigrator):
+    start_version = 46
+
+    def run(self) -> None:
+        # V46 -> V47
+        from backend.implementations.covers import store_cover
+
+        cursor = get_db()
+        iter_cursor = get_db(force_new=True)
+        iter_cursor.execute("""
+            SELECT volume_id, cover
+            FROM volumes_covers
+            WHERE cover IS NOT NULL;
+        """)
+        for volume_id, cover in iter_cursor:
+            cursor.execute(
+                "INSERT INTO volume_covers(volume_id, cover_hash) VALUES (?, ?);",
+                (volume_id, store_cover(cover))
+            )
+
+        cursor.executescript("DROP TABLE volumes_covers;")
+        return
+
+
+class MigrateAddCoverLink(DBMigrator):
+    start_version = 47
+
+    def run(self) -> None:
+        # V47 -> V48
+
+        cursor = get_db()
+        columns = [
+            c["name"]
+            for c in cursor.execute(
+                "PRAGMA table_info(volume_covers);"
+            ).fetchalldict()
+        ]
+        if "cover_link" in columns:
+            # Table was created by setup_db with the column already present
+            return
+
+        cursor.execute("""
+            ALTER TABLE volume_covers ADD COLUMN
+                cover_link TEXT;
+        """)
+
+        return
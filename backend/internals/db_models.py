@@ -5,13 +5,15 @@ Interacting with the database
 """
 
 from os import stat
-from typing import Iterable, List, Union
+from time import time
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple, Union
 
 from backend.base.custom_exceptions import FileNotFound
-from backend.base.definitions import FileData, GeneralFileData
-from backend.base.helpers import first_of_subarrays
+from backend.base.definitions import (DownloadProgressData, FileData,
+                                      GeneralFileData, ScanManifestData)
+from backend.base.helpers import CommaList, batched, first_of_subarrays
 from backend.base.logging import LOGGER
-from backend.internals.db import get_db
+from backend.internals.db import get_db, search_index_supported
 
 
 class FilesDB:
@@ -155,6 +157,16 @@ class FilesDB:
 
         return FilesDB.fetch(filepath=filepath)[0]["id"]
 
+    @staticmethod
+    def update_sizes(
+        filepath_sizes: Iterable[Tuple[str, int]]
+    ) -> None:
+        get_db().executemany(
+            "UPDATE files SET size = ? WHERE filepath = ?;",
+            ((size, filepath) for filepath, size in filepath_sizes)
+        )
+        return
+
     @staticmethod
     def update_filepaths(
         old_filepaths: Iterable[str],
@@ -277,3 +289,284 @@ class GeneralFilesDB:
             (volume_id,)
         )
         return
+
+
+class ScanManifestDB:
+    @staticmethod
+    def fetch(volume_id: int) -> Dict[str, ScanManifestData]:
+        cursor = get_db()
+        cursor.execute("""
+            SELECT
+                filepath, is_dir, size, mtime_ns, inode,
+                volume_hash, file_type, issue_ids
+            FROM scan_manifest
+            WHERE volume_id = ?;
+            """,
+            (volume_id,)
+        )
+        return {
+            e["filepath"]: e
+            for e in cursor.fetchalldict()
+        } # type: ignore
+
+    @staticmethod
+    def fetch_multiple(
+        volume_ids: Sequence[int]
+    ) -> Dict[int, Dict[str, ScanManifestData]]:
+        result: Dict[int, Dict[str, ScanManifestData]] = {}
+        for volume_ids_batch in batched(volume_ids, 900):
+            cursor = get_db().execute(f"""
+                SELECT
+                    volume_id, filepath, is_dir, size, mtime_ns, inode,
+                    volume_hash, file_type, issue_ids
+                FROM scan_manifest
+                WHERE volume_id IN ({",".join("?" * len(volume_ids_batch))});
+                """,
+                volume_ids_batch
+            )
+            for e in cursor.fetchalldict():
+                manifest = result.setdefault(e.pop("volume_id"), {})
+                manifest[e["filepath"]] = e # type: ignore
+
+        return result
+
+    @staticmethod
+    def update(
+        volume_id: int,
+        old_manifest: Mapping[str, ScanManifestData],
+        new_manifest: Mapping[str, ScanManifestData]
+    ) -> None:
+        cursor = get_db()
+        cursor.executemany(
+            "DELETE FROM scan_manifest WHERE volume_id = ? AND filepath = ?;",
+            (
+                (volume_id, filepath)
+                for filepath in old_manifest
+                if filepath not in new_manifest
+            )
+        )
+        cursor.executemany("""
+            INSERT OR REPLACE INTO scan_manifest(
+                volume_id, filepath, is_dir, size, mtime_ns, inode,
+                volume_hash, file_type, issue_ids
+            ) VALUES (
+                :volume_id, :filepath, :is_dir, :size, :mtime_ns, :inode,
+                :volume_hash, :file_type, :issue_ids
+            );
+            """,
+            (
+                {**entry, "volume_id": volume_id}
+                for filepath, entry in new_manifest.items()
+                if old_manifest.get(filepath) != entry
+            )
+        )
+        return
+
+
+class VolumeSearchDB:
+    @staticmethod
+    def update(
+        entries: Iterable[
+            Tuple[int, str, Union[str, None], Union[str, None]]
+        ]
+    ) -> None:
+        """Add or update volumes in the search index.
+
+        Args:
+            entries (Iterable[Tuple[int, str, Union[str, None], Union[str, None]]]):
+            The volume ID and the normalised title, alternative title and
+            publisher of the volumes.
+        """
+        if not search_index_supported():
+            return
+
+        get_db().executemany("""
+            INSERT OR REPLACE INTO volumes_fts(rowid, title, alt_title, publisher)
+            VALUES (?, ?, ?, ?);
+            """,
+            entries
+        )
+        return
+
+    @staticmethod
+    def clear() -> None:
+        if not search_index_supported():
+            return
+
+        get_db().execute("DELETE FROM volumes_fts;")
+        return
+
+    @staticmethod
+    def delete(volume_id: int) -> None:
+        if not search_index_supported():
+            return
+
+        get_db().execute(
+            "DELETE FROM volumes_fts WHERE rowid = ?;",
+            (volume_id,)
+        )
+        return
+
+
+class ComicVineSyncDB:
+    @staticmethod
+    def fetch_watermark() -> Union[int, None]:
+        """Get the time of the last complete sync with CV.
+
+        Returns:
+            Union[int, None]: The epoch timestamp, or `None` if there hasn't
+            been a complete sync yet.
+        """
+        return get_db().execute(
+            "SELECT value FROM config WHERE key = 'cv_sync_watermark' LIMIT 1;"
+        ).exists()
+
+    @staticmethod
+    def update_watermark(timestamp: int) -> None:
+        get_db().execute(
+            "INSERT OR REPLACE INTO config(key, value) VALUES (?, ?);",
+            ('cv_sync_watermark', timestamp)
+        )
+        return
+
+    @staticmethod
+    def fetch_checkpoint() -> Union[int, None]:
+        """Get the start time of the sync with CV that is in progress or was
+        interrupted.
+
+        Returns:
+            Union[int, None]: The epoch timestamp, or `None` if there is no
+            unfinished sync.
+        """
+        return get_db().execute(
+            "SELECT value FROM config WHERE key = 'cv_sync_checkpoint' LIMIT 1;"
+        ).exists()
+
+    @staticmethod
+    def update_checkpoint(timestamp: Union[int, None]) -> None:
+        """Set the start time of the sync with CV that is in progress.
+
+        Args:
+            timestamp (Union[int, None]): The epoch timestamp, or `None` when
+            the sync has finished.
+        """
+        if timestamp is None:
+            get_db().execute(
+                "DELETE FROM config WHERE key = 'cv_sync_checkpoint';"
+            )
+        else:
+            get_db().execute(
+                "INSERT OR REPLACE INTO config(key, value) VALUES (?, ?);",
+                ('cv_sync_checkpoint', timestamp)
+            )
+        return
+
+
+class PurifiedLinksDB:
+    @staticmethod
+    def fetch(link: str, max_age: int) -> Union[Tuple[str, str], None]:
+        """Get the result of an earlier purification of a link.
+
+        Args:
+            link (str): The link in the GC article.
+            max_age (int): The maximum age of the result in seconds.
+
+        Returns:
+            Union[Tuple[str, str], None]: The pure link and the identifier of
+            the download class, or `None` if the link hasn't been purified
+            (recently).
+        """
+        result = get_db().execute("""
+            SELECT pure_link, download_type
+            FROM purified_links
+            WHERE link = ? AND purified_at >= ?
+            LIMIT 1;
+            """,
+            (link, round(time()) - max_age)
+        ).fetchone()
+        if result is None:
+            return None
+        return result[0], result[1]
+
+    @staticmethod
+    def update(link: str, pure_link: str, download_type: str) -> None:
+        get_db().execute("""
+            INSERT OR REPLACE INTO purified_links(
+                link, pure_link, download_type, purified_at
+            ) VALUES (?, ?, ?, ?);
+            """,
+            (link, pure_link, download_type, round(time()))
+        )
+        return
+
+    @staticmethod
+    def delete(link: str) -> None:
+        get_db().execute(
+            "DELETE FROM purified_links WHERE link = ?;",
+            (link,)
+        )
+        return
+
+    @staticmethod
+    def delete_expired(max_age: int) -> None:
+        get_db().execute(
+            "DELETE FROM purified_links WHERE purified_at < ?;",
+            (round(time()) - max_age,)
+        )
+        return
+
+
+class DownloadProgressDB:
+    @staticmethod
+    def fetch(download_id: int) -> Union[DownloadProgressData, None]:
+        """Get the stored progress of a download.
+
+        Args:
+            download_id (int): The ID of the download.
+
+        Returns:
+            Union[DownloadProgressData, None]: The progress, or `None` if
+            nothing is stored.
+        """
+        result = get_db().execute("""
+            SELECT size, etag, last_modified, written, mac_state
+            FROM download_progress
+            WHERE download_id = ?
+            LIMIT 1;
+            """,
+            (download_id,)
+        ).fetchonedict()
+        if result is None:
+            return None
+
+        result["written"] = [int(w) for w in CommaList(result["written"])]
+        return result # type: ignore
+
+    @staticmethod
+    def update(
+        download_id: int,
+        size: int,
+        etag: Union[str, None],
+        last_modified: Union[str, None],
+        written: Sequence[int],
+        mac_state: Union[str, None] = None
+    ) -> None:
+        get_db().execute("""
+            INSERT OR REPLACE INTO download_progress(
+                download_id, size, etag, last_modified, written, mac_state
+            ) VALUES (?, ?, ?, ?, ?, ?);
+            """,
+            (
+                download_id, size, etag, last_modified,
+                str(CommaList(map(str, written))), mac_state
+            )
+        )
+        return
+
+    @staticmethod
+    def delete(download_id: int) -> None:
+        get_db().execute(
+            "DELETE FROM download_progress WHERE download_id = ?;",
+            (download_id,)
+        )
+        return
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache for responses of external services, stored in an SQLite
+database next to the main database. Expired responses can be revalidated
+with the service using their ETag and Last-Modified headers.
+"""
+
+from __future__ import annotations
+
+from json import dumps, loads
+from os.path import dirname, join
+from sqlite3 import Connection, connect
+from threading import Lock
+from time import time
+from typing import Any, Dict, Union
+from zlib import compress, decompress
+
+from backend.base.logging import LOGGER
+from backend.internals.db import DBConnection
+
+
+class ResponseCache:
+    def __init__(self, filename: str, max_size: int) -> None:
+        """Create a cache. The database is opened when it's first used.
+
+        Args:
+            filename (str): The filename of the cache database, which is put
+            in the database folder.
+
+            max_size (int): The maximum size of the stored responses in bytes.
+            When exceeded, the least recently used responses are evicted.
+        """
+        self.filename = filename
+        self.max_size = max_size
+
+        self.hits = 0
+        "Amount of lookups that were served from the cache"
+        self.stale_hits = 0
+        "Amount of lookups that were served an expired response"
+        self.misses = 0
+        "Amount of lookups that weren't found in the cache or were expired"
+        self.revalidations = 0
+        "Amount of expired responses that the service confirmed are unchanged"
+
+        self._lock = Lock()
+        self._db: Union[Connection, None] = None
+        self._size = 0
+        return
+
+    def __get_db(self) -> Connection:
+        if self._db is None:
+            self._db = connect(
+                join(dirname(DBConnection.file), self.filename),
+                check_same_thread=False,
+                isolation_level=None
+            )
+            self._db.executescript("""
+                PRAGMA journal_mode = wal;
+                CREATE TABLE IF NOT EXISTS responses(
+                    key TEXT PRIMARY KEY,
+                    response BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                );
+                CREATE INDEX IF NOT EXISTS responses_last_used_index
+                    ON responses(last_used);
+            """)
+
+            columns = {
+                c[1]
+                for c in self._db.execute("PRAGMA table_info(responses);")
+            }
+            if 'etag' not in columns:
+                # Cache made before revalidation was supported
+                self._db.executescript("""
+                    ALTER TABLE responses ADD etag TEXT;
+                    ALTER TABLE responses ADD last_modified TEXT;
+                """)
+
+            self._size = self._db.execute(
+                "SELECT IFNULL(SUM(size), 0) FROM responses;"
+            ).fetchone()[0]
+
+        return self._db
+
+    @staticmethod
+    def get_key(*parts: Any) -> str:
+        """Generate a cache key from the values that identify a response.
+
+        Args:
+            *parts (Any): The values, e.g. the URL and its parameters.
+
+        Returns:
+            str: The key.
+        """
+        return dumps(parts, sort_keys=True, default=str)
+
+    def get(
+        self,
+        key: str,
+        max_age: Union[int, None] = None
+    ) -> Union[Any, None]:
+        """Get a response from the cache.
+
+        Args:
+            key (str): The key of the response.
+
+            max_age (Union[int, None], optional): The maximum age of the
+            response in seconds. Give `None` to also return an expired (stale)
+            response, e.g. when the service can't be reached.
+                Defaults to None.
+
+        Returns:
+            Union[Any, None]: The response, or `None` if it's not cached or
+            expired.
+        """
+        with self._lock:
+            db = self.__get_db()
+            result = db.execute(
+                "SELECT response, fetched_at FROM responses WHERE key = ?;",
+                (key,)
+            ).fetchone()
+
+            current_time = round(time())
+            if (
+                result is None
+                or (
+                    max_age is not None
+                    and result[1] < current_time - max_age
+                )
+            ):
+                if max_age is not None:
+                    self.misses += 1
+                return None
+
+            if max_age is None:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+
+            db.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?;",
+                (current_time, key)
+            )
+
+        return loads(decompress(result[0]))
+
+    def get_validators(self, key: str) -> Dict[str, str]:
+        """Get the headers to make a conditional request with, so that the
+        service can confirm that the cached response is still up to date
+        instead of sending it again.
+
+        Args:
+            key (str): The key of the response.
+
+        Returns:
+            Dict[str, str]: The `If-None-Match` and/or `If-Modified-Since`
+            headers. Empty if the response is not cached or the service didn't
+            supply an ETag or Last-Modified header for it.
+        """
+        with self._lock:
+            result = self.__get_db().execute(
+                "SELECT etag, last_modified FROM responses WHERE key = ?;",
+                (key,)
+            ).fetchone()
+
+        if result is None:
+            return {}
+
+        headers = {}
+        if result[0]:
+            headers['If-None-Match'] = result[0]
+        if result[1]:
+            headers['If-Modified-Since'] = result[1]
+        return headers
+
+    def revalidate(self, key: str) -> Union[Any, None]:
+        """Mark a cached response as up to date again, e.g. after the service
+        answered a conditional request with "304 Not Modified".
+
+        Args:
+            key (str): The key of the response.
+
+        Returns:
+            Union[Any, None]: The response, or `None` if it's not cached
+            (anymore).
+        """
+        with self._lock:
+            db = self.__get_db()
+            result = db.execute(
+                "SELECT response FROM responses WHERE key = ?;",
+                (key,)
+            ).fetchone()
+            if result is None:
+                return None
+
+            current_time = round(time())
+            db.execute("""
+                UPDATE responses
+                SET fetched_at = ?, last_used = ?
+                WHERE key = ?;
+                """,
+                (current_time, current_time, key)
+            )
+            self.revalidations += 1
+
+        return loads(decompress(result[0]))
+
+    def set(
+        self,
+        key: str,
+        response: Any,
+        etag: Union[str, None] = None,
+        last_modified: Union[str, None] = None
+    ) -> None:
+        """Store a response in the cache.
+
+        Args:
+            key (str): The key of the response.
+
+            response (Any): The response. Must be JSON serializable.
+
+            etag (Union[str, None], optional): The value of the ETag header of
+            the response, used for revalidating it.
+                Defaults to None.
+
+            last_modified (Union[str, None], optional): The value of the
+            Last-Modified header of the response, used for revalidating it.
+                Defaults to None.
+        """
+        data = compress(dumps(response).encode())
+        current_time = round(time())
+
+        with self._lock:
+            db = self.__get_db()
+            old_size = db.execute(
+                "SELECT size FROM responses WHERE key = ?;",
+                (key,)
+            ).fetchone()
+
+            db.execute("""
+                INSERT OR REPLACE INTO responses(
+                    key, response, size, fetched_at, last_used,
+                    etag, last_modified
+                ) VALUES (?, ?, ?, ?, ?, ?, ?);
+                """,
+                (
+                    key, data, len(data), current_time, current_time,
+                    etag, last_modified
+                )
+            )
+            self._size += len(data) - (old_size[0] if old_size else 0)
+
+            if self._size > self.max_size:
+                self.__evict()
+
+        return
+
+    def __evict(self) -> None:
+        """
+        Remove the least recently used responses until the cache is at 90% of
+        its maximum size.
+        """
+        db = self.__get_db()
+        target_size = self.max_size * 0.9
+
+        evict_keys = []
+        for key, size in db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used;"
+        ):
+            if self._size <= target_size:
+                break
+            evict_keys.append((key,))
+            self._size -= size
+
+        LOGGER.debug(
+            f'Evicting {len(evict_keys)} responses from {self.filename}'
+        )
+        db.executemany("DELETE FROM responses WHERE key = ?;", evict_keys)
+        return
+
+    def clear(self) -> None:
+        "Remove all responses from the cache"
+        with self._lock:
+            self.__get_db().execute("DELETE FROM responses;")
+            self._size = 0
+        return
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get statistics about the usage of the cache.
+
+        Returns:
+            Dict[str, int]: The statistics.
+        """
+        with self._lock:
+            self.__get_db()
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'size': self._size,
+                'max_size': self.max_size
+            }
@@ -8,7 +8,7 @@ from __future__ import annotations
 
 from multiprocessing import SimpleQueue
 from os import urandom
-from threading import Thread, Timer, current_thread
+from threading import Lock, Thread, Timer, current_thread
 from typing import (TYPE_CHECKING, Any, Callable, Dict,
                     Iterable, List, Mapping, Union)
 
@@ -395,10 +395,24 @@ class MPWebSocketQueue(PubSubManager):
 class WebSocket(SocketIO, metaclass=Singleton):
     server_options: dict
 
+    pending_queue_status: Dict[int, Download] = {}
+    "The downloads of which progress was reported but not yet sent, by ID"
+    queue_status_lock = Lock()
+    queue_status_timer: Union[Timer, None] = None
+
     @property
     def client_manager(self) -> MPWebSocketQueue:
         return self.server_options['client_manager']
 
+    @property
+    def has_clients(self) -> bool:
+        """Whether any client is connected. When the clients are handled by
+        another process, it's assumed that there are.
+        """
+        if self.client_manager.write_only:
+            return True
+        return bool(self.server.manager.rooms.get('/', {}).get(None))
+
     def send_task_added(self, task: Task) -> None:
         """Send a message stating a task that has been added
         to the queue.
@@ -517,12 +531,60 @@ class WebSocket(SocketIO, metaclass=Singleton):
         )
         return
 
+    def report_queue_progress(self, download: Download) -> None:
+        """Report progress on a download. Unlike `update_queue_status()`, the
+        status isn't sent immediately. Instead, only the latest status of each
+        download is sent, at most `Constants.QUEUE_STATUS_RATE` times per
+        second.
+
+        Args:
+            download (Download): The download instance that made progress.
+        """
+        with self.queue_status_lock:
+            self.pending_queue_status[download.id] = download
+
+            if self.queue_status_timer is None:
+                WebSocket.queue_status_timer = Timer(
+                    1.0 / Constants.QUEUE_STATUS_RATE,
+                    self.__flush_queue_status
+                )
+                self.queue_status_timer.name = "QueueStatusTimer"
+                self.queue_status_timer.daemon = True
+                self.queue_status_timer.start()
+
+        return
+
+    def __flush_queue_status(self) -> None:
+        "Send the latest reported status of the downloads"
+        with self.queue_status_lock:
+            downloads = list(self.pending_queue_status.values())
+            self.pending_queue_status.clear()
+            WebSocket.queue_status_timer = None
+
+        if not self.has_clients:
+            # Nobody to send it to, and the next report replaces it anyway
+            return
+
+        for download in downloads:
+            self.__send_queue_status(download)
+
+        return
+
     def update_queue_status(self, download: Download) -> None:
-        """Send a message with the new download queue status.
+        """Send a message with the new download queue status immediately.
+        Any progress of the download that is still waiting to be sent is
+        dropped, as it's outdated.
 
         Args:
             download (Download): The download instance to send the status of.
         """
+        with self.queue_status_lock:
+            self.pending_queue_status.pop(download.id, None)
+
+        self.__send_queue_status(download)
+        return
+
+    def __send_queue_status(self, download: Download) -> None:
         self.emit(
             SocketEvent.QUEUE_STATUS.value,
             {
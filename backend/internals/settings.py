@@ -57,6 +57,7 @@ class SettingsValues:
 
     create_empty_volume_folders: bool = True
     delete_empty_folders: bool = False
+    watch_root_folders: bool = False
 
     unmonitor_deleted_issues: bool = False
 
@@ -69,6 +70,10 @@ class SettingsValues:
     ))
     download_folder: str = folder_path('temp_downloads')
     concurrent_direct_downloads: int = 1
+    direct_download_segments: int = 4
+    concurrent_searches: int = 4
+    search_cache_ttl: int = 3600
+    persist_search_cache: bool = False
     failing_download_timeout: int = 0
     seeding_handling: SeedingHandling = SeedingHandling.COPY
     delete_completed_downloads: bool = True
@@ -126,6 +131,7 @@ task_intervals = {
     # If there are tasks that should be run at the same time,
     # but per se after each other, put them in that order in the dict.
     'update_all': 3600, # every hour
+    'release_sync': 900, # every 15 minutes
     'search_all': 86400 # every day
 }
 
@@ -418,6 +424,15 @@ class Settings(metaclass=Singleton):
         elif key == 'concurrent_direct_downloads' and value <= 0:
             raise InvalidKeyValue(key, value)
 
+        elif key == 'direct_download_segments' and not 1 <= value <= 16:
+            raise InvalidKeyValue(key, value)
+
+        elif key == 'concurrent_searches' and value <= 0:
+            raise InvalidKeyValue(key, value)
+
+        elif key == 'search_cache_ttl' and value < 0:
+            raise InvalidKeyValue(key, value)
+
         elif key == 'failing_download_timeout' and value < 0:
             raise InvalidKeyValue(key, value)
 
@@ -3,6 +3,7 @@
 from asyncio import run
 from datetime import datetime
 from io import BytesIO
+from os.path import basename, splitext
 from typing import Any, Dict, List, Tuple, Type, Union
 
 from flask import Blueprint, request, send_file
@@ -15,11 +16,12 @@ from backend.base.definitions import (BlocklistReason,
                                       KapowarrException, LibraryFilter,
                                       LibrarySorting, MonitorScheme,
                                       SpecialVersion, VolumeData)
-from backend.base.helpers import hash_password
+from backend.base.helpers import get_connection_stats, hash_password
 from backend.base.logging import LOGGER, get_log_file_contents
 from backend.features.download_queue import (DownloadHandler,
                                              delete_download_history,
                                              get_download_history)
+from backend.features.file_watcher import FileWatcher
 from backend.features.library_import import (import_library,
                                              propose_library_import)
 from backend.features.mass_edit import run_mass_editor_action
@@ -32,11 +34,13 @@ from backend.implementations.blocklist import (add_to_blocklist,
                                                delete_blocklist_entry,
                                                get_blocklist,
                                                get_blocklist_entry)
-from backend.implementations.comicvine import ComicVine
+from backend.implementations.comicvine import (ComicVine, CVRateLimiter,
+                                               cv_cache)
 from backend.implementations.conversion import (FileConversionHandler,
                                                 preview_mass_convert)
 from backend.implementations.credentials import Credentials
 from backend.implementations.external_clients import ExternalClients
+from backend.implementations.getcomics import GCSearchCache
 from backend.implementations.naming import (generate_volume_folder_name,
                                             preview_mass_rename)
 from backend.implementations.remote_mapping import RemoteMappings
@@ -128,7 +132,7 @@ def extract_key(request, key: str, check_existence: bool = True) -> Any:
 
         elif key in (
             'root_folder_id', 'root_folder',
-            'offset', 'limit', 'index'
+            'offset', 'limit', 'index', 'size'
         ):
             try:
                 value = int(value)
@@ -259,6 +263,37 @@ def api_about():
     return return_api(get_about_data())
 
 
+@api.route('/system/comicvine', methods=['GET'])
+@error_handler
+@auth
+def api_comicvine():
+    return return_api({
+        'rate_limit_budget': CVRateLimiter().get_budget(),
+        'cache': cv_cache.get_stats()
+    })
+
+
+@api.route('/system/connections', methods=['GET'])
+@error_handler
+@auth
+def api_connections():
+    return return_api(get_connection_stats())
+
+
+@api.route('/system/search-cache', methods=['GET', 'DELETE'])
+@error_handler
+@auth
+def api_search_cache():
+    search_cache = GCSearchCache()
+
+    if request.method == 'GET':
+        return return_api(search_cache.get_stats())
+
+    elif request.method == 'DELETE':
+        search_cache.clear()
+        return return_api({})
+
+
 @api.route('/system/logs', methods=['GET'])
 @error_handler
 @auth
@@ -331,6 +366,12 @@ def api_tasks():
                 raise InvalidKeyValue('allow_skipping', allow_skipping)
             kwargs['allow_skipping'] = allow_skipping
 
+        if task.action in ('refresh_and_scan', 'update_all'):
+            force_full_scan = data.get('force_full_scan', False)
+            if not isinstance(force_full_scan, bool):
+                raise InvalidKeyValue('force_full_scan', force_full_scan)
+            kwargs['force_full_scan'] = force_full_scan
+
         task_instance = task(**kwargs)
         result = task_handler.add(task_instance)
         return return_api({'id': result}, code=201)
@@ -405,11 +446,13 @@ def api_settings():
     elif request.method == 'PUT':
         data = request.get_json()
         settings.update(data)
+        FileWatcher().update_watched_folders()
         return return_api(settings.get_settings().to_dict())
 
     elif request.method == 'DELETE':
         key = extract_key(request, 'key')
         settings.reset(key)
+        FileWatcher().update_watched_folders()
         return return_api(settings.get_settings().to_dict())
 
 
@@ -449,6 +492,7 @@ def api_rootfolder():
         if folder is None:
             raise KeyNotFound('folder')
         root_folder = root_folders.add(folder).todict()
+        FileWatcher().update_watched_folders()
         return return_api(root_folder, code=201)
 
 
@@ -467,10 +511,12 @@ def api_rootfolder_id(id: int):
         if not folder:
             raise KeyNotFound('folder')
         root_folders[id] = folder
+        FileWatcher().update_watched_folders()
         return return_api({})
 
     elif request.method == 'DELETE':
         root_folders.delete(id)
+        FileWatcher().update_watched_folders()
         return return_api({})
 
 
@@ -742,6 +788,66 @@ def api_volumes():
         return return_api(volume_info, code=201)
 
 
+@api.route('/volumes/bulk', methods=['POST'])
+@error_handler
+@auth
+def api_volumes_bulk():
+    data: dict = request.get_json()
+
+    comicvine_ids = data.get('comicvine_ids')
+    if comicvine_ids is None:
+        raise KeyNotFound('comicvine_ids')
+    if not (
+        isinstance(comicvine_ids, list)
+        and all(isinstance(i, int) for i in comicvine_ids)
+    ):
+        raise InvalidKeyValue('comicvine_ids', comicvine_ids)
+
+    root_folder_id = data.get('root_folder_id')
+    if root_folder_id is None:
+        raise KeyNotFound('root_folder_id')
+
+    monitor = data.get('monitor', True)
+    if not isinstance(monitor, bool):
+        raise InvalidKeyValue('monitor', monitor)
+
+    monitoring_scheme = data.get('monitoring_scheme') or "all"
+    try:
+        monitoring_scheme = MonitorScheme(monitoring_scheme)
+    except ValueError:
+        raise InvalidKeyValue("monitoring_scheme", monitoring_scheme)
+
+    monitor_new_issues = data.get('monitor_new_issues', True)
+    if not isinstance(monitor_new_issues, bool):
+        raise InvalidKeyValue('monitor_new_issues', monitor_new_issues)
+
+    auto_search = data.get('auto_search', False)
+    if not isinstance(auto_search, bool):
+        raise InvalidKeyValue('auto_search', auto_search)
+
+    special_version = data.get('special_version') or None
+    if special_version == 'auto':
+        sv = None
+    else:
+        try:
+            sv = SpecialVersion(special_version)
+        except ValueError:
+            raise InvalidKeyValue('special_version', special_version)
+
+    cv_to_id = library.add_multiple(
+        [(cv_id, root_folder_id, None) for cv_id in comicvine_ids],
+        monitor,
+        monitoring_scheme,
+        monitor_new_issues,
+        sv,
+        auto_search
+    )
+    volumes_info = library.get_public_volumes(
+        volume_ids=tuple(cv_to_id.values())
+    )
+    return return_api(volumes_info, code=201)
+
+
 @api.route('/volumes/stats', methods=['GET'])
 @error_handler
 @auth
@@ -800,11 +906,18 @@ def api_volume(id: int):
 @error_handler
 @auth
 def api_volume_cover(id: int):
-    cover = library.get_volume(id).get_cover()
-    return send_file(
+    size = extract_key(request, 'size', False)
+    cover = library.get_volume(id).get_cover(size)
+    if cover is None:
+        return send_file(BytesIO(), mimetype='image/jpeg'), 200
+
+    # The filename is the hash of the content, so it's a strong ETag
+    response = send_file(
         cover,
-        mimetype='image/jpeg'
-    ), 200
+        mimetype='image/jpeg',
+        etag=splitext(basename(cover))[0]
+    )
+    return response, response.status_code
 
 
 @api.route('/issues/<int:id>', methods=['GET', 'PUT'])
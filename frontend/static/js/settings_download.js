@@ -3,6 +3,10 @@ function fillSettings(api_key) {
 	.then(json => {
 		document.querySelector('#download-folder-input').value = json.result.download_folder;
 		document.querySelector('#concurrent-direct-downloads-input').value = json.result.concurrent_direct_downloads;
+		document.querySelector('#direct-download-segments-input').value = json.result.direct_download_segments;
+		document.querySelector('#concurrent-searches-input').value = json.result.concurrent_searches;
+		document.querySelector('#search-cache-ttl-input').value = ((json.result.search_cache_ttl || 0) / 60) || '';
+		document.querySelector('#persist-search-cache-input').checked = json.result.persist_search_cache;
 		document.querySelector('#download-timeout-input').value = ((json.result.failing_download_timeout || 0) / 60) || '';
 		document.querySelector('#seeding-handling-input').value = json.result.seeding_handling;
 		document.querySelector('#delete-downloads-input').checked = json.result.delete_completed_downloads;
@@ -16,6 +20,10 @@ function saveSettings(api_key) {
 	const data = {
 		'download_folder': document.querySelector('#download-folder-input').value,
 		'concurrent_direct_downloads': parseInt(document.querySelector('#concurrent-direct-downloads-input').value),
+		'direct_download_segments': parseInt(document.querySelector('#direct-download-segments-input').value),
+		'concurrent_searches': parseInt(document.querySelector('#concurrent-searches-input').value),
+		'search_cache_ttl': parseInt(document.querySelector('#search-cache-ttl-input').value || 0) * 60,
+		'persist_search_cache': document.querySelector('#persist-search-cache-input').checked,
 		'failing_download_timeout': parseInt(document.querySelector('#download-timeout-input').value || 0) * 60,
 		'seeding_handling': document.querySelector('#seeding-handling-input').value,
 		'delete_completed_downloads': document.querySelector('#delete-downloads-input').checked,
@@ -11,6 +11,7 @@ const inputs = {
 	'volume_padding_input': document.querySelector('#volume-padding-input'),
 	'create_empty_volume_folders_input': document.querySelector('#create-vf-input'),
 	'delete_empty_folders_input': document.querySelector('#delete-empty-folders-input'),
+	'watch_root_folders_input': document.querySelector('#watch-root-folders-input'),
 	'unmonitor_deleted_input': document.querySelector('#unmonitor-deleted-input'),
 	'convert_input': document.querySelector('#convert-input'),
 	'extract_input': document.querySelector('#extract-input')
@@ -34,6 +35,7 @@ function fillSettings(api_key) {
 		inputs.volume_padding_input.value = json.result.volume_padding;
 		inputs.create_empty_volume_folders_input.checked = json.result.create_empty_volume_folders;
 		inputs.delete_empty_folders_input.checked = json.result.delete_empty_folders;
+		inputs.watch_root_folders_input.checked = json.result.watch_root_folders;
 		inputs.unmonitor_deleted_input.checked = json.result.unmonitor_deleted_issues;
 		inputs.convert_input.checked = json.result.convert;
 		inputs.extract_input.checked = json.result.extract_issue_ranges;
@@ -62,6 +64,7 @@ function saveSettings(api_key) {
 		'volume_padding': parseInt(inputs.volume_padding_input.value),
 		'create_empty_volume_folders': inputs.create_empty_volume_folders_input.checked,
 		'delete_empty_folders': inputs.delete_empty_folders_input.checked,
+		'watch_root_folders': inputs.watch_root_folders_input.checked,
 		'unmonitor_deleted_issues': inputs.unmonitor_deleted_input.checked,
 		'convert': inputs.convert_input.checked,
 		'extract_issue_ranges': inputs.extract_input.checked,
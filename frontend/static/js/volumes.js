@@ -150,8 +150,10 @@ function populateLibrary(volumes, api_key) {
 			`${url_base}/volumes/${volume.id}`;
 
 		// Cover
-		list_entry.querySelector('.list-img').src =
-			`${url_base}/api/volumes/${volume.id}/cover?api_key=${api_key}`;
+		const list_img = list_entry.querySelector('.list-img');
+		const cover_url = `${url_base}/api/volumes/${volume.id}/cover?api_key=${api_key}`;
+		list_img.src = `${cover_url}&size=150`;
+		list_img.srcset = `${cover_url}&size=300 2x`;
 
 		// Title
 		const list_title = list_entry.querySelector('.list-title');
@@ -0,0 +1,46 @@
+import unittest
+from atexit import register
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from backend.internals.db import commit, get_db, set_db_location, setup_db
+from backend.internals.server import SERVER
+
+_db_folder = None
+
+
+class DBTestCase(unittest.TestCase):
+    """
+    Test case that runs inside an app context with a temporary database.
+    The database is shared by all test cases, so the data that a test adds is
+    removed again after each test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        global _db_folder
+        if _db_folder is None:
+            _db_folder = mkdtemp()
+            register(rmtree, _db_folder, ignore_errors=True)
+            set_db_location(_db_folder)
+            SERVER.create_app()
+            with SERVER.app.app_context():
+                setup_db()
+                commit()
+
+        cls.app_context = SERVER.app.app_context()
+        cls.app_context.push()
+        return
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app_context.pop()
+        return
+
+    def tearDown(self):
+        cursor = get_db()
+        cursor.execute("DELETE FROM files;")
+        cursor.execute("DELETE FROM volumes;")
+        cursor.execute("DELETE FROM root_folders;")
+        commit()
+        return
@@ -0,0 +1,301 @@
+from os.path import join
+from shutil import rmtree
+from sqlite3 import connect
+from tempfile import mkdtemp
+from threading import Lock
+from typing import Dict, Iterator, List, Tuple, Union
+from unittest.mock import patch
+
+from backend.base.definitions import Constants, DownloadSource, DownloadState
+from backend.base.files import preallocate_file
+from backend.implementations.download_clients import DirectDownload
+from backend.internals.db import DBConnection, commit, get_db
+from backend.internals.db_models import DownloadProgressDB
+from backend.internals.server import WebSocket
+from backend.internals.settings import Settings
+
+from . import DBTestCase
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes) -> None:
+        self.status_code = status_code
+        self.content = content
+        return
+
+    def __enter__(self) -> 'FakeResponse':
+        return self
+
+    def __exit__(self, *args) -> None:
+        return
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class FakeSession:
+    def __init__(
+        self,
+        content: bytes,
+        accept_ranges: bool = True,
+        cut_off: int = 0
+    ) -> None:
+        """Serve a file, with or without honouring range requests.
+
+        Args:
+            content (bytes): The content of the file.
+
+            accept_ranges (bool, optional): Honour range requests.
+                Defaults to True.
+
+            cut_off (int, optional): The amount of bytes that the response
+            for the final byte of the file stops short of.
+                Defaults to 0.
+        """
+        self.content = content
+        self.accept_ranges = accept_ranges
+        self.cut_off = cut_off
+        self.requests: List[Union[Tuple[int, int], None]] = []
+        self.lock = Lock()
+        return
+
+    def get(
+        self,
+        url: str,
+        headers: Dict[str, str] = {},
+        stream: bool = False
+    ) -> FakeResponse:
+        if 'Range' not in headers:
+            with self.lock:
+                self.requests.append(None)
+            return FakeResponse(200, self.content)
+
+        start, end = map(int, headers['Range'][len('bytes='):].split('-'))
+        with self.lock:
+            self.requests.append((start, end))
+
+        if not self.accept_ranges:
+            return FakeResponse(200, self.content)
+
+        if end == len(self.content) - 1:
+            end -= self.cut_off
+        return FakeResponse(206, self.content[start:end + 1])
+
+
+class DownloadTestCase(DBTestCase):
+    def setUp(self):
+        self.folder = mkdtemp()
+        for method in ('report_queue_progress', 'update_queue_status'):
+            patcher = patch.object(WebSocket, method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Allow small files to be split up
+        patcher = patch.object(Constants, 'MIN_DOWNLOAD_SEGMENT_SIZE', 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return
+
+    def tearDown(self):
+        rmtree(self.folder, ignore_errors=True)
+        super().tearDown()
+        return
+
+    def make_download(
+        self,
+        session: FakeSession,
+        id: Union[int, None] = None,
+        source_type: DownloadSource = DownloadSource.GETCOMICS
+    ) -> DirectDownload:
+        "Make a download of the file of the session, without a link check"
+        download = DirectDownload.__new__(DirectDownload)
+        download._BaseDirectDownload__responses = [] # type: ignore
+        download._BaseDirectDownload__progress_lock = Lock() # type: ignore
+        download._ssn = session # type: ignore
+        download._pure_link = 'https://example.com/file.cbz'
+        download._source_type = source_type
+        download._id = id
+        download._state = DownloadState.QUEUED_STATE
+        download._size = len(session.content)
+        download._accept_ranges = session.accept_ranges
+        download._etag = '"abc"'
+        download._last_modified = None
+        download._files = [join(self.folder, 'file.cbz')]
+        return download
+
+    def read_file(self, download: DirectDownload) -> bytes:
+        with open(download.files[0], 'rb') as f:
+            return f.read()
+
+
+class segmented_download(DownloadTestCase):
+    content = bytes(range(256)) * 4 + b'end' # 1027 bytes
+
+    def test_segment_count(self):
+        session = FakeSession(self.content)
+        self.assertEqual(self.make_download(session)._get_segment_count(), 4)
+
+        # Limited by the source
+        self.assertEqual(self.make_download(
+            session, source_type=DownloadSource.PIXELDRAIN
+        )._get_segment_count(), 2)
+
+        # Limited by the minimum segment size
+        self.assertEqual(self.make_download(
+            FakeSession(self.content[:25])
+        )._get_segment_count(), 2)
+        self.assertEqual(self.make_download(
+            FakeSession(self.content[:5])
+        )._get_segment_count(), 1)
+
+        # Limited by the setting
+        Settings().update({'direct_download_segments': 1})
+        self.addCleanup(
+            Settings().update, {'direct_download_segments': 4}
+        )
+        self.assertEqual(self.make_download(session)._get_segment_count(), 1)
+        return
+
+    def test_segment_boundaries(self):
+        session = FakeSession(self.content)
+        download = self.make_download(session)
+        download.run()
+
+        self.assertEqual(download.state, DownloadState.DOWNLOADING_STATE)
+        self.assertEqual(download.progress, 100.0)
+        self.assertEqual(self.read_file(download), self.content)
+
+        # Adjacent ranges that together cover the file exactly once
+        self.assertEqual(
+            sorted(session.requests), # type: ignore
+            [(0, 255), (256, 512), (513, 769), (770, 1026)]
+        )
+        return
+
+    def test_no_range_support(self):
+        session = FakeSession(self.content, accept_ranges=False)
+        download = self.make_download(session)
+        self.assertEqual(download._get_segment_count(), 0)
+
+        download.run()
+
+        self.assertEqual(self.read_file(download), self.content)
+        self.assertEqual(session.requests, [None])
+        return
+
+    def test_ranges_refused(self):
+        # Server says it supports range requests, but doesn't honour them
+        session = FakeSession(self.content)
+        download = self.make_download(session)
+        session.accept_ranges = False
+
+        download.run()
+
+        self.assertEqual(download.state, DownloadState.DOWNLOADING_STATE)
+        self.assertEqual(download.progress, 100.0)
+        self.assertEqual(self.read_file(download), self.content)
+        self.assertEqual(len(session.requests), 5)
+        self.assertEqual(session.requests[-1], None)
+        return
+
+    def test_short_final_segment(self):
+        session = FakeSession(self.content, cut_off=3)
+        download = self.make_download(session)
+        download.run()
+
+        self.assertEqual(download.state, DownloadState.FAILED_STATE)
+        self.assertEqual(self.read_file(download)[:-3], self.content[:-3])
+        return
+
+
+class resume_download(DownloadTestCase):
+    content = segmented_download.content
+
+    def setUp(self):
+        super().setUp()
+        cursor = get_db()
+        cursor.execute(
+            "INSERT INTO root_folders(id, folder) VALUES (1, '/comics/');"
+        )
+        volume_id = cursor.execute("""
+            INSERT INTO volumes(comicvine_id, title, root_folder)
+            VALUES (1, 'Test', 1);
+            """
+        ).lastrowid
+        self.download_id = cursor.execute("""
+            INSERT INTO download_queue(
+                volume_id, client_type, download_link, source_type, source_name
+            ) VALUES (?, 'direct', 'https://example.com', 'getcomics', 'GC');
+            """,
+            (volume_id,)
+        ).lastrowid
+        commit()
+        return
+
+    def tearDown(self):
+        get_db().execute("DELETE FROM download_queue;")
+        super().tearDown()
+        return
+
+    def write_partial_file(self, download: DirectDownload) -> None:
+        "Write the file like an earlier run got interrupted"
+        preallocate_file(download.files[0], len(self.content))
+        with open(download.files[0], 'r+b') as f:
+            for start, end in ((0, 100), (256, 513), (770, 820)):
+                f.seek(start)
+                f.write(self.content[start:end])
+        return
+
+    def test_resume(self):
+        session = FakeSession(self.content)
+        download = self.make_download(session, self.download_id)
+        self.write_partial_file(download)
+        DownloadProgressDB.update(
+            self.download_id, len(self.content), '"abc"', None,
+            [100, 257, 0, 50]
+        )
+        commit()
+
+        download.run()
+
+        self.assertEqual(download.progress, 100.0)
+        self.assertEqual(self.read_file(download), self.content)
+        # The second segment was already complete
+        self.assertEqual(
+            sorted(session.requests), # type: ignore
+            [(100, 255), (513, 769), (820, 1026)]
+        )
+        return
+
+    def test_file_changed(self):
+        session = FakeSession(self.content)
+        download = self.make_download(session, self.download_id)
+        self.write_partial_file(download)
+        DownloadProgressDB.update(
+            self.download_id, len(self.content), '"def"', None,
+            [100, 257, 0, 50]
+        )
+        commit()
+
+        download.run()
+
+        self.assertEqual(self.read_file(download), self.content)
+        self.assertEqual(len(session.requests), 4)
+        self.assertIsNone(DownloadProgressDB.fetch(self.download_id))
+        return
+
+    def test_progress_saved(self):
+        session = FakeSession(self.content)
+        download = self.make_download(session, self.download_id)
+        download._BaseDirectDownload__written = [100, 257, 0, 50] # type: ignore
+        download._BaseDirectDownload__save_progress() # type: ignore
+
+        # Committed, so visible to other connections
+        with connect(DBConnection.file) as other_connection:
+            written = other_connection.execute(
+                "SELECT written FROM download_progress WHERE download_id = ?;",
+                (self.download_id,)
+            ).fetchone()
+        self.assertEqual(written, ('100,257,0,50',))
+        return
@@ -0,0 +1,54 @@
+import unittest
+
+from backend.base.files import FolderTrie
+
+
+class folder_trie(unittest.TestCase):
+    def setUp(self):
+        self.trie: FolderTrie[int] = FolderTrie()
+        self.trie.add('/comics', 1)
+        self.trie.add('/comics/Batman', 2)
+        self.trie.add('/comics/Batman/Annuals', 3)
+        self.trie.add('/comics/Superman', 4)
+        self.trie.add('/other/a/b', 5)
+        return
+
+    def test_nested(self):
+        self.assertEqual(
+            self.trie.get_values('/comics/Batman/Annuals/Annual #1.cbz'),
+            [1, 2, 3]
+        )
+        self.assertEqual(self.trie.get_values('/comics/Batman/#1.cbz'), [1, 2])
+        self.assertEqual(self.trie.get_values('/comics/Batman'), [1, 2])
+        return
+
+    def test_siblings(self):
+        self.assertEqual(self.trie.get_values('/comics/Superman/#1.cbz'), [1, 4])
+        self.assertEqual(self.trie.get_values('/comics/Flash/#1.cbz'), [1])
+        self.assertEqual(self.trie.get_values('/quux/#1.cbz'), [])
+        return
+
+    def test_multiple_values(self):
+        self.trie.add('/comics/Superman/', 6)
+        self.assertEqual(self.trie.get_values('/comics/Superman/#1.cbz'), [1, 4, 6])
+        return
+
+    def test_prefix_boundary(self):
+        self.assertEqual(self.trie.get_values('/other/a/b/#1.cbz'), [5])
+        self.assertEqual(self.trie.get_values('/other/a/bc/#1.cbz'), [])
+        self.assertEqual(self.trie.get_values('/comics/Batman Beyond/#1.cbz'), [1])
+        self.assertEqual(self.trie.get_values('/comic'), [])
+        return
+
+    def test_is_relevant(self):
+        # Parent of an added folder
+        self.assertTrue(self.trie.is_relevant('/'))
+        self.assertTrue(self.trie.is_relevant('/other/a'))
+        # Added folder or inside one
+        self.assertTrue(self.trie.is_relevant('/other/a/b'))
+        self.assertTrue(self.trie.is_relevant('/other/a/b/c'))
+        # Unrelated
+        self.assertFalse(self.trie.is_relevant('/other/a/bc'))
+        self.assertFalse(self.trie.is_relevant('/other/b'))
+        self.assertFalse(self.trie.is_relevant('/quux'))
+        return
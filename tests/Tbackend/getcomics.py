@@ -0,0 +1,51 @@
+from os.path import dirname, join
+
+from bs4 import BeautifulSoup
+
+from backend.implementations.getcomics import (_format_articles,
+                                               _get_download_groups,
+                                               _get_max_page, _get_title,
+                                               _parse_article,
+                                               _parse_listing_page,
+                                               html_parser)
+
+from . import DBTestCase
+
+FIXTURES = join(dirname(dirname(__file__)), 'fixtures')
+
+
+def read_fixture(name: str) -> str:
+    with open(join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+# Extracting download groups checks the blocklist and settings
+class strained_parsing(DBTestCase):
+    def test_listing_page(self):
+        html = read_fixture('getcomics_listing.html')
+        full = BeautifulSoup(html, html_parser)
+        strained = _parse_listing_page(html)
+
+        self.assertEqual(_get_max_page(strained), 1204)
+        self.assertEqual(_get_max_page(strained), _get_max_page(full))
+
+        articles = _format_articles(strained)
+        self.assertEqual(len(articles), 10)
+        self.assertEqual(articles, _format_articles(full))
+        return
+
+    def test_article(self):
+        html = read_fixture('getcomics_article.html')
+        full = BeautifulSoup(html, html_parser)
+        strained = _parse_article(html)
+
+        self.assertEqual(
+            _get_title(strained),
+            'Batman Vol. 3 #1 – 150 + Annuals (2016-2024)'
+        )
+        self.assertEqual(_get_title(strained), _get_title(full))
+
+        groups = _get_download_groups(strained)
+        self.assertEqual(len(groups), 16)
+        self.assertEqual(groups, _get_download_groups(full))
+        return
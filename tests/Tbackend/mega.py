@@ -0,0 +1,142 @@
+import unittest
+from io import BytesIO
+from random import Random
+from typing import Sequence, Tuple, Union
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from backend.implementations.direct_clients.mega import (MegaChunkProcessor,
+                                                         MegaCrypto)
+
+
+class PerBlockChecksum:
+    """
+    The original CBC-MAC implementation, which encrypts every 16-byte block
+    separately. Used as reference for `MegaCrypto.Checksum`.
+    """
+
+    def __init__(
+        self,
+        key: Sequence[int],
+        state: Union[bytes, None] = None
+    ) -> None:
+        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
+        self.hash = state or b"\0" * 16
+        self.key = MegaCrypto.a32_to_bytes(k)
+        self.iv = MegaCrypto.a32_to_bytes(iv[0:2] * 2)
+
+        self.AES = Cipher(
+            algorithms.AES(self.key),
+            modes.CBC(self.hash)
+        ).encryptor()
+        return
+
+    def update(self, chunk: bytes) -> None:
+        encryptor = Cipher(
+            algorithms.AES(self.key),
+            modes.CBC(self.iv)
+        ).encryptor()
+
+        hash = b''
+        for j in range(0, len(chunk), 16):
+            block = chunk[j: j + 16].ljust(16, b"\0")
+            hash = encryptor.update(block)
+
+        encryptor.finalize()
+
+        self.hash = self.AES.update(hash)
+        return
+
+    def digest(self) -> Tuple[int, int]:
+        d = MegaCrypto.bytes_to_a32(self.hash)
+        return d[0] ^ d[1], d[2] ^ d[3]
+
+
+def make_file(size: int, seed: int = 1) -> Tuple[Tuple[int, ...], bytes]:
+    r = Random(seed)
+    key = tuple(r.getrandbits(32) for _ in range(8))
+    data = r.getrandbits(size * 8).to_bytes(size, 'little')
+    return key, data
+
+
+class Checksum(unittest.TestCase):
+    sizes = (
+        1, 16, 17,
+        0x20000, 0x20000 + 5,
+        3 * 0x100000 + 123
+    )
+
+    def test_same_as_per_block(self):
+        for size in self.sizes:
+            key, data = make_file(size)
+            new = MegaCrypto.Checksum(key)
+            old = PerBlockChecksum(key)
+            for start, chunk_size in MegaCrypto.get_chunks(0, size):
+                chunk = data[start:start + chunk_size]
+                new.update(chunk)
+                old.update(chunk)
+                self.assertEqual(new.hash, old.hash, f"Size {size}")
+
+            self.assertEqual(new.digest(), old.digest(), f"Size {size}")
+        return
+
+    def test_resume_from_state(self):
+        size = 3 * 0x100000 + 123
+        key, data = make_file(size)
+        chunks = list(MegaCrypto.get_chunks(0, size))
+
+        old = PerBlockChecksum(key)
+        for start, chunk_size in chunks:
+            old.update(data[start:start + chunk_size])
+
+        for stop in range(1, len(chunks)):
+            first = MegaCrypto.Checksum(key)
+            for start, chunk_size in chunks[:stop]:
+                first.update(data[start:start + chunk_size])
+
+            second = MegaCrypto.Checksum(key, first.hash)
+            for start, chunk_size in chunks[stop:]:
+                second.update(data[start:start + chunk_size])
+
+            self.assertEqual(second.digest(), old.digest(), f"Stop {stop}")
+        return
+
+
+class ChunkProcessor(unittest.TestCase):
+    def test_same_as_inline(self):
+        size = 3 * 0x100000 + 123
+        key, data = make_file(size)
+        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
+
+        def decryptor():
+            return Cipher(
+                algorithms.AES(MegaCrypto.a32_to_bytes(k)),
+                modes.CTR(MegaCrypto.a32_to_bytes(iv))
+            ).decryptor()
+
+        inline_file = BytesIO()
+        inline_mac = PerBlockChecksum(key)
+        inline_decryptor = decryptor()
+
+        processed_file = BytesIO()
+        processed_mac = MegaCrypto.Checksum(key)
+        mac_states = []
+
+        with MegaChunkProcessor(
+            decryptor(), processed_mac, processed_file
+        ) as processor:
+            for start, chunk_size in MegaCrypto.get_chunks(0, size):
+                chunk = data[start:start + chunk_size]
+
+                plain = inline_decryptor.update(chunk)
+                inline_file.write(plain)
+                inline_mac.update(plain)
+
+                mac_states.append(processor.submit(chunk))
+            mac_states.append(processor.wait())
+
+        self.assertEqual(processed_file.getvalue(), inline_file.getvalue())
+        self.assertEqual(processed_mac.digest(), inline_mac.digest())
+        self.assertIsNone(mac_states[0])
+        self.assertEqual(mac_states[-1], processed_mac.hash)
+        return
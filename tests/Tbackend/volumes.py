@@ -0,0 +1,463 @@
+import unittest
+from hashlib import sha256
+from io import BytesIO
+from os import mkdir, remove, replace, stat, utime
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from typing import List, Union
+from unittest.mock import patch
+
+from PIL import Image
+
+from backend.base.definitions import IssueData, IssueMetadata, VolumeMetadata
+from backend.implementations.covers import get_cover_path, store_cover
+from backend.implementations.volumes import (IssueIndex, Volume,
+                                             _delete_removed_issues,
+                                             _match_file,
+                                             _write_refresh_batch, scan_files)
+from backend.internals.db import commit, get_db
+from backend.internals.db_models import ScanManifestDB
+
+from . import DBTestCase
+
+
+def add_volume(cv_id: int, issue_cv_ids: List[int]) -> int:
+    """Add a volume with issues that each have a file matched to them.
+
+    Args:
+        cv_id (int): The CV ID of the volume.
+        issue_cv_ids (List[int]): The CV ID's of the issues.
+
+    Returns:
+        int: The ID of the volume.
+    """
+    cursor = get_db()
+    cursor.execute(
+        "INSERT OR IGNORE INTO root_folders(id, folder) VALUES (1, '/comics/');"
+    )
+    volume_id = cursor.execute("""
+        INSERT INTO volumes(comicvine_id, title, root_folder, folder)
+        VALUES (?, ?, ?, ?);
+        """,
+        (cv_id, f'Volume {cv_id}', 1, f'/comics/Volume {cv_id}')
+    ).lastrowid
+    for n, issue_cv_id in enumerate(issue_cv_ids, start=1):
+        issue_id = cursor.execute("""
+            INSERT INTO issues(
+                volume_id, comicvine_id, issue_number, calculated_issue_number
+            ) VALUES (?, ?, ?, ?);
+            """,
+            (volume_id, issue_cv_id, str(n), float(n))
+        ).lastrowid
+        file_id = cursor.execute(
+            "INSERT INTO files(filepath, size) VALUES (?, 1);",
+            (f'/comics/Volume {cv_id}/Issue {n}.cbz',)
+        ).lastrowid
+        cursor.execute(
+            "INSERT INTO issues_files(file_id, issue_id) VALUES (?, ?);",
+            (file_id, issue_id)
+        )
+    commit()
+    return volume_id
+
+
+def get_issue_cv_ids(volume_id: int) -> List[int]:
+    return sorted(r[0] for r in get_db().execute(
+        "SELECT comicvine_id FROM issues WHERE volume_id = ?;",
+        (volume_id,)
+    ))
+
+
+def get_file_count(volume_id: int) -> int:
+    return get_db().execute("""
+        SELECT COUNT(*)
+        FROM files
+        WHERE filepath LIKE (
+            SELECT folder || '/%' FROM volumes WHERE id = ?
+        );
+        """,
+        (volume_id,)
+    ).exists()
+
+
+class delete_removed_issues(DBTestCase):
+    def test_some_issues_removed(self):
+        volume_id = add_volume(1, [11, 12, 13])
+        other_volume_id = add_volume(2, [21, 22])
+
+        _delete_removed_issues({volume_id: {11, 13}})
+
+        self.assertEqual(get_issue_cv_ids(volume_id), [11, 13])
+        self.assertEqual(get_file_count(volume_id), 2)
+        # Volumes that weren't refreshed are left alone
+        self.assertEqual(get_issue_cv_ids(other_volume_id), [21, 22])
+        self.assertEqual(get_file_count(other_volume_id), 2)
+        return
+
+    def test_all_issues_removed(self):
+        volume_id = add_volume(1, [11, 12])
+        other_volume_id = add_volume(2, [21, 22])
+
+        # The volume has no issues anymore on CV
+        _delete_removed_issues({volume_id: set(), other_volume_id: {21, 22}})
+
+        self.assertEqual(get_issue_cv_ids(volume_id), [])
+        self.assertEqual(get_file_count(volume_id), 0)
+        self.assertEqual(get_issue_cv_ids(other_volume_id), [21, 22])
+        return
+
+    def test_staging_is_cleared(self):
+        volume_id = add_volume(1, [11, 12])
+        _delete_removed_issues({volume_id: {11, 12}})
+        _delete_removed_issues({})
+
+        other_volume_id = add_volume(2, [21])
+        _delete_removed_issues({other_volume_id: {21}})
+
+        self.assertEqual(get_issue_cv_ids(volume_id), [11, 12])
+        return
+
+
+def make_cover(colour: str) -> bytes:
+    "Make a cover that is too small to generate thumbnails of"
+    f = BytesIO()
+    Image.new('RGB', (1, 1), colour).save(f, 'JPEG')
+    return f.getvalue()
+
+
+def make_volume_data(
+    cv_id: int,
+    cover: Union[bytes, None],
+    issue_count: int
+) -> VolumeMetadata:
+    return {
+        'comicvine_id': cv_id,
+        'title': f'Volume {cv_id}',
+        'year': 2020,
+        'volume_number': 1,
+        'cover_link': f'https://example.com/{cv_id}.jpg',
+        'cover': cover,
+        'description': '',
+        'site_url': '',
+        'aliases': [],
+        'publisher': None,
+        'issue_count': issue_count,
+        'translated': False,
+        'already_added': None,
+        'issues': None
+    }
+
+
+def make_issue_data(cv_id: int, volume_cv_id: int) -> IssueMetadata:
+    return {
+        'comicvine_id': cv_id,
+        'volume_id': volume_cv_id,
+        'issue_number': '1',
+        'calculated_issue_number': 1.0,
+        'title': None,
+        'date': None,
+        'description': ''
+    }
+
+
+class write_refresh_batch(DBTestCase):
+    def setUp(self):
+        self.volume_id = add_volume(1, [11])
+        self.old_cover_hash = store_cover(make_cover('red'))
+        get_db().execute(
+            "INSERT INTO volume_covers(volume_id, cover_hash) VALUES (?, ?);",
+            (self.volume_id, self.old_cover_hash)
+        )
+        commit()
+        return
+
+    def get_cover_hash(self) -> str:
+        return get_db().execute(
+            "SELECT cover_hash FROM volume_covers WHERE volume_id = ?;",
+            (self.volume_id,)
+        ).exists()
+
+    def test_cover_replaced(self):
+        _write_refresh_batch(
+            {1: (self.volume_id, 0)},
+            {self.volume_id: self.old_cover_hash},
+            [make_volume_data(1, make_cover('blue'), 1)],
+            [make_issue_data(11, 1)],
+            1.0
+        )
+
+        new_cover_hash = self.get_cover_hash()
+        self.assertNotEqual(new_cover_hash, self.old_cover_hash)
+        self.assertTrue(exists(get_cover_path(new_cover_hash)))
+        self.assertFalse(exists(get_cover_path(self.old_cover_hash)))
+        return
+
+    def test_rolled_back(self):
+        new_cover = make_cover('blue')
+
+        # The issue is of a volume that isn't in the batch
+        with self.assertRaises(KeyError):
+            _write_refresh_batch(
+                {1: (self.volume_id, 0)},
+                {self.volume_id: self.old_cover_hash},
+                [make_volume_data(1, new_cover, 1)],
+                [make_issue_data(21, 2)],
+                1.0
+            )
+
+        self.assertEqual(self.get_cover_hash(), self.old_cover_hash)
+        self.assertTrue(exists(get_cover_path(self.old_cover_hash)))
+        self.assertFalse(exists(get_cover_path(
+            sha256(new_cover).hexdigest()
+        )))
+        self.assertEqual(get_db().execute(
+            "SELECT last_cv_fetch FROM volumes WHERE id = ?;",
+            (self.volume_id,)
+        ).exists(), 0)
+        return
+
+
+class scan_manifest(DBTestCase):
+    def setUp(self):
+        self.root_folder = mkdtemp()
+        self.folder = join(self.root_folder, 'Test (2020)')
+        mkdir(self.folder)
+        cursor = get_db()
+        cursor.execute(
+            "INSERT INTO root_folders(id, folder) VALUES (1, ?);",
+            (self.root_folder,)
+        )
+        self.volume_id = cursor.execute("""
+            INSERT INTO volumes(comicvine_id, title, year, root_folder, folder)
+            VALUES (1, 'Test', 2020, 1, ?);
+            """,
+            (self.folder,)
+        ).lastrowid
+        self.issue_ids = {
+            n: cursor.execute("""
+                INSERT INTO issues(
+                    volume_id, comicvine_id, issue_number,
+                    calculated_issue_number
+                ) VALUES (?, ?, ?, ?);
+                """,
+                (self.volume_id, n, str(n), float(n))
+            ).lastrowid
+            for n in (1, 2, 3)
+        }
+        commit()
+
+        self.files = {
+            n: self.write_file(f'Test (2020) #{n:02}.cbz', b'content')
+            for n in (1, 2, 3)
+        }
+        return
+
+    def tearDown(self):
+        rmtree(self.root_folder, ignore_errors=True)
+        super().tearDown()
+        return
+
+    def write_file(self, name: str, content: bytes) -> str:
+        filepath = join(self.folder, name)
+        with open(filepath + '.tmp', 'wb') as f:
+            f.write(content)
+        replace(filepath + '.tmp', filepath)
+        return filepath
+
+    def scan(self, force_full_scan: bool = False) -> List[str]:
+        """Scan the volume.
+
+        Args:
+            force_full_scan (bool, optional): Ignore the manifest.
+                Defaults to False.
+
+        Returns:
+            List[str]: The files that were matched to the issues again.
+        """
+        with patch(
+            'backend.implementations.volumes._match_file',
+            wraps=_match_file
+        ) as match_file:
+            scan_files(self.volume_id, force_full_scan=force_full_scan)
+        return sorted(c.args[0] for c in match_file.call_args_list)
+
+    def get_bindings(self) -> List[int]:
+        return sorted(r[0] for r in get_db().execute("""
+            SELECT if.issue_id
+            FROM issues_files if
+            INNER JOIN files f
+            ON if.file_id = f.id;
+            """
+        ))
+
+    def test_unchanged_files_skipped(self):
+        self.assertEqual(self.scan(), sorted(self.files.values()))
+        self.assertEqual(self.scan(), [])
+        self.assertEqual(self.get_bindings(), sorted(self.issue_ids.values()))
+        return
+
+    def test_unchanged_folder_not_listed(self):
+        self.scan()
+        past = stat(self.folder).st_mtime_ns - 60_000_000_000
+        utime(self.folder, ns=(past, past))
+        self.scan()
+
+        manifest = ScanManifestDB.fetch(self.volume_id)
+        self.assertEqual(manifest[self.folder]['mtime_ns'], past)
+
+        # A file changed in place doesn't change the folder, so the folder
+        # and its files are not looked at again
+        with patch('backend.base.files.scandir') as scandir:
+            self.assertEqual(self.scan(), [])
+        scandir.assert_not_called()
+        self.assertEqual(ScanManifestDB.fetch(self.volume_id), manifest)
+        return
+
+    def test_changed_size(self):
+        self.scan()
+        self.write_file('Test (2020) #02.cbz', b'more content')
+
+        self.assertEqual(self.scan(), [self.files[2]])
+        self.assertEqual(
+            ScanManifestDB.fetch(self.volume_id)[self.files[2]]['size'],
+            len(b'more content')
+        )
+        self.assertEqual(self.get_bindings(), sorted(self.issue_ids.values()))
+        return
+
+    def test_changed_mtime(self):
+        self.scan()
+        mtime = stat(self.files[2]).st_mtime_ns + 1_000_000_000
+        utime(self.files[2], ns=(mtime, mtime))
+
+        self.assertEqual(self.scan(), [self.files[2]])
+        self.assertEqual(
+            ScanManifestDB.fetch(self.volume_id)[self.files[2]]['mtime_ns'],
+            mtime
+        )
+        return
+
+    def test_changed_inode(self):
+        self.scan()
+        old_st = stat(self.files[2])
+        self.write_file('Test (2020) #02.cbz', b'content')
+        utime(self.files[2], ns=(old_st.st_atime_ns, old_st.st_mtime_ns))
+        new_st = stat(self.files[2])
+        self.assertNotEqual(new_st.st_ino, old_st.st_ino)
+
+        self.assertEqual(self.scan(), [self.files[2]])
+        self.assertEqual(
+            ScanManifestDB.fetch(self.volume_id)[self.files[2]]['inode'],
+            new_st.st_ino
+        )
+        return
+
+    def test_removed_file(self):
+        self.scan()
+        remove(self.files[2])
+
+        self.assertEqual(self.scan(), [])
+        self.assertNotIn(self.files[2], ScanManifestDB.fetch(self.volume_id))
+        self.assertEqual(
+            self.get_bindings(),
+            [self.issue_ids[1], self.issue_ids[3]]
+        )
+        return
+
+    def test_force_full_scan(self):
+        self.scan()
+        self.assertEqual(
+            self.scan(force_full_scan=True),
+            sorted(self.files.values())
+        )
+        self.assertEqual(self.get_bindings(), sorted(self.issue_ids.values()))
+        return
+
+
+def make_issue(id: int, calculated_issue_number: float) -> IssueData:
+    return IssueData(
+        id=id,
+        volume_id=1,
+        comicvine_id=id,
+        issue_number=str(calculated_issue_number),
+        calculated_issue_number=calculated_issue_number,
+        title=None,
+        date=None,
+        description=None,
+        monitored=True,
+        files=[]
+    )
+
+
+class issue_index(unittest.TestCase):
+    def setUp(self):
+        # Not sorted on issue number on purpose
+        self.index = IssueIndex([
+            make_issue(1, 3.0),
+            make_issue(2, 1.0),
+            make_issue(3, 1.5),
+            make_issue(4, 0.0),
+            make_issue(5, 2.0),
+            make_issue(6, 2.0),
+            make_issue(7, 100.0)
+        ])
+        return
+
+    def get_ids(self, start: float, end: float) -> List[int]:
+        return [i.id for i in self.index.get_range(start, end)]
+
+    def test_sorted(self):
+        self.assertEqual(
+            self.index.numbers,
+            [0.0, 1.0, 1.5, 2.0, 2.0, 3.0, 100.0]
+        )
+        return
+
+    def test_single(self):
+        self.assertEqual(self.get_ids(1, 1), [2])
+        self.assertEqual(self.get_ids(0, 0), [4])
+        self.assertEqual(self.get_ids(2, 2), [5, 6])
+        return
+
+    def test_float(self):
+        self.assertEqual(self.get_ids(1.5, 1.5), [3])
+        self.assertEqual(self.get_ids(1.2, 1.4), [])
+        self.assertEqual(self.get_ids(1.2, 1.5), [3])
+        return
+
+    def test_range(self):
+        self.assertEqual(self.get_ids(1, 3), [2, 3, 5, 6, 1])
+        self.assertEqual(self.get_ids(0, 1.5), [4, 2, 3])
+        self.assertEqual(self.get_ids(3, 1), [])
+        return
+
+    def test_out_of_range(self):
+        self.assertEqual(self.get_ids(-5, -1), [])
+        self.assertEqual(self.get_ids(4, 99), [])
+        self.assertEqual(self.get_ids(101, 200), [])
+        self.assertEqual(self.get_ids(-1, 0.5), [4])
+        self.assertEqual(self.get_ids(50, 200), [7])
+        return
+
+    def test_empty(self):
+        self.assertEqual(IssueIndex([]).get_range(1, 10), [])
+        return
+
+
+class volume_issue_index(DBTestCase):
+    def test_get_issue_index(self):
+        volume = Volume(add_volume(1, [11, 12, 13]))
+        index = volume.get_issue_index()
+        self.assertEqual([i.comicvine_id for i in index.issues], [11, 12, 13])
+        self.assertEqual(
+            [i.comicvine_id for i in volume.get_issues_in_range(2, 3)],
+            [12, 13]
+        )
+        self.assertEqual(volume.get_issues_in_range(4, 10), [])
+
+        # Re-used until the issues are fetched again
+        self.assertIs(volume.get_issue_index(), index)
+        volume.get_issues()
+        self.assertIsNot(volume.get_issue_index(), index)
+        return
@@ -0,0 +1,38 @@
+"""
+Measure how long parsing the saved GC pages takes, comparing a full parse
+with the strained parse that only processes the used parts of the pages.
+
+Run from the root of the repository:
+    python -m tests.benchmarks.getcomics_parsing [repeats]
+"""
+
+from sys import argv
+from timeit import timeit
+
+from bs4 import BeautifulSoup
+
+from backend.implementations.getcomics import (_parse_article,
+                                               _parse_listing_page,
+                                               html_parser)
+from tests.Tbackend.getcomics import read_fixture
+
+
+def main(repeats: int) -> None:
+    listing = read_fixture('getcomics_listing.html')
+    article = read_fixture('getcomics_article.html')
+
+    results = (
+        ("Listing page, full", lambda: BeautifulSoup(listing, html_parser)),
+        ("Listing page, strained", lambda: _parse_listing_page(listing)),
+        ("Article, full", lambda: BeautifulSoup(article, html_parser)),
+        ("Article, strained", lambda: _parse_article(article))
+    )
+    print(f"Parser: {html_parser}")
+    for name, func in results:
+        duration = timeit(func, number=repeats) / repeats * 1000
+        print(f"{name:<26}{duration:>8.2f} ms")
+    return
+
+
+if __name__ == "__main__":
+    main(int(argv[1]) if len(argv) > 1 else 100)
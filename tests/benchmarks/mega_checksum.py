@@ -0,0 +1,77 @@
+"""
+Measure the throughput (MB/s) of the MEGA CBC-MAC and chunk processing,
+comparing the per-block checksum with `MegaCrypto.Checksum`.
+
+Run from the root of the repository:
+    python -m tests.benchmarks.mega_checksum [size in MB]
+"""
+
+from io import BytesIO
+from sys import argv
+from time import perf_counter
+from typing import Callable
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from backend.implementations.direct_clients.mega import (MegaChunkProcessor,
+                                                         MegaCrypto)
+from tests.Tbackend.mega import PerBlockChecksum, make_file
+
+
+def measure(size: int, func: Callable[[], None]) -> float:
+    start = perf_counter()
+    func()
+    return size / (perf_counter() - start) / 1_000_000
+
+
+def main(size: int) -> None:
+    key, data = make_file(size)
+    chunks = [
+        data[start:start + chunk_size]
+        for start, chunk_size in MegaCrypto.get_chunks(0, size)
+    ]
+    k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
+
+    def decryptor():
+        return Cipher(
+            algorithms.AES(MegaCrypto.a32_to_bytes(k)),
+            modes.CTR(MegaCrypto.a32_to_bytes(iv))
+        ).decryptor()
+
+    def checksum(checksum_type) -> None:
+        cbc_mac = checksum_type(key)
+        for chunk in chunks:
+            cbc_mac.update(chunk)
+        return
+
+    def inline_processing() -> None:
+        # Decrypting, checksumming and writing in the download loop itself
+        file, cbc_mac, d = BytesIO(), PerBlockChecksum(key), decryptor()
+        for chunk in chunks:
+            chunk = d.update(chunk)
+            file.write(chunk)
+            cbc_mac.update(chunk)
+        return
+
+    def worker_processing() -> None:
+        file, cbc_mac = BytesIO(), MegaCrypto.Checksum(key)
+        with MegaChunkProcessor(decryptor(), cbc_mac, file) as processor:
+            for chunk in chunks:
+                processor.submit(chunk)
+            processor.wait()
+        return
+
+    results = (
+        ("Checksum, per block", lambda: checksum(PerBlockChecksum)),
+        ("Checksum, per chunk", lambda: checksum(MegaCrypto.Checksum)),
+        ("Processing, inline + per block", inline_processing),
+        ("Processing, worker + per chunk", worker_processing)
+    )
+    print(f"Data size: {size / 1_000_000:.1f} MB")
+    for name, func in results:
+        print(f"{name:<32}{measure(size, func):>10.1f} MB/s")
+    return
+
+
+if __name__ == "__main__":
+    main(int(float(argv[1]) * 1_000_000) if len(argv) > 1 else 64_000_000)